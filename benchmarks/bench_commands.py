@@ -0,0 +1,104 @@
+"""
+Mikrobenchmark för CommandHandler.check_command.
+
+Jämför kostnaden per anrop för den gamla, ivrigt utvärderade
+nyckelordstabellen med den lata dispatch-tabellen som byggs en gång.
+
+Körs från projektets rot:
+    python benchmarks/bench_commands.py
+"""
+
+import contextlib
+import io
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nova.commands import CommandHandler
+
+
+def eager_keyword_lookup(handler, text):
+    """
+    Återskapar den gamla fallback-logiken där hela tabellen byggdes,
+    och alla funktioner anropades, vid varje anrop.
+
+    Args:
+        handler (CommandHandler): Kommandohanteraren
+        text (str): Texten att kontrollera
+
+    Returns:
+        tuple: (action, svar, extra_data)
+    """
+    cmd_mapping = {
+        "tid": ("show_time", handler.get_time()),
+        "datum": ("show_date", handler.get_date()),
+        "tärning": ("roll_dice", handler.roll_dice()),
+        "hjälp": ("show_help", handler.get_help()),
+        "slumpa tal": ("random_number", handler.random_number()),
+        "avsluta": ("exit_app", handler.exit_command()),
+        "rensa chatten": ("clear_chat", handler.clear_chat()),
+        "aktivera röst": ("activate_voice", handler.activate_voice()),
+        "avaktivera röst": ("deactivate_voice", handler.deactivate_voice())
+    }
+
+    for cmd_keyword, (action, response) in cmd_mapping.items():
+        if cmd_keyword in text:
+            return action, response, None
+
+    return None, None, None
+
+
+def lazy_keyword_lookup(handler, text):
+    """
+    Den nya fallback-logiken: bara funktionen för det matchade nyckelordet anropas.
+
+    Args:
+        handler (CommandHandler): Kommandohanteraren
+        text (str): Texten att kontrollera
+
+    Returns:
+        tuple: (action, svar, extra_data)
+    """
+    action = handler.keyword_matcher.first_match(text)
+    if action:
+        return action, handler.command_functions[action](), None
+    return None, None, None
+
+
+def bench(label, func, number):
+    """
+    Mäter och skriver ut genomsnittlig tid per anrop.
+
+    Args:
+        label (str): Namn på mätningen
+        func (callable): Funktionen som ska mätas
+        number (int): Antal anrop per mätning
+    """
+    # Koppla bort eventuella utskrifter från koden som mäts
+    with contextlib.redirect_stdout(io.StringIO()):
+        best = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{label:<40} {best / number * 1e6:8.2f} µs/anrop")
+
+
+def main():
+    """
+    Kör alla mätningar.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        handler = CommandHandler()
+
+    number = 20000
+    miss = "berätta något roligt om rymden"
+    hit = "kan du slå en tärning"
+
+    bench("fallback, ingen träff (före)", lambda: eager_keyword_lookup(handler, miss), number)
+    bench("fallback, ingen träff (efter)", lambda: lazy_keyword_lookup(handler, miss), number)
+    bench("fallback, träff (före)", lambda: eager_keyword_lookup(handler, hit), number)
+    bench("fallback, träff (efter)", lambda: lazy_keyword_lookup(handler, hit), number)
+    bench("check_command, ingen träff", lambda: handler.check_command(miss), number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark för taligenkänningen i VoiceRecognizer.
+
+Spelar upp inspelade WAV-filer genom samma lyssningskod som mikrofonen
+använder och mäter igenkänningens latens och ordfelfrekvens (WER).
+Kräver varken mikrofon eller, med den lokala motorn, nätverk.
+
+Varje fil <namn>.wav i mappen ska ha en textfil <namn>.txt med det som sägs.
+
+Körs från projektets rot:
+    python benchmarks/bench_recognition.py inspelningar/ --backend vosk
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ui.audio import ReplaySource
+from ui.recognition import BACKENDS, create_recognition_backend
+from ui.voice import VoiceRecognizer
+
+
+def word_errors(reference, hypothesis):
+    """
+    Räknar redigeringsavståndet mellan två texter mätt i ord.
+
+    Args:
+        reference (str): Den rätta texten
+        hypothesis (str): Den igenkända texten
+
+    Returns:
+        tuple: (antal fel, antal ord i den rätta texten)
+    """
+    expected = reference.lower().split()
+    actual = hypothesis.lower().split() if hypothesis else []
+
+    previous = list(range(len(actual) + 1))
+    for i, word in enumerate(expected, 1):
+        current = [i]
+        for j, other in enumerate(actual, 1):
+            cost = 0 if word == other else 1
+            current.append(min(previous[j - 1] + cost, previous[j] + 1, current[j - 1] + 1))
+        previous = current
+    return previous[-1], len(expected)
+
+
+def load_samples(directory):
+    """
+    Hittar alla WAV-filer med tillhörande utskrift.
+
+    Args:
+        directory (str): Mappen med inspelningarna
+
+    Returns:
+        list: Par av (sökväg till WAV-filen, rätt text)
+    """
+    samples = []
+    for filename in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(filename)
+        transcript_path = os.path.join(directory, name + ".txt")
+        if extension.lower() != ".wav" or not os.path.exists(transcript_path):
+            continue
+        with open(transcript_path, "r", encoding="utf-8") as file:
+            samples.append((os.path.join(directory, filename), file.read().strip()))
+    return samples
+
+
+def main():
+    """
+    Kör benchmarken och skriver ut resultatet per fil och totalt.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="mapp med <namn>.wav och <namn>.txt")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=None,
+                        help="taligenkänningsmotor, standard är NOVA_STT_BACKEND eller google")
+    parser.add_argument("--keyword", action="store_true",
+                        help="använd listen_for_keyword i stället för listen")
+    args = parser.parse_args()
+
+    samples = load_samples(args.directory)
+    if not samples:
+        parser.error(f"hittade inga WAV-filer med utskrift i {args.directory}")
+
+    source = ReplaySource()
+    recognizer = VoiceRecognizer(capture=source, backend=create_recognition_backend(args.backend))
+    listen = recognizer.listen_for_keyword if args.keyword else recognizer.listen
+
+    total_errors = 0
+    total_words = 0
+    latencies = []
+
+    print(f"{'fil':<30} {'latens':>9} {'WER':>6}  text")
+    for path, reference in samples:
+        source.enqueue(path)
+        seconds_before = recognizer.stats["recognition_seconds"]
+        started = time.perf_counter()
+        text = listen()
+        wall = time.perf_counter() - started
+        latency = recognizer.stats["recognition_seconds"] - seconds_before
+
+        errors, words = word_errors(reference, text)
+        total_errors += errors
+        total_words += words
+        latencies.append(latency)
+
+        # Låt inte en fil som inte kändes igen läcka in i nästa
+        source.stop()
+
+        wer = errors / words if words else 0.0
+        print(f"{os.path.basename(path):<30} {latency * 1000:7.0f} ms {wer:6.1%}  {text or '-'}"
+              f"  (totalt {wall:.2f} s)")
+
+    latencies.sort()
+    print()
+    print(f"filer:              {len(samples)}")
+    print(f"motor:              {recognizer.backend.name}")
+    print(f"median latens:      {latencies[len(latencies) // 2] * 1000:.0f} ms")
+    print(f"längsta latens:     {latencies[-1] * 1000:.0f} ms")
+    print(f"ordfelfrekvens:     {total_errors / total_words if total_words else 0.0:.1%}")
+    print(f"igenkänningsanrop:  {recognizer.stats['recognition_calls']}")
+    print(f"ljud skickat:       {recognizer.stats['audio_seconds']:.1f} s")
+    print(f"kastade segment:    {recognizer.stats['segments_discarded']}")
+    print(f"ljud sparat (VAD):  {recognizer.stats['audio_seconds_saved']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
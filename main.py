@@ -2,19 +2,75 @@
 Huvudfil för Nova chatbot.
 """
 
+import argparse
 from nova.chatbot import Nova
-from ui.interface import GraphicalInterface
+from nova.history import create_history_store
+from utils.helpers import setup_logging
+
+def parse_args():
+    """
+    Läser kommandoradsargumenten.
+    
+    Returns:
+        argparse.Namespace: Argumenten
+    """
+    parser = argparse.ArgumentParser(description="Starta Nova chatbot.")
+    parser.add_argument("--headless", action="store_true",
+                        help="kör Nova som HTTP-server utan grafiskt gränssnitt")
+    parser.add_argument("--host", default="127.0.0.1", help="adress för serverläget (standard: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port för serverläget (standard: 8765)")
+    parser.add_argument("--max-concurrent", type=int, default=4,
+                        help="antal svar som skapas samtidigt i serverläget (standard: 4)")
+    parser.add_argument("--max-pending", type=int, default=32,
+                        help="antal väntande förfrågningar innan servern svarar 503 (standard: 32)")
+    parser.add_argument("--enroll-wake-word", type=int, nargs="?", const=5, metavar="ANTAL",
+                        help="spela in exempel av väckordet till data/wakeword och avsluta (standard: 5)")
+    return parser.parse_args()
+
+def enroll_wake_word(count):
+    """
+    Spelar in mallar för den lokala väckordsdetektorn från mikrofonen.
+    
+    Args:
+        count (int): Antal exempel som spelas in
+    """
+    from ui.wakeword import DEFAULT_TEMPLATE_DIR, TemplateWakeWordDetector, record_templates
+    
+    paths = record_templates(
+        count, on_prompt=lambda number: print(f"[{number}/{count}] Säg väckordet, t.ex. \"hej nova\"...")
+    )
+    detector = TemplateWakeWordDetector.from_directory(DEFAULT_TEMPLATE_DIR)
+    print(f"Sparade {len(paths)} mallar, detektorn har nu {len(detector.templates)} mallar.")
 
 def main():
     """
     Huvudfunktion som startar Nova chatbot.
     """
-    # Skapa en instans av Nova chatbot
-    nova = Nova()
+    args = parse_args()
+    
+    # Konfigurera loggning med roterande loggfil. Posterna skrivs från en
+    # bakgrundstråd så att konsol- och fil-I/O inte fördröjer svaren.
+    setup_logging(async_logging=True)
+    
+    if args.enroll_wake_word:
+        enroll_wake_word(args.enroll_wake_word)
+        return
+    
+    # Skapa en instans av Nova chatbot som sparar konversationen i historiken
+    nova = Nova(history=create_history_store())
     
-    # Skapa och starta det grafiska gränssnittet
-    interface = GraphicalInterface(nova)
-    interface.run()
+    try:
+        if args.headless:
+            # Serverläget delar samma Nova-instans mellan alla klienter
+            from nova.server import run_server
+            run_server(nova, args.host, args.port, args.max_concurrent, args.max_pending)
+        else:
+            # Gränssnittet importeras först här så att serverläget inte kräver tkinter eller ljud
+            from ui.interface import GraphicalInterface
+            interface = GraphicalInterface(nova)
+            interface.run()
+    finally:
+        nova.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+Modul för cachning av svar i Nova chatbot.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Trådsäker LRU-cache med räknare för träffar och missar.
+    """
+
+    def __init__(self, max_size=256):
+        """
+        Initierar cachen.
+
+        Args:
+            max_size (int): Största antal poster innan den minst nyligen använda tas bort
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Returnerar antalet poster i cachen."""
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Hämtar en post och markerar den som senast använd.
+
+        Args:
+            key: Nyckeln att slå upp
+
+        Returns:
+            Det cachade värdet, eller None om nyckeln saknas
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Lägger till eller uppdaterar en post.
+
+        Args:
+            key: Nyckeln
+            value: Värdet att cacha (None kan inte cachas)
+        """
+        if self.max_size <= 0 or value is None:
+            return
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Tömmer cachen utan att nollställa räknarna.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returnerar statistik för cachen.
+
+        Returns:
+            dict: Antal träffar, missar, poster och största storlek
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_size": self.max_size
+            }
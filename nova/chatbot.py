@@ -5,8 +5,12 @@ Huvudmodul för Nova chatbot.
 import json
 import os
 import random
+import uuid
 from nova.commands import CommandHandler
 from nova.responses import ResponseHandler
+from nova.registry import get_registry
+from nova.cache import ResponseCache
+from nova.context import ContextStore
 
 
 class Nova:
@@ -15,30 +19,112 @@ class Nova:
     och utföra enkla kommandon.
     """
     
-    def __init__(self):
+    def __init__(self, registry=None, fuzzy_distance=0, cache_size=256, history=None, session_id=None,
+                 contexts=None):
         """
         Initierar Nova chatbot.
+        
+        Args:
+            registry (DataRegistry): Register med kommandon och svar, standard är processens delade register
+            fuzzy_distance (int): Största redigeringsavstånd vid ungefärlig matchning, 0 stänger av den
+            cache_size (int): Antal normaliserade inmatningar som cachas, 0 stänger av cachen
+            history (HistoryStore): Historik där varje tur sparas, None sparar ingenting
+            session_id (str): Standardsessionens id, standard är ett nytt slumpat id
+            contexts (ContextStore): Kontext per session för följdfrågor, standard är en ny samling
         """
         self.name = "NOVA"
-        self.command_handler = CommandHandler(chatbot_name=self.name)
-        self.response_handler = ResponseHandler(chatbot_name=self.name)
+        self.history = history
+        self.session_id = session_id or uuid.uuid4().hex
+        self.registry = registry or get_registry()
+        self.command_handler = CommandHandler(
+            chatbot_name=self.name, registry=self.registry, fuzzy_distance=fuzzy_distance
+        )
+        self.response_handler = ResponseHandler(
+            chatbot_name=self.name, registry=self.registry, fuzzy_distance=fuzzy_distance
+        )
         self.exit_requested = False
+        
+        # Cache för svar som alltid blir desamma för samma inmatning
+        self.response_cache = ResponseCache(max_size=cache_size)
+        self._cache_source = None
+        
+        # De senaste avsikterna per session, så att följdfrågor kan tolkas
+        self.contexts = contexts or ContextStore()
+    
+    @property
+    def context(self):
+        """Kontexten för standardsessionen."""
+        return self.contexts.get(self.session_id)
     
-    def get_response(self, user_input):
+    def get_response(self, user_input, session_id=None, fuzzy_distance=None):
         """
         Genererar ett svar baserat på användarens input.
         
         Args:
             user_input (str): Användarens meddelande
+            session_id (str): Sessionen som meddelandet tillhör, standard är standardsessionen
+            fuzzy_distance (int): Största redigeringsavstånd för just detta meddelande, t.ex. för
+                                  taligenkänd text. Standard är värdet som Nova skapades med.
             
         Returns:
             str eller dict: Novas svar, antingen som sträng eller som dictionary med action-info
         """
-        # Konvertera input till gemener för bättre matchning
-        user_input = user_input.lower().strip()
+        session_id = session_id or self.session_id
+        context = self.contexts.get(session_id)
+        
+        # Olika sessioner hanteras parallellt, men turerna i en session i tur och ordning
+        with context.lock:
+            response = self._respond(user_input, context, fuzzy_distance)
+            
+            if self.history is not None:
+                if isinstance(response, dict):
+                    self.history.append(session_id, user_input, response.get("text"), response.get("action"))
+                else:
+                    self.history.append(session_id, user_input, response)
+        return response
+    
+    def _respond(self, user_input, context, fuzzy_distance=None):
+        """
+        Matchar inmatningen mot kontexten, cachen, kommandona och svarskategorierna,
+        och lägger den tolkade avsikten i kontexten.
+        
+        Args:
+            user_input (str): Användarens meddelande
+            context (ConversationContext): Sessionens kontext
+            fuzzy_distance (int): Största redigeringsavstånd, None för standardvärdet
+            
+        Returns:
+            str eller dict: Novas svar
+        """
+        # Normalisera input (gemener och enkla mellanslag) för bättre matchning och cachning
+        user_input = " ".join(user_input.lower().split())
+        
+        # Följdfrågor beror på föregående tur och går därför förbi cachen
+        action, response, extra_data = self.command_handler.resolve_follow_up(user_input, context)
+        if action:
+            context.push(action, extra_data, user_input)
+            return {"action": action, "text": response, "extra_data": extra_data}
+        
+        # Töm cachen om commands.json eller responses.json har laddats om
+        source = (self.registry.get_commands(), self.registry.get_responses())
+        if source != self._cache_source:
+            self.response_cache.clear()
+            self._cache_source = source
+        
+        # Samma text kan matcha olika med och utan ungefärlig matchning, så avståndet ingår i nyckeln
+        if fuzzy_distance is None:
+            fuzzy_distance = self.command_handler.fuzzy_distance
+        cache_key = (user_input, fuzzy_distance)
+        
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            kind, value = cached
+            context.push(value["action"] if kind == "command" else value,
+                         value["extra_data"] if kind == "command" else None, user_input)
+            return self._render_cached(cached)
         
         # Kontrollera om input är ett kommando
-        action, response, extra_data = self.command_handler.check_command(user_input)
+        action, response, extra_data = self.command_handler.check_command(user_input, fuzzy_distance=fuzzy_distance)
         
         if action:
             # Om vi har en action, formatera svaret korrekt
@@ -48,11 +134,53 @@ class Nova:
                 "extra_data": extra_data
             }
             
+            # Svar som ändras över tid (tid, tärning, slumptal) cachas inte
+            if action not in self.command_handler.NON_CACHEABLE_ACTIONS:
+                self.response_cache.put(cache_key, ("command", command_result))
+            
             # Om kommandot är för att avsluta, markera detta
             if action == "exit_app":
                 self.exit_requested = True
-                
-            return command_result
+            
+            context.push(action, extra_data, user_input)
+            return dict(command_result)
+        
+        # Om inte ett kommando, delegera till response_handler. Kategorin cachas
+        # så att svaret fortfarande väljs slumpmässigt vid varje anrop.
+        category = self.response_handler.match_category(user_input, fuzzy_distance)
+        self.response_cache.put(cache_key, ("category", category))
+        context.push(category, None, user_input)
+        return self.response_handler.response_for(category)
+    
+    def _render_cached(self, cached):
+        """
+        Skapar ett svar från en post i cachen utan att köra matcharna.
         
-        # Om inte ett kommando, delegera till response_handler
-        return self.response_handler.get_response(user_input)
\ No newline at end of file
+        Args:
+            cached (tuple): (typ, värde) som sparades i cachen
+            
+        Returns:
+            str eller dict: Novas svar
+        """
+        kind, value = cached
+        if kind == "command":
+            if value["action"] == "exit_app":
+                self.exit_requested = True
+            return dict(value)
+        return self.response_handler.response_for(value)
+    
+    def cache_stats(self):
+        """
+        Returnerar statistik för svarscachen.
+        
+        Returns:
+            dict: Antal träffar, missar, poster och största storlek
+        """
+        return self.response_cache.stats()
+    
+    def close(self):
+        """
+        Skriver väntande turer till historiken och stänger den.
+        """
+        if self.history is not None:
+            self.history.close()
@@ -4,9 +4,13 @@ Modul för att hantera kommandon i Nova chatbot.
 
 import datetime
 import random
-import json
-import os
 import re
+from nova.matcher import PhraseMatcher
+from nova.registry import get_registry
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
 
 
 class CommandHandler:
@@ -14,15 +18,40 @@ class CommandHandler:
     Hanterar kommandon som användaren kan ge till Nova.
     """
     
-    def __init__(self, chatbot_name="NOVA"):
+    # Kommandon vars svar ändras över tid och därför inte får cachas
+    NON_CACHEABLE_ACTIONS = frozenset({"show_time", "show_date", "roll_dice", "random_number"})
+    
+    # Kommandon som kan upprepas med en följdfråga som "igen"
+    REPEATABLE_ACTIONS = frozenset({"show_time", "show_date", "roll_dice", "random_number"})
+    
+    # Relativa dagar som kan följa på en fråga om datum, t.ex. "och imorgon?"
+    RELATIVE_DAYS = {
+        "idag": 0, "i dag": 0,
+        "imorgon": 1, "i morgon": 1,
+        "i övermorgon": 2, "övermorgon": 2,
+        "igår": -1, "i går": -1,
+        "i förrgår": -2, "förrgår": -2
+    }
+    
+    # Följdfrågor som upprepar det senaste kommandot
+    REPEAT_PHRASES = frozenset({"igen", "en gång till", "en till", "gör det igen"})
+    
+    # Ord som ofta inleder eller avslutar en följdfråga men inte ändrar betydelsen
+    FOLLOW_UP_PREFIX = re.compile(r"^(?:och|men|då|än)\s+")
+    FOLLOW_UP_SUFFIX = re.compile(r"\s+då$")
+    
+    def __init__(self, chatbot_name="NOVA", registry=None, fuzzy_distance=0):
         """
         Initierar CommandHandler.
         
         Args:
             chatbot_name (str): Namn på chatboten, används för formatering av svar
+            registry (DataRegistry): Register med kommandon, standard är processens delade register
+            fuzzy_distance (int): Största redigeringsavstånd vid ungefärlig matchning, 0 stänger av den
         """
         self.chatbot_name = chatbot_name
-        self.commands = {}
+        self.fuzzy_distance = fuzzy_distance
+        self.registry = registry or get_registry()
         self.load_commands()
         
         # Dictionary med kommandofunktioner
@@ -37,23 +66,40 @@ class CommandHandler:
             "deactivate_voice": self.deactivate_voice,
             "clear_chat": self.clear_chat
         }
+        
+        # De gamla hårdkodade nyckelorden, i prioritetsordning. Funktionerna
+        # anropas först när ett nyckelord faktiskt har matchat.
+        self.keyword_commands = {
+            "tid": "show_time",
+            "datum": "show_date",
+            "tärning": "roll_dice",
+            "hjälp": "show_help",
+            "slumpa tal": "random_number",
+            "avsluta": "exit_app",
+            "rensa chatten": "clear_chat",
+            "aktivera röst": "activate_voice",
+            "avaktivera röst": "deactivate_voice"
+        }
+        self.keyword_matcher = PhraseMatcher(self.keyword_commands.items())
     
     def load_commands(self):
         """
-        Läser in kommandon från commands.json.
+        Hämtar kommandona från det delade registret.
+        
+        Returns:
+            CommandSet: Aktuell ögonblicksbild av commands.json
         """
-        try:
-            # Hitta den korrekta sökvägen till commands.json
-            script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            file_path = os.path.join(script_dir, 'data', 'commands.json')
-            
-            with open(file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                self.commands = data.get("commands", {})
-                print(f"Laddade {len(self.commands)} kommandon från commands.json")
-        except Exception as e:
-            print(f"Kunde inte ladda kommandon från fil: {e}")
-            self.commands = {}
+        return self.registry.get_commands()
+    
+    @property
+    def commands(self):
+        """Kommandona från commands.json, skrivskyddade och delade mellan hanterare."""
+        return self.registry.get_commands().commands
+    
+    @property
+    def phrase_matcher(self):
+        """Det kompilerade frasindexet för commands.json."""
+        return self.registry.get_commands().phrase_matcher
     
     def handle_command(self, command_text):
         """
@@ -88,12 +134,14 @@ class CommandHandler:
         
         return None
     
-    def check_command(self, text):
+    def check_command(self, text, context=None, fuzzy_distance=None):
         """
         Kontrollerar om texten matchar något kommando.
         
         Args:
             text (str): Texten att kontrollera
+            context (ConversationContext): Sessionens kontext, används för att tolka följdfrågor
+            fuzzy_distance (int): Största redigeringsavstånd för just detta anrop, standard är hanterarens
         
         Returns:
             tuple: (kommando-typ, svar, extra_data) om en matchning hittades, 
@@ -105,74 +153,130 @@ class CommandHandler:
         # Konvertera till lower case för enklare jämförelse
         text = text.lower().strip()
         
-        print(f"Söker efter kommando i texten: '{text}'")
+        # En följdfråga tolkas utifrån föregående tur innan den matchas som ett eget kommando
+        follow_up = self.resolve_follow_up(text, context)
+        if follow_up[0]:
+            return follow_up
+        
+        logger.debug("Söker efter kommando i texten: '%s'", text)
+        
+        # Använd samma ögonblicksbild genom hela anropet, även om filen laddas om
+        command_set = self.registry.get_commands()
+        commands = command_set.commands
+        templates = command_set.templates_for(self.chatbot_name)
+        
+        # Hitta alla matchande kommandon i en enda genomläsning av texten,
+        # sorterade i samma ordning som i commands.json
+        matches = command_set.phrase_matcher.search(text)
         
         # Kontrollera om detta är ett webbplatskommando
-        if any(phrase in text for phrase in self.commands.get('open_website', {}).get('phrases', [])):
+        if "open_website" in matches:
             website = self.extract_website(text)
             if website:
-                response = self.commands['open_website']['response'].replace("{website}", website)
-                response = response.replace("{name}", self.chatbot_name)
+                response = templates['open_website'].render(website=website)
                 return "open_website", response, {"website": website}
         
         # Kontrollera om detta är ett applikationskommando
-        if any(phrase in text for phrase in self.commands.get('open_application', {}).get('phrases', [])):
+        if "open_application" in matches:
             app_name = self.extract_application(text)
             if app_name:
-                response = self.commands['open_application']['response'].replace("{app}", app_name)
-                response = response.replace("{name}", self.chatbot_name)
+                response = templates['open_application'].render(app=app_name)
                 return "open_application", response, {"app_name": app_name}
         
-        # Gå igenom alla kommandon från JSON-filen
-        for command_type, command_data in self.commands.items():
-            # Kontrollera om texten matchar någon av fraserna
-            for phrase in command_data.get("phrases", []):
-                if phrase.lower() in text:
-                    # Formatera svaret
-                    response = command_data.get("response", "")
-                    action = command_data.get("action", "")
-                    
-                    # Ersätt {name} med chatbotens namn
-                    response = response.replace("{name}", self.chatbot_name)
-                    
-                    # Specialhantering för tidskommando
-                    if "{time}" in response:
-                        current_time = datetime.datetime.now().strftime("%H:%M")
-                        response = response.replace("{time}", current_time)
-                        
-                    # Anropa motsvarande funktion om den finns
-                    if action in self.command_functions:
-                        action_response = self.command_functions[action]()
-                        if action_response:
-                            return action, action_response, None
-                    
-                    # Om detta är exit-kommandot, skriv ut en extra notering
-                    if action == "exit_app":
-                        print("Exit-kommando identifierat - programmet kommer att avslutas")
-                    
-                    return action, response, None
+        # Det första kommandot i filen som har en matchande fras vinner
+        if matches:
+            return self.run_command(commands[matches[0]], templates[matches[0]])
         
         # Om inget matchade från JSON, kontrollera de gamla hårdkodade kommandona
-        cmd_mapping = {
-            "tid": ("show_time", self.get_time()),
-            "datum": ("show_date", self.get_date()),
-            "tärning": ("roll_dice", self.roll_dice()),
-            "hjälp": ("show_help", self.get_help()),
-            "slumpa tal": ("random_number", self.random_number()),
-            "avsluta": ("exit_app", self.exit_command()),
-            "rensa chatten": ("clear_chat", self.clear_chat()),
-            "aktivera röst": ("activate_voice", self.activate_voice()),
-            "avaktivera röst": ("deactivate_voice", self.deactivate_voice())
-        }
+        action = self.keyword_matcher.first_match(text)
+        if action:
+            return action, self.command_functions[action](), None
         
-        for cmd_keyword, (action, response) in cmd_mapping.items():
-            if cmd_keyword in text:
-                return action, response, None
+        # Ungefärlig matchning är sista utvägen, så att den aldrig tar över en exakt träff.
+        # Den tillåter små avvikelser, t.ex. från taligenkänningen, om den är på.
+        # Webbplats- och applikationskommandon kräver exakta fraser för att kunna extrahera målet.
+        if fuzzy_distance is None:
+            fuzzy_distance = self.fuzzy_distance
+        if fuzzy_distance:
+            for command_type, distance in command_set.fuzzy_index.search(text, fuzzy_distance):
+                if command_type not in ("open_website", "open_application"):
+                    logger.debug("Ungefärlig matchning: '%s' (avstånd %d)", command_type, distance)
+                    return self.run_command(commands[command_type], templates[command_type])
         
         # Inget kommando matchade
-        print("  Inget kommando matchade")
+        logger.debug("Inget kommando matchade")
+        return None, None, None
+    
+    def resolve_follow_up(self, text, context):
+        """
+        Tolkar en kort följdfråga utifrån den senaste turen i kontexten,
+        t.ex. "och imorgon?" efter en fråga om datum eller "igen" efter ett tärningsslag.
+        
+        Args:
+            text (str): Den normaliserade texten
+            context (ConversationContext): Sessionens kontext, kan vara None
+        
+        Returns:
+            tuple: (kommando-typ, svar, extra_data) om texten var en följdfråga,
+                annars (None, None, None)
+        """
+        last = context.last() if context is not None else None
+        if last is None:
+            return None, None, None
+        
+        # Följdfrågor är korta, så hela texten ska motsvara en känd fras
+        phrase = text.strip(" ?!.")
+        phrase = self.FOLLOW_UP_SUFFIX.sub("", self.FOLLOW_UP_PREFIX.sub("", phrase))
+        
+        if last.intent == "show_date":
+            if phrase in self.RELATIVE_DAYS:
+                offset = self.RELATIVE_DAYS[phrase]
+                return "show_date", self.get_date(offset, phrase), {"day_offset": offset, "day_label": phrase}
+            if phrase in ("dagen efter", "dagen före", "dagen innan"):
+                offset = last.slots.get("day_offset", 0) + (1 if phrase == "dagen efter" else -1)
+                return "show_date", self.get_date(offset, phrase), {"day_offset": offset, "day_label": phrase}
+        
+        if phrase in self.REPEAT_PHRASES and last.intent in self.REPEATABLE_ACTIONS:
+            if last.intent == "show_date":
+                # Upprepa svaret med samma benämning av dagen, t.ex. "imorgon"
+                offset = last.slots.get("day_offset", 0)
+                label = last.slots.get("day_label")
+                return "show_date", self.get_date(offset, label), {"day_offset": offset, "day_label": label}
+            return last.intent, self.command_functions[last.intent](), None
+        
         return None, None, None
     
+    def run_command(self, command_data, template):
+        """
+        Formaterar svaret för ett matchat kommando från commands.json.
+        
+        Args:
+            command_data (dict): Kommandots data från commands.json
+            template (ResponseTemplate): Kommandots förkompilerade svarsmall
+        
+        Returns:
+            tuple: (kommando-typ, svar, extra_data)
+        """
+        action = command_data.get("action", "")
+        
+        # Mallen har redan {name} insatt, bara tiden behöver fyllas i här
+        if "time" in template.slots:
+            response = template.render(time=datetime.datetime.now().strftime("%H:%M"))
+        else:
+            response = template.render()
+            
+        # Anropa motsvarande funktion om den finns
+        if action in self.command_functions:
+            action_response = self.command_functions[action]()
+            if action_response:
+                return action, action_response, None
+        
+        # Om detta är exit-kommandot, skriv ut en extra notering
+        if action == "exit_app":
+            logger.info("Exit-kommando identifierat - programmet kommer att avslutas")
+        
+        return action, response, None
+    
     def extract_website(self, text):
         """
         Extraherar webbadress från användarens text.
@@ -223,10 +327,22 @@ class CommandHandler:
         current_time = datetime.datetime.now().strftime("%H:%M")
         return f"Klockan är {current_time}."
     
-    def get_date(self):
-        """Returnerar aktuellt datum."""
-        current_date = datetime.datetime.now().strftime("%Y-%m-%d")
-        return f"Dagens datum är {current_date}."
+    def get_date(self, day_offset=0, label=None):
+        """
+        Returnerar dagens datum eller ett datum relativt idag.
+        
+        Args:
+            day_offset (int): Antal dagar från idag, negativt för dagar bakåt
+            label (str): Hur dagen benämns i svaret, t.ex. "imorgon"
+        """
+        date = (datetime.datetime.now() + datetime.timedelta(days=day_offset)).strftime("%Y-%m-%d")
+        if day_offset == 0:
+            return f"Dagens datum är {date}."
+        if label is None:
+            days = abs(day_offset)
+            unit = "dag" if days == 1 else "dagar"
+            label = f"om {days} {unit}" if day_offset > 0 else f"för {days} {unit} sedan"
+        return f"Datumet {label} är {date}."
     
     def roll_dice(self):
         """Simulerar ett tärningskast."""
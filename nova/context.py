@@ -0,0 +1,278 @@
+"""
+Modul för samtalskontext i Nova chatbot.
+
+Varje session har en ringbuffert med de senaste tolkade avsikterna och
+deras parametrar, så att följdfrågor som "och imorgon?" kan tolkas utifrån
+vad användaren nyss frågade. Både bufferten och antalet sessioner har en
+fast övre gräns, så att minnet per session är konstant även med många
+samtidiga sessioner i samma process.
+
+Turerna i en session körs i den ordning de skickades, via SessionQueue,
+medan olika sessioner körs parallellt.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+
+class ContextEntry:
+    """
+    En tolkad tur i kontexten.
+    """
+
+    __slots__ = ("intent", "slots", "text", "timestamp")
+
+    def __init__(self, intent, slots=None, text=None, timestamp=None):
+        """
+        Initierar posten.
+
+        Args:
+            intent (str): Avsikten, t.ex. ett kommandos action eller en svarskategori
+            slots (dict): Parametrar och entiteter för avsikten, t.ex. {"day_offset": 1}
+                          eller {"website": "example.com"}
+            text (str): Den normaliserade inmatningen
+            timestamp (float): Tidpunkt som Unix-tid, standard är nu
+        """
+        self.intent = intent
+        self.slots = slots or {}
+        self.text = text
+        self.timestamp = timestamp or time.time()
+
+    def __repr__(self):
+        return f"ContextEntry({self.intent!r}, {self.slots!r})"
+
+
+class ConversationContext:
+    """
+    Ringbuffert med de senaste turerna i en session.
+    """
+
+    __slots__ = ("size", "lock", "_entries", "_next", "_count")
+
+    def __init__(self, size=8):
+        """
+        Initierar en tom kontext.
+
+        Args:
+            size (int): Största antal turer som sparas
+        """
+        self.size = size
+        # Turer i samma session hanteras en i taget, så att en följdfråga alltid
+        # tolkas efter att föregående tur har lagts i kontexten. Låset garanterar
+        # ingen ordning mellan väntande turer, den ges av SessionQueue.
+        self.lock = threading.Lock()
+        self._entries = [None] * size
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        """Returnerar antalet sparade turer."""
+        return self._count
+
+    def __iter__(self):
+        """Går igenom de sparade turerna, senaste först."""
+        for age in range(self._count):
+            yield self._entries[(self._next - 1 - age) % self.size]
+
+    def push(self, intent, slots=None, text=None):
+        """
+        Lägger till en tur och skriver över den äldsta om bufferten är full.
+
+        Args:
+            intent (str): Avsikten
+            slots (dict): Avsiktens parametrar och entiteter
+            text (str): Den normaliserade inmatningen
+
+        Returns:
+            ContextEntry: Den nya posten
+        """
+        entry = ContextEntry(intent, slots, text)
+        self._entries[self._next] = entry
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+        return entry
+
+    def last(self, age=0):
+        """
+        Returnerar en tidigare tur.
+
+        Args:
+            age (int): 0 för den senaste turen, 1 för den innan osv.
+
+        Returns:
+            ContextEntry eller None: Turen, eller None om den inte finns kvar
+        """
+        if age >= self._count:
+            return None
+        return self._entries[(self._next - 1 - age) % self.size]
+
+    @property
+    def last_intent(self):
+        """Avsikten i den senaste turen, eller None om kontexten är tom."""
+        entry = self.last()
+        return entry.intent if entry else None
+
+    def slot(self, name, default=None):
+        """
+        Returnerar det senaste värdet för en parameter.
+
+        Args:
+            name (str): Parameterns namn
+            default: Värdet som returneras om ingen sparad tur har parametern
+
+        Returns:
+            Parameterns senaste värde
+        """
+        for entry in self:
+            if name in entry.slots:
+                return entry.slots[name]
+        return default
+
+    def clear(self):
+        """
+        Tömmer kontexten.
+        """
+        self._entries = [None] * self.size
+        self._next = 0
+        self._count = 0
+
+
+class ContextStore:
+    """
+    Trådsäker samling av kontexter per session med LRU-gräns på antalet sessioner.
+    """
+
+    def __init__(self, max_sessions=1024, size=8):
+        """
+        Initierar samlingen.
+
+        Args:
+            max_sessions (int): Största antal sessioner innan den minst nyligen använda glöms
+            size (int): Antal turer som sparas per session
+        """
+        self.max_sessions = max_sessions
+        self.size = size
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Returnerar antalet sessioner."""
+        return len(self._contexts)
+
+    def get(self, session_id):
+        """
+        Returnerar sessionens kontext och skapar den om den saknas.
+
+        Args:
+            session_id (str): Sessionens id
+
+        Returns:
+            ConversationContext: Sessionens kontext
+        """
+        with self._lock:
+            context = self._contexts.get(session_id)
+            if context is None:
+                context = ConversationContext(self.size)
+                self._contexts[session_id] = context
+                while len(self._contexts) > self.max_sessions:
+                    self._contexts.popitem(last=False)
+            else:
+                self._contexts.move_to_end(session_id)
+            return context
+
+    def discard(self, session_id):
+        """
+        Glömmer en sessions kontext.
+
+        Args:
+            session_id (str): Sessionens id
+        """
+        with self._lock:
+            self._contexts.pop(session_id, None)
+
+
+class SessionQueue:
+    """
+    Kör turer på en delad trådpool, i inskickad ordning inom varje session.
+
+    En session har högst en tur i trådpoolen åt gången. Nästa tur i sessionen
+    skickas till trådpoolen först när den föregående är klar, så att en
+    följdfråga som skickas direkt efter sin fråga aldrig hinner före den.
+    """
+
+    def __init__(self, executor):
+        """
+        Initierar kön.
+
+        Args:
+            executor (concurrent.futures.Executor): Trådpoolen som turerna körs i
+        """
+        self._executor = executor
+        self._lock = threading.Lock()
+
+        # Sessions-id -> turer som inte är klara, den första körs eller väntar i trådpoolen
+        self._queues = {}
+
+    def __len__(self):
+        """Returnerar antalet sessioner med turer som inte är klara."""
+        return len(self._queues)
+
+    def submit(self, session_id, fn, *args, **kwargs):
+        """
+        Lägger en tur sist i sessionens kö.
+
+        Args:
+            session_id (str): Sessionen som turen tillhör
+            fn (callable): Funktionen som kör turen, t.ex. chatbot.get_response
+            *args, **kwargs: Argument till funktionen
+
+        Returns:
+            Future: Resultatet av fn(*args, **kwargs)
+        """
+        future = Future()
+        with self._lock:
+            queue = self._queues.get(session_id)
+            idle = queue is None
+            if idle:
+                queue = self._queues[session_id] = deque()
+            queue.append((future, fn, args, kwargs))
+        if idle:
+            self._schedule(session_id)
+        return future
+
+    def _schedule(self, session_id):
+        """
+        Skickar sessionens första tur till trådpoolen.
+        """
+        try:
+            self._executor.submit(self._run, session_id)
+        except RuntimeError as e:
+            # Trådpoolen är stängd, så inga fler turer i sessionen kan köras
+            with self._lock:
+                queue = self._queues.pop(session_id, ())
+            for future, _, _, _ in queue:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+
+    def _run(self, session_id):
+        """
+        Kör sessionens första tur och schemalägger nästa.
+        """
+        with self._lock:
+            future, fn, args, kwargs = self._queues[session_id][0]
+
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        with self._lock:
+            queue = self._queues[session_id]
+            queue.popleft()
+            if not queue:
+                del self._queues[session_id]
+                return
+        self._schedule(session_id)
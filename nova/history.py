@@ -0,0 +1,284 @@
+"""
+Modul för den beständiga konversationshistoriken i Nova chatbot.
+
+Varje tur (användarens meddelande och Novas svar) läggs sist i en
+SQLite-databas i WAL-läge. Skrivningar samlas i omgångar och skrivs av en
+bakgrundstråd, så att en tur aldrig väntar på disken. Läsning sker via
+index på tid och session och strömmas i block, så att även en mycket lång
+historik kan spelas upp utan att läsas in i minnet.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from utils.helpers import get_logger, get_user_data_dir
+
+
+logger = get_logger(__name__)
+
+# En tur i historiken
+Turn = namedtuple("Turn", ["id", "session_id", "timestamp", "user_text", "response_text", "action"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    user_text TEXT NOT NULL,
+    response_text TEXT,
+    action TEXT
+);
+CREATE INDEX IF NOT EXISTS turns_session_ts ON turns (session_id, ts);
+CREATE INDEX IF NOT EXISTS turns_ts ON turns (ts);
+"""
+
+# Värden för NOVA_HISTORY som stänger av historiken
+DISABLED_VALUES = ("", "0", "off", "none")
+
+
+class HistoryStore:
+    """
+    Tillägg-endast-logg över konversationer, lagrad i SQLite.
+    """
+
+    def __init__(self, path=None, batch_size=64, flush_interval=1.0):
+        """
+        Öppnar (och vid behov skapar) databasen och startar skrivtråden.
+
+        Args:
+            path (str): Sökväg till databasfilen, standard är history.sqlite3 i användarens datamapp.
+                        ":memory:" ger en historik som bara finns i minnet.
+            batch_size (int): Antal turer som samlas innan de skrivs direkt
+            flush_interval (float): Längsta tid i sekunder som en tur väntar på att skrivas
+        """
+        self.path = path or get_user_data_dir("history.sqlite3")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        # En anslutning för skrivning. Läsningar öppnar egna anslutningar så att
+        # de kan pågå samtidigt som nya turer skrivs (WAL).
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._buffer = []
+        self._closed = False
+        self._wakeup = threading.Event()
+
+        self._thread = threading.Thread(target=self._run, name="nova-history", daemon=True)
+        self._thread.start()
+
+    def append(self, session_id, user_text, response_text=None, action=None, timestamp=None):
+        """
+        Lägger till en tur. Turen skrivs till disken i nästa omgång.
+
+        Args:
+            session_id (str): Konversationens id
+            user_text (str): Användarens meddelande
+            response_text (str): Novas svar
+            action (str): Kommandots åtgärd, om svaret kom från ett kommando
+            timestamp (float): Tidpunkt som Unix-tid, standard är nu
+        """
+        row = (session_id, timestamp or time.time(), user_text, response_text, action)
+        with self._lock:
+            if self._closed:
+                logger.warning("Historiken är stängd, turen sparas inte")
+                return
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Skriver alla väntande turer i en enda transaktion.
+
+        Returns:
+            int: Antal turer som skrevs
+        """
+        with self._write_lock:
+            with self._lock:
+                rows = self._buffer
+                self._buffer = []
+            if not rows:
+                return 0
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO turns (session_id, ts, user_text, response_text, action) VALUES (?, ?, ?, ?, ?)",
+                        rows,
+                    )
+            except sqlite3.Error as e:
+                logger.error("Kunde inte spara %d turer i historiken: %s", len(rows), e)
+                return 0
+            return len(rows)
+
+    def iter_turns(self, session_id=None, since=None, until=None, block_size=500):
+        """
+        Strömmar turer i tidsordning utan att läsa in hela historiken.
+
+        Args:
+            session_id (str): Bara turer från denna session, standard är alla
+            since (float): Bara turer från och med denna Unix-tid
+            until (float): Bara turer före denna Unix-tid
+            block_size (int): Antal rader som hämtas från databasen åt gången
+
+        Yields:
+            Turn: En tur i taget
+        """
+        self.flush()
+        conditions, params = [], []
+        if session_id is not None:
+            conditions.append("session_id = ?")
+            params.append(session_id)
+        if since is not None:
+            conditions.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("ts < ?")
+            params.append(until)
+
+        query = "SELECT id, session_id, ts, user_text, response_text, action FROM turns"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY ts, id"
+
+        conn = self._reader()
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(block_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield Turn(*row)
+        finally:
+            if conn is not self._conn:
+                conn.close()
+
+    def recent(self, session_id=None, limit=20):
+        """
+        Returnerar de senaste turerna, t.ex. för att visa dem när programmet startar.
+
+        Args:
+            session_id (str): Bara turer från denna session, standard är alla
+            limit (int): Största antal turer
+
+        Returns:
+            list[Turn]: Turerna i tidsordning
+        """
+        self.flush()
+        query = "SELECT id, session_id, ts, user_text, response_text, action FROM turns"
+        params = []
+        if session_id is not None:
+            query += " WHERE session_id = ?"
+            params.append(session_id)
+        query += " ORDER BY ts DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        conn = self._reader()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            if conn is not self._conn:
+                conn.close()
+        return [Turn(*row) for row in reversed(rows)]
+
+    def count(self, session_id=None):
+        """
+        Räknar turerna i historiken.
+
+        Args:
+            session_id (str): Bara turer från denna session, standard är alla
+
+        Returns:
+            int: Antal turer
+        """
+        self.flush()
+        conn = self._reader()
+        try:
+            if session_id is None:
+                row = conn.execute("SELECT COUNT(*) FROM turns").fetchone()
+            else:
+                row = conn.execute("SELECT COUNT(*) FROM turns WHERE session_id = ?", (session_id,)).fetchone()
+        finally:
+            if conn is not self._conn:
+                conn.close()
+        return row[0]
+
+    def close(self):
+        """
+        Skriver väntande turer och stänger databasen.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        with self._write_lock:
+            self._conn.close()
+
+    def _connect(self):
+        """
+        Öppnar en anslutning med inställningar för WAL.
+
+        Returns:
+            sqlite3.Connection: Anslutningen
+        """
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+            # I WAL-läge synkas loggen till disken vid checkpoint i stället för vid varje commit
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        """
+        Returnerar en anslutning för läsning. En databas i minnet delas inte
+        mellan anslutningar, så då används skrivanslutningen.
+        """
+        if self.path == ":memory:":
+            return self._conn
+        return self._connect()
+
+    def _run(self):
+        """
+        Skrivtrådens huvudloop: skriver väntande turer med jämna mellanrum
+        eller så fort en omgång är full.
+        """
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+def create_history_store(path=None):
+    """
+    Skapar historiken enligt konfigurationen.
+
+    Args:
+        path (str): Sökväg till databasen. Standard är miljövariabeln NOVA_HISTORY,
+                    där "off" stänger av historiken, annars användarens datamapp.
+
+    Returns:
+        HistoryStore eller None: Historiken, eller None om den är avstängd eller inte kan öppnas
+    """
+    if path is None:
+        path = os.environ.get("NOVA_HISTORY")
+        if path is not None and path.strip().lower() in DISABLED_VALUES:
+            return None
+
+    try:
+        return HistoryStore(path)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Kunde inte öppna historiken: %s", e)
+        return None
@@ -0,0 +1,398 @@
+"""
+Modul för snabb frasmatchning i Nova chatbot.
+Innehåller en kompilerad flermönstermatchare (Aho–Corasick) som hittar
+alla fraser i en text under en enda genomläsning.
+"""
+
+
+class PhraseMatcher:
+    """
+    Kompilerad matchare som hittar vilka nycklar (t.ex. kommandon) vars fraser
+    förekommer i en text.
+
+    Varje fras kopplas till en nyckel. Nycklarnas prioritet bestäms av i vilken
+    ordning de först lades till, vilket motsvarar ordningen i JSON-filen.
+    """
+
+    def __init__(self, entries=()):
+        """
+        Bygger automaten från par av (fras, nyckel).
+
+        Args:
+            entries (iterable): Par av (fras, nyckel) i prioritetsordning
+        """
+        # Trädets övergångar, felänkar och utdata per tillstånd
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+
+        # Nyckel -> prioritet (lägre värde vinner)
+        self._priority = {}
+        self._keys = []
+
+        for phrase, key in entries:
+            self._add(phrase.lower(), key)
+
+        self._build()
+
+    def __len__(self):
+        """Returnerar antalet nycklar i matcharen."""
+        return len(self._keys)
+
+    def _add(self, phrase, key):
+        """
+        Lägger till en fras i trädet.
+
+        Args:
+            phrase (str): Frasen (redan i gemener)
+            key: Nyckeln som frasen tillhör
+        """
+        if key not in self._priority:
+            self._priority[key] = len(self._keys)
+            self._keys.append(key)
+
+        state = 0
+        for char in phrase:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+                self._goto[state][char] = next_state
+            state = next_state
+
+        self._output[state].add(self._priority[key])
+
+    def _build(self):
+        """
+        Beräknar felänkar med bredden-först-sökning och slår ihop utdata
+        så att sökningen aldrig behöver följa länkarna för att hitta träffar.
+        """
+        queue = list(self._goto[0].values())
+        index = 0
+
+        while index < len(queue):
+            state = queue[index]
+            index += 1
+
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                if fail == next_state:
+                    fail = 0
+
+                self._fail[next_state] = fail
+                self._output[next_state] |= self._output[fail]
+
+        # Frysta utdata går snabbare att slå ihop och kan inte ändras av misstag
+        self._output = [frozenset(output) for output in self._output]
+
+    def search(self, text):
+        """
+        Hittar alla nycklar vars fraser förekommer i texten.
+
+        Args:
+            text (str): Texten att söka i (förväntas vara i gemener)
+
+        Returns:
+            list: Matchande nycklar sorterade efter prioritet
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+
+        found = set(output[0])
+        state = 0
+
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+
+        return [self._keys[priority] for priority in sorted(found)]
+
+    def first_match(self, text):
+        """
+        Returnerar nyckeln med högst prioritet som matchar texten.
+
+        Args:
+            text (str): Texten att söka i
+
+        Returns:
+            Nyckeln med högst prioritet, eller None om inget matchade
+        """
+        matches = self.search(text)
+        return matches[0] if matches else None
+
+
+class NGramIndex:
+    """
+    Inverterat index från teckenbaserade n-gram till fraser.
+
+    Varje fras registreras under sitt mest sällsynta n-gram. En fras kan bara
+    förekomma i texten om alla dess n-gram gör det, så vid sökning räcker det
+    att kontrollera fraserna under de n-gram som faktiskt finns i texten.
+    """
+
+    def __init__(self, entries=(), n=3):
+        """
+        Bygger indexet från par av (fras, nyckel).
+
+        Args:
+            entries (iterable): Par av (fras, nyckel) i prioritetsordning
+            n (int): Längden på de n-gram som indexeras
+        """
+        self.n = n
+        self._priority = {}
+        self._keys = []
+
+        # Fraser som är kortare än n kan inte indexeras och kontrolleras alltid
+        self._short = []
+        self._postings = {}
+
+        phrases = []
+        for phrase, key in entries:
+            if key not in self._priority:
+                self._priority[key] = len(self._keys)
+                self._keys.append(key)
+            phrases.append((phrase.lower(), self._priority[key]))
+
+        # Räkna hur vanligt varje n-gram är för att kunna välja det ovanligaste
+        frequency = {}
+        for phrase, _ in phrases:
+            for gram in self._grams(phrase):
+                frequency[gram] = frequency.get(gram, 0) + 1
+
+        for phrase, priority in phrases:
+            grams = self._grams(phrase)
+            if not grams:
+                self._short.append((phrase, priority))
+                continue
+            rarest = min(grams, key=lambda gram: (frequency[gram], gram))
+            self._postings.setdefault(rarest, []).append((phrase, priority))
+
+    def __len__(self):
+        """Returnerar antalet nycklar i indexet."""
+        return len(self._keys)
+
+    def _grams(self, text):
+        """
+        Delar upp en text i unika n-gram.
+
+        Args:
+            text (str): Texten att dela upp
+
+        Returns:
+            set: Textens n-gram
+        """
+        n = self.n
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def candidates(self, text):
+        """
+        Returnerar de fraser som kan förekomma i texten enligt indexet.
+
+        Args:
+            text (str): Texten att söka i (förväntas vara i gemener)
+
+        Returns:
+            list: Par av (fras, prioritet) som behöver verifieras
+        """
+        postings = self._postings
+        found = list(self._short)
+        for gram in self._grams(text):
+            entries = postings.get(gram)
+            if entries:
+                found.extend(entries)
+        return found
+
+    def search(self, text):
+        """
+        Hittar alla nycklar vars fraser förekommer i texten.
+
+        Args:
+            text (str): Texten att söka i (förväntas vara i gemener)
+
+        Returns:
+            list: Matchande nycklar sorterade efter prioritet
+        """
+        found = {priority for phrase, priority in self.candidates(text) if phrase in text}
+        return [self._keys[priority] for priority in sorted(found)]
+
+    def first_match(self, text):
+        """
+        Returnerar nyckeln med högst prioritet som matchar texten.
+
+        Args:
+            text (str): Texten att söka i
+
+        Returns:
+            Nyckeln med högst prioritet, eller None om inget matchade
+        """
+        matches = self.search(text)
+        return matches[0] if matches else None
+
+
+def substring_distance(pattern, text, limit=None):
+    """
+    Beräknar minsta redigeringsavstånd mellan mönstret och någon delsträng av texten.
+
+    Använder Sellers algoritm, en variant av Levenshtein där matchningen
+    får börja och sluta var som helst i texten.
+
+    Args:
+        pattern (str): Mönstret, t.ex. en fras från commands.json
+        text (str): Texten att söka i
+        limit (int): Avbryt tidigt när avståndet säkert överstiger denna gräns
+
+    Returns:
+        int: Det minsta avståndet
+    """
+    previous = list(range(len(pattern) + 1))
+    best = previous[-1]
+
+    for char in text:
+        current = [0]
+        for i, pattern_char in enumerate(pattern, 1):
+            cost = 0 if pattern_char == char else 1
+            current.append(min(previous[i - 1] + cost, previous[i] + 1, current[i - 1] + 1))
+        previous = current
+        if previous[-1] < best:
+            best = previous[-1]
+            if best == 0:
+                break
+
+    if limit is not None and best > limit:
+        return limit + 1
+    return best
+
+
+class FuzzyIndex:
+    """
+    Index för ungefärlig frasmatchning med begränsad kostnad.
+
+    Kandidater hämtas via n-gram som texten och frasen delar. Enligt q-gram-lemmat
+    måste en fras med högst k redigeringar dela minst (antal n-gram - k * n) n-gram
+    med texten, så bara fraser som når den gränsen verifieras med redigeringsavstånd.
+    """
+
+    def __init__(self, entries=(), n=3, max_distance=2):
+        """
+        Bygger indexet från par av (fras, nyckel).
+
+        Args:
+            entries (iterable): Par av (fras, nyckel) i prioritetsordning
+            n (int): Längden på de n-gram som indexeras
+            max_distance (int): Standardgräns för tillåtet redigeringsavstånd
+        """
+        self.n = n
+        self.max_distance = max_distance
+        self._priority = {}
+        self._keys = []
+
+        # (fras, prioritet, antal n-gram) per fras-id
+        self._phrases = []
+        self._postings = {}
+
+        for phrase, key in entries:
+            if key not in self._priority:
+                self._priority[key] = len(self._keys)
+                self._keys.append(key)
+
+            phrase = phrase.lower()
+            grams = self._grams(phrase)
+            phrase_id = len(self._phrases)
+            self._phrases.append((phrase, self._priority[key], len(grams)))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(phrase_id)
+
+    def __len__(self):
+        """Returnerar antalet nycklar i indexet."""
+        return len(self._keys)
+
+    def _grams(self, text):
+        """
+        Delar upp en text i unika n-gram.
+
+        Args:
+            text (str): Texten att dela upp
+
+        Returns:
+            set: Textens n-gram
+        """
+        n = self.n
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def allowed_distance(self, phrase, max_distance):
+        """
+        Returnerar hur många redigeringar som tillåts för en viss fras.
+
+        Korta fraser får färre redigeringar, annars skulle t.ex. "hej" matcha
+        nästan vad som helst.
+
+        Args:
+            phrase (str): Frasen
+            max_distance (int): Övre gräns för redigeringsavståndet
+
+        Returns:
+            int: Tillåtet redigeringsavstånd för frasen
+        """
+        return min(max_distance, len(phrase) // 4)
+
+    def search(self, text, max_distance=None):
+        """
+        Hittar alla nycklar med en fras inom det tillåtna redigeringsavståndet.
+
+        Args:
+            text (str): Texten att söka i (förväntas vara i gemener)
+            max_distance (int): Gräns för redigeringsavståndet, standard är indexets gräns
+
+        Returns:
+            list: Par av (nyckel, avstånd) sorterade på avstånd och sedan prioritet
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+
+        # Räkna delade n-gram, bara för fraser som delar minst ett med texten
+        postings = self._postings
+        shared = {}
+        for gram in self._grams(text):
+            for phrase_id in postings.get(gram, ()):
+                shared[phrase_id] = shared.get(phrase_id, 0) + 1
+
+        best = {}
+        for phrase_id, count in shared.items():
+            phrase, priority, gram_count = self._phrases[phrase_id]
+            allowed = self.allowed_distance(phrase, max_distance)
+            if count < gram_count - allowed * self.n:
+                continue
+            if best.get(priority) == 0:
+                continue
+
+            distance = substring_distance(phrase, text, limit=allowed)
+            if distance <= allowed and distance < best.get(priority, distance + 1):
+                best[priority] = distance
+
+        ranked = sorted(best.items(), key=lambda item: (item[1], item[0]))
+        return [(self._keys[priority], distance) for priority, distance in ranked]
+
+    def first_match(self, text, max_distance=None):
+        """
+        Returnerar den bästa nyckeln inom det tillåtna redigeringsavståndet.
+
+        Args:
+            text (str): Texten att söka i
+            max_distance (int): Gräns för redigeringsavståndet
+
+        Returns:
+            Nyckeln med minst avstånd (och högst prioritet vid lika), eller None
+        """
+        matches = self.search(text, max_distance)
+        return matches[0][0] if matches else None
@@ -0,0 +1,389 @@
+"""
+Modul för det delade registret med kommandon och svar i Nova chatbot.
+
+Registret läser in, validerar och indexerar commands.json och responses.json
+en gång per process. Alla hanterare får samma oföränderliga ögonblicksbilder,
+och filerna laddas om automatiskt när deras ändringstid (mtime) ändras.
+"""
+
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+from nova.matcher import FuzzyIndex, NGramIndex, PhraseMatcher
+from nova.templates import compile_template
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+# Standardsvar som används om responses.json inte kan läsas
+DEFAULT_RESPONSES = {
+    "greetings": {
+        "phrases": ["hej"],
+        "responses": ["Hej!"]
+    },
+    "fallback": {
+        "phrases": [],
+        "responses": ["Jag förstår inte."]
+    }
+}
+
+
+def freeze(value):
+    """
+    Gör en inläst JSON-struktur oföränderlig.
+
+    Dictionaries blir skrivskyddade mappningar och listor blir tupler,
+    så att samma struktur säkert kan delas mellan alla hanterare.
+
+    Args:
+        value: Värdet som ska frysas
+
+    Returns:
+        Den frysta motsvarigheten till värdet
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class CommandSet:
+    """
+    Oföränderlig ögonblicksbild av commands.json med kompilerat frasindex.
+    """
+
+    def __init__(self, commands, mtime=None):
+        """
+        Initierar en ny ögonblicksbild.
+
+        Args:
+            commands (dict): Validerade kommandon från commands.json
+            mtime (float): Filens ändringstid vid inläsningen
+        """
+        self.commands = freeze(commands)
+        self.mtime = mtime
+        entries = [
+            (phrase, command_type)
+            for command_type, command_data in self.commands.items()
+            for phrase in command_data["phrases"]
+        ]
+        self.phrase_matcher = PhraseMatcher(entries)
+        self.fuzzy_index = FuzzyIndex(entries)
+
+        # Förkompilera svarsmallarna och samla fel så att de rapporteras vid laddning
+        self.template_errors = []
+        self.templates = MappingProxyType({
+            command_type: compile_template(command_data["response"], self.template_errors)
+            for command_type, command_data in self.commands.items()
+        })
+        self._bound_templates = {}
+
+    def templates_for(self, chatbot_name):
+        """
+        Returnerar mallarna med chatbotens namn redan insatt.
+
+        Args:
+            chatbot_name (str): Namnet som ersätter {name}
+
+        Returns:
+            Mapping: Kommandotyp -> ResponseTemplate
+        """
+        templates = self._bound_templates.get(chatbot_name)
+        if templates is None:
+            templates = MappingProxyType({
+                command_type: template.bind(name=chatbot_name)
+                for command_type, template in self.templates.items()
+            })
+            self._bound_templates[chatbot_name] = templates
+        return templates
+
+
+class ResponseSet:
+    """
+    Oföränderlig ögonblicksbild av responses.json.
+    """
+
+    def __init__(self, responses, mtime=None):
+        """
+        Initierar en ny ögonblicksbild.
+
+        Args:
+            responses (dict): Validerade svarskategorier från responses.json
+            mtime (float): Filens ändringstid vid inläsningen
+        """
+        self.responses = freeze(responses)
+        self.mtime = mtime
+
+        # Fallback hålls utanför indexet så att den aldrig behöver hoppas över vid
+        # matchning. Kategorier utan svar kan aldrig ge ett svar och indexeras inte heller.
+        entries = [
+            (phrase, category)
+            for category, content in self.responses.items()
+            if category != "fallback" and content["responses"]
+            for phrase in content["phrases"]
+        ]
+        self.phrase_index = NGramIndex(entries)
+        self.fuzzy_index = FuzzyIndex(entries)
+
+        # Förkompilera svarsmallarna och samla fel så att de rapporteras vid laddning
+        self.template_errors = []
+        self.templates = MappingProxyType({
+            category: tuple(compile_template(response, self.template_errors)
+                            for response in content["responses"])
+            for category, content in self.responses.items()
+        })
+        self._bound_templates = {}
+
+    def templates_for(self, chatbot_name):
+        """
+        Returnerar mallarna med chatbotens namn redan insatt.
+
+        Args:
+            chatbot_name (str): Namnet som ersätter {name}
+
+        Returns:
+            Mapping: Kategori -> tupel av ResponseTemplate
+        """
+        templates = self._bound_templates.get(chatbot_name)
+        if templates is None:
+            templates = MappingProxyType({
+                category: tuple(template.bind(name=chatbot_name) for template in category_templates)
+                for category, category_templates in self.templates.items()
+            })
+            self._bound_templates[chatbot_name] = templates
+        return templates
+
+
+class DataRegistry:
+    """
+    Laddar och håller de delade ögonblicksbilderna av kommandon och svar.
+    """
+
+    def __init__(self, data_dir=None, check_interval=1.0):
+        """
+        Initierar registret.
+
+        Args:
+            data_dir (str): Mappen med JSON-filerna, standard är projektets data-mapp
+            check_interval (float): Minsta antal sekunder mellan kontroller av filernas mtime
+        """
+        if data_dir is None:
+            script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            data_dir = os.path.join(script_dir, 'data')
+
+        self.commands_path = os.path.join(data_dir, 'commands.json')
+        self.responses_path = os.path.join(data_dir, 'responses.json')
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._commands = None
+        self._responses = None
+        self._last_check = {}
+        self._seen_mtime = {}
+
+    def get_commands(self):
+        """
+        Returnerar den aktuella ögonblicksbilden av kommandona.
+
+        Returns:
+            CommandSet: Kommandon och frasindex
+        """
+        with self._lock:
+            if self._is_stale(self.commands_path, self._commands):
+                self._commands = self._load_commands(self._commands)
+            return self._commands
+
+    def get_responses(self):
+        """
+        Returnerar den aktuella ögonblicksbilden av svaren.
+
+        Returns:
+            ResponseSet: Svarskategorierna
+        """
+        with self._lock:
+            if self._is_stale(self.responses_path, self._responses):
+                self._responses = self._load_responses(self._responses)
+            return self._responses
+
+    def reload(self):
+        """
+        Tvingar fram en ny inläsning av båda filerna vid nästa åtkomst.
+        """
+        with self._lock:
+            self._commands = None
+            self._responses = None
+            self._last_check = {}
+            self._seen_mtime = {}
+
+    def _is_stale(self, path, snapshot):
+        """
+        Kontrollerar om en ögonblicksbild behöver läsas in på nytt.
+
+        Args:
+            path (str): Sökvägen till JSON-filen
+            snapshot: Nuvarande ögonblicksbild eller None
+
+        Returns:
+            bool: True om filen behöver läsas in
+        """
+        if snapshot is None:
+            return True
+
+        # Begränsa hur ofta filsystemet frågas
+        now = time.monotonic()
+        if now - self._last_check.get(path, 0.0) < self.check_interval:
+            return False
+        self._last_check[path] = now
+
+        # Jämför mot senast lästa version, även om den var trasig,
+        # så att en felaktig fil inte läses om vid varje kontroll
+        try:
+            return os.path.getmtime(path) != self._seen_mtime.get(path)
+        except OSError:
+            return False
+
+    def _read_json(self, path):
+        """
+        Läser en JSON-fil tillsammans med dess ändringstid.
+
+        Args:
+            path (str): Sökvägen till filen
+
+        Returns:
+            tuple: (data, mtime)
+        """
+        mtime = os.path.getmtime(path)
+        self._seen_mtime[path] = mtime
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        self._last_check[path] = time.monotonic()
+        return data, mtime
+
+    def _load_commands(self, previous):
+        """
+        Läser in och validerar commands.json.
+
+        Args:
+            previous (CommandSet): Tidigare ögonblicksbild, behålls om filen är trasig
+
+        Returns:
+            CommandSet: Den nya ögonblicksbilden
+        """
+        try:
+            data, mtime = self._read_json(self.commands_path)
+            commands = validate_commands(data.get("commands", {}))
+            command_set = CommandSet(commands, mtime)
+            for error in command_set.template_errors:
+                logger.warning("Ogiltig mall i commands.json: %s", error)
+            logger.info("Laddade %d kommandon från commands.json", len(commands))
+            return command_set
+        except Exception as e:
+            logger.error("Kunde inte ladda kommandon från fil: %s", e)
+            return previous if previous is not None else CommandSet({})
+
+    def _load_responses(self, previous):
+        """
+        Läser in och validerar responses.json.
+
+        Args:
+            previous (ResponseSet): Tidigare ögonblicksbild, behålls om filen är trasig
+
+        Returns:
+            ResponseSet: Den nya ögonblicksbilden
+        """
+        try:
+            data, mtime = self._read_json(self.responses_path)
+            responses = validate_responses(data.get("responses", {}))
+            response_set = ResponseSet(responses, mtime)
+            for error in response_set.template_errors:
+                logger.warning("Ogiltig mall i responses.json: %s", error)
+            logger.info("Laddade %d svarskategorier från responses.json", len(responses))
+            return response_set
+        except Exception as e:
+            logger.error("Kunde inte ladda svar från fil: %s", e)
+            return previous if previous is not None else ResponseSet(DEFAULT_RESPONSES)
+
+
+def validate_commands(commands):
+    """
+    Kontrollerar strukturen i commands.json och hoppar över ogiltiga kommandon.
+
+    Args:
+        commands (dict): Kommandon som de lästes från filen
+
+    Returns:
+        dict: Giltiga kommandon med normaliserade fält
+    """
+    if not isinstance(commands, dict):
+        raise ValueError("'commands' måste vara ett objekt")
+
+    valid = {}
+    for command_type, command_data in commands.items():
+        if not isinstance(command_data, dict):
+            logger.warning("Hoppar över kommandot '%s': måste vara ett objekt", command_type)
+            continue
+
+        phrases = command_data.get("phrases", [])
+        if not isinstance(phrases, list) or not all(isinstance(p, str) for p in phrases):
+            logger.warning("Hoppar över kommandot '%s': 'phrases' måste vara en lista med strängar", command_type)
+            continue
+
+        valid[command_type] = dict(
+            command_data,
+            phrases=phrases,
+            action=str(command_data.get("action", "")),
+            response=str(command_data.get("response", ""))
+        )
+    return valid
+
+
+def validate_responses(responses):
+    """
+    Kontrollerar strukturen i responses.json och hoppar över ogiltiga kategorier.
+
+    Args:
+        responses (dict): Svarskategorier som de lästes från filen
+
+    Returns:
+        dict: Giltiga svarskategorier med normaliserade fält
+    """
+    if not isinstance(responses, dict):
+        raise ValueError("'responses' måste vara ett objekt")
+
+    valid = {}
+    for category, content in responses.items():
+        if not isinstance(content, dict):
+            logger.warning("Hoppar över kategorin '%s': måste vara ett objekt", category)
+            continue
+
+        phrases = content.get("phrases", [])
+        responses_list = content.get("responses", [])
+        if not all(isinstance(value, list) and all(isinstance(item, str) for item in value)
+                   for value in (phrases, responses_list)):
+            logger.warning("Hoppar över kategorin '%s': 'phrases' och 'responses' måste vara listor med strängar", category)
+            continue
+
+        valid[category] = dict(content, phrases=phrases, responses=responses_list)
+    return valid
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Returnerar processens gemensamma registerinstans.
+
+    Returns:
+        DataRegistry: Det delade registret
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DataRegistry()
+        return _registry
@@ -2,9 +2,8 @@
 Modul för att hantera konversationsmönster och svar i Nova chatbot.
 """
 
-import json
-import os
 import random
+from nova.registry import get_registry
 
 
 class ResponseHandler:
@@ -12,83 +11,81 @@ class ResponseHandler:
     Hanterar matchning av användarinput mot fördefinierade fraser och genererar lämpliga svar.
     """
     
-    def __init__(self, chatbot_name="NOVA"):
+    def __init__(self, chatbot_name="NOVA", registry=None, fuzzy_distance=0):
         """
         Initierar ResponseHandler.
         
         Args:
             chatbot_name (str): Namn på chatboten, används för formatering av svar
+            registry (DataRegistry): Register med svar, standard är processens delade register
+            fuzzy_distance (int): Största redigeringsavstånd vid ungefärlig matchning, 0 stänger av den
         """
         self.chatbot_name = chatbot_name
-        self.responses = self._load_responses()
-        
-    def _load_responses(self):
+        self.fuzzy_distance = fuzzy_distance
+        self.registry = registry or get_registry()
+        self.registry.get_responses()
+    
+    @property
+    def responses(self):
+        """Svarskategorierna från responses.json, skrivskyddade och delade mellan hanterare."""
+        return self.registry.get_responses().responses
+    
+    def get_response(self, user_input):
         """
-        Laddar fördefinierade svar från JSON-filen.
+        Matchar användarinput mot fördefinierade fraser och genererar ett svar.
         
+        Args:
+            user_input (str): Användarens input, förväntas vara förbehandlad (lowercase, strip, etc.)
+            
         Returns:
-            dict: Ett lexikon med svarsmönster
+            str: Ett lämpligt svar baserat på input
         """
-        try:
-            # Hitta den korrekta sökvägen till responses.json
-            script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            file_path = os.path.join(script_dir, 'data', 'responses.json')
-            
-            with open(file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                responses = data.get("responses", {})
-                print(f"Laddade {len(responses)} svarskategorier från responses.json")
-                return responses
-                
-        except Exception as e:
-            print(f"Kunde inte ladda svar från fil: {e}")
-            # Returnera ett enkelt standardsvar om filen inte kunde laddas
-            return {
-                "greetings": {
-                    "phrases": ["hej"],
-                    "responses": ["Hej!"]
-                },
-                "fallback": {
-                    "phrases": [],
-                    "responses": ["Jag förstår inte."]
-                }
-            }
+        return self.response_for(self.match_category(user_input))
     
-    def get_response(self, user_input):
+    def match_category(self, user_input, fuzzy_distance=None):
         """
-        Matchar användarinput mot fördefinierade fraser och genererar ett svar.
+        Hittar den svarskategori som användarinput matchar.
         
         Args:
             user_input (str): Användarens input, förväntas vara förbehandlad (lowercase, strip, etc.)
+            fuzzy_distance (int): Största redigeringsavstånd för just detta anrop, standard är hanterarens
             
         Returns:
-            str: Ett lämpligt svar baserat på input
+            str: Namnet på kategorin, eller None om inget matchade
+        """
+        response_set = self.registry.get_responses()
+        
+        # Slå upp kandidatkategorierna i indexet, den första i filordning vinner
+        category = response_set.phrase_index.first_match(user_input)
+        
+        # Tillåt små avvikelser, t.ex. från taligenkänningen, om ungefärlig matchning är på
+        if fuzzy_distance is None:
+            fuzzy_distance = self.fuzzy_distance
+        if not category and fuzzy_distance:
+            category = response_set.fuzzy_index.first_match(user_input, fuzzy_distance)
+        
+        return category
+    
+    def response_for(self, category):
         """
-        # Gå igenom varje kategori av svar
-        for category, content in self.responses.items():
-            # Undanta fallback-kategorin som hanteras separat
-            if category == "fallback":
-                continue
-                
-            # Kontrollera om input matchar någon fras i denna kategori
-            phrases = content.get("phrases", [])
-            for phrase in phrases:
-                if phrase in user_input:
-                    # Välj ett slumpmässigt svar från denna kategori
-                    responses_list = content.get("responses", [])
-                    if responses_list:
-                        response = random.choice(responses_list)
-                        # Ersätt eventuella variabler i svaret
-                        response = response.replace("{name}", self.chatbot_name)
-                        return response
+        Väljer ett slumpmässigt svar från en kategori.
+        
+        Args:
+            category (str): Kategorin, eller None för ett fallback-svar
+            
+        Returns:
+            str: Det formaterade svaret
+        """
+        templates = self.registry.get_responses().templates_for(self.chatbot_name)
         
         # Om inget matchade, välj ett slumpmässigt fallback-svar
-        if "fallback" in self.responses:
-            fallback_responses = self.responses["fallback"].get("responses", [])
-            if fallback_responses:
-                response = random.choice(fallback_responses)
-                response = response.replace("{name}", self.chatbot_name)
-                return response
+        if category is None or category not in templates:
+            category = "fallback"
+        
+        # Mallarna har redan {name} insatt, så bara valet av svar återstår
+        choices = templates.get(category)
+        if choices:
+            return random.choice(choices).render()
             
         # Om ingen fallback-kategori finns, använd ett standardsvar
-        return f"Jag förstår inte riktigt. Kan du förklara på ett annat sätt?"
\ No newline at end of file
+        return f"Jag förstår inte riktigt. Kan du förklara på ett annat sätt?"
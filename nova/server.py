@@ -0,0 +1,336 @@
+"""
+Modul för Novas serverläge utan grafiskt gränssnitt.
+
+En enkel HTTP-server byggd på asyncio gör Nova.get_response tillgänglig
+för flera klienter samtidigt. Alla sessioner delar samma Nova-instans och
+därmed samma inlästa register, medan kontexten hålls per session. Turerna i en
+session besvaras i den ordning förfrågningarna kom fram. Antalet samtidiga
+svar begränsas, och när för många förfrågningar väntar svarar servern
+direkt med 503 i stället för att låta kön växa.
+
+Protokoll:
+
+    POST /chat   {"text": "...", "session_id": "..."}  ->  {"session_id": ..., "text": ..., "action": ..., "extra_data": ...}
+    GET  /health                                       ->  {"status": "ok", ...}
+
+Utelämnas session_id skapas en ny session, vars id returneras i svaret.
+"""
+
+import asyncio
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from nova.context import SessionQueue
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Största tillåtna storlek på en förfrågans innehåll i byte
+MAX_BODY_SIZE = 64 * 1024
+
+# Största antal huvuden i en förfrågan
+MAX_HEADERS = 100
+
+# Största längd på ett sessions-id
+MAX_SESSION_ID_LENGTH = 128
+
+
+class HTTPError(Exception):
+    """
+    Fel som ska skickas till klienten med en viss statuskod.
+    """
+
+    def __init__(self, status, message, headers=None):
+        """
+        Args:
+            status (HTTPStatus): Statuskoden
+            message (str): Felmeddelandet
+            headers (dict): Extra huvuden i svaret, t.ex. Retry-After
+        """
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class NovaServer:
+    """
+    Asynkron HTTP-server som delar en Nova-instans mellan många sessioner.
+    """
+
+    def __init__(self, chatbot, host=DEFAULT_HOST, port=DEFAULT_PORT, max_concurrent=4, max_pending=32,
+                 request_timeout=30.0):
+        """
+        Initierar servern. Den startar när serve_forever eller start anropas.
+
+        Args:
+            chatbot (Nova): Chatboten som svarar på alla sessioner
+            host (str): Adressen som servern lyssnar på
+            port (int): Porten som servern lyssnar på, 0 väljer en ledig port
+            max_concurrent (int): Antal svar som kan skapas samtidigt
+            max_pending (int): Antal förfrågningar som får vänta på en ledig plats innan servern svarar 503
+            request_timeout (float): Längsta tid i sekunder för att läsa en förfrågan
+        """
+        self.chatbot = chatbot
+        self.host = host
+        self.port = port
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+
+        # Svaren skapas i trådar så att händelseloopen aldrig väntar på matcharna.
+        # Trådpoolens storlek begränsar antalet samtidiga svar, och kön per session
+        # ser till att en följdfråga aldrig besvaras före sin fråga.
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="nova-server")
+        self._turns = SessionQueue(self._executor)
+        self._server = None
+
+        # Antal förfrågningar som skapar svar eller väntar på en plats
+        self._in_flight = 0
+
+        # Räknare för /health
+        self.handled = 0
+        self.rejected = 0
+
+    async def start(self):
+        """
+        Börjar lyssna efter anslutningar.
+        """
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Nova lyssnar på http://%s:%d", self.host, self.port)
+
+    async def serve_forever(self):
+        """
+        Startar servern och kör den tills den avbryts.
+        """
+        await self.start()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def stop(self):
+        """
+        Slutar ta emot anslutningar och stänger trådpoolen.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Hanterar en anslutning, med stöd för flera förfrågningar (keep-alive).
+        """
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.request_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except HTTPError as e:
+                    await self._send(writer, e.status, {"error": e.message}, e.headers, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    status, payload = await self._dispatch(method, path, body)
+                    extra_headers = {}
+                except HTTPError as e:
+                    status, payload, extra_headers = e.status, {"error": e.message}, e.headers
+                except Exception as e:
+                    logger.error("Fel vid hantering av %s %s: %s", method, path, e)
+                    status, payload, extra_headers = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internt fel"}, {}
+
+                await self._send(writer, status, payload, extra_headers, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader):
+        """
+        Läser en HTTP-förfrågan.
+
+        Returns:
+            tuple eller None: (metod, sökväg, huvuden, innehåll), eller None om klienten stängde anslutningen
+        """
+        request_line = await self._read_line(reader, HTTPStatus.BAD_REQUEST)
+        if not request_line:
+            return None
+        try:
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "ogiltig förfrågan")
+
+        headers = {}
+        count = 0
+        while True:
+            line = await self._read_line(reader, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            count += 1
+            if count > MAX_HEADERS:
+                raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "för många huvuden")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "ogiltig Content-Length")
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "ogiltig Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "för stor förfrågan")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path.split("?", 1)[0], headers, body
+
+    async def _read_line(self, reader, status):
+        """
+        Läser en rad ur förfrågan.
+
+        Args:
+            reader (asyncio.StreamReader): Anslutningens läsare
+            status (HTTPStatus): Statuskoden som skickas om raden är för lång
+
+        Returns:
+            bytes: Raden, eller b"" om klienten stängde anslutningen
+        """
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            # Raden är längre än läsarens buffert
+            raise HTTPError(status, "för lång rad i förfrågan")
+
+    async def _dispatch(self, method, path, body):
+        """
+        Väljer hanterare för en förfrågan.
+
+        Returns:
+            tuple: (statuskod, innehåll som JSON-objekt)
+        """
+        if path == "/chat":
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "använd POST", {"Allow": "POST"})
+            return await self._chat(body)
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "använd GET", {"Allow": "GET"})
+            return HTTPStatus.OK, self.stats()
+        raise HTTPError(HTTPStatus.NOT_FOUND, "okänd sökväg")
+
+    async def _chat(self, body):
+        """
+        Skapar Novas svar på ett meddelande.
+
+        Returns:
+            tuple: (statuskod, svaret som JSON-objekt)
+        """
+        try:
+            request = json.loads(body or b"{}")
+        except (ValueError, UnicodeDecodeError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "innehållet är inte giltig JSON")
+
+        text = request.get("text") if isinstance(request, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "fältet text saknas")
+
+        session_id = request.get("session_id") or uuid.uuid4().hex
+        if not isinstance(session_id, str) or len(session_id) > MAX_SESSION_ID_LENGTH:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "ogiltigt session_id")
+
+        # Mottryck: hellre ett snabbt 503 än en kö som växer utan gräns
+        if self._in_flight >= self.max_concurrent + self.max_pending:
+            self.rejected += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "servern är upptagen", {"Retry-After": "1"})
+
+        # Turen köas direkt i händelseloopen, så att ordningen inom sessionen
+        # blir den ordning som förfrågningarna kom fram i
+        self._in_flight += 1
+        try:
+            response = await asyncio.wrap_future(
+                self._turns.submit(session_id, self.chatbot.get_response, text, session_id)
+            )
+        finally:
+            self._in_flight -= 1
+
+        self.handled += 1
+        if isinstance(response, dict):
+            payload = {
+                "session_id": session_id,
+                "text": response.get("text"),
+                "action": response.get("action"),
+                "extra_data": response.get("extra_data"),
+            }
+        else:
+            payload = {"session_id": session_id, "text": response, "action": None, "extra_data": None}
+        return HTTPStatus.OK, payload
+
+    def stats(self):
+        """
+        Returnerar serverns status.
+
+        Returns:
+            dict: Belastning, räknare och cachestatistik
+        """
+        return {
+            "status": "ok",
+            "in_flight": self._in_flight,
+            "max_concurrent": self.max_concurrent,
+            "max_pending": self.max_pending,
+            "handled": self.handled,
+            "rejected": self.rejected,
+            "sessions": len(self.chatbot.contexts),
+            "cache": self.chatbot.cache_stats(),
+        }
+
+    async def _send(self, writer, status, payload, headers=None, keep_alive=True):
+        """
+        Skickar ett JSON-svar.
+        """
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+def run_server(chatbot, host=DEFAULT_HOST, port=DEFAULT_PORT, max_concurrent=4, max_pending=32):
+    """
+    Kör servern tills programmet avbryts med Ctrl+C.
+
+    Args:
+        chatbot (Nova): Chatboten som delas mellan alla sessioner
+        host (str): Adressen som servern lyssnar på
+        port (int): Porten som servern lyssnar på
+        max_concurrent (int): Antal svar som kan skapas samtidigt
+        max_pending (int): Antal förfrågningar som får vänta innan servern svarar 503
+    """
+    server = NovaServer(chatbot, host, port, max_concurrent=max_concurrent, max_pending=max_pending)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("Servern avslutas")
@@ -0,0 +1,137 @@
+"""
+Modul för förkompilerade svarsmallar i Nova chatbot.
+
+Mallarna i commands.json och responses.json tolkas en gång när filerna laddas.
+Statiska platshållare som {name} ersätts direkt, så att bara dynamiska
+platshållare som {time}, {website} och {app} återstår när ett svar skapas.
+"""
+
+import re
+
+
+# Platshållare som är kända när mallen laddas respektive när svaret skapas
+STATIC_PLACEHOLDERS = frozenset({"name"})
+DYNAMIC_PLACEHOLDERS = frozenset({"time", "website", "app"})
+
+PLACEHOLDER_PATTERN = re.compile(r"\{([^{}]*)\}")
+
+
+class TemplateError(ValueError):
+    """
+    Fel som uppstår när en mall innehåller okända platshållare.
+    """
+
+
+class ResponseTemplate:
+    """
+    En förkompilerad svarsmall.
+
+    Mallen lagras som en tupel av delar där strängar är fast text och
+    en-elements-tupler är namnet på en dynamisk platshållare.
+    """
+
+    __slots__ = ("source", "parts", "slots", "text")
+
+    def __init__(self, source, parts):
+        """
+        Initierar en mall. Använd compile_template för att skapa mallar.
+
+        Args:
+            source (str): Originaltexten från JSON-filen
+            parts (tuple): Mallens delar
+        """
+        self.source = source
+        self.parts = parts
+        self.slots = frozenset(part[0] for part in parts if isinstance(part, tuple))
+
+        # Mallar utan dynamiska platshållare är färdiga strängar
+        self.text = "".join(parts) if not self.slots else None
+
+    def bind(self, **values):
+        """
+        Ersätter statiska platshållare och returnerar en ny mall.
+
+        Args:
+            **values: Värden för platshållarna, t.ex. name="NOVA"
+
+        Returns:
+            ResponseTemplate: Mallen med värdena insatta
+        """
+        parts = []
+        for part in self.parts:
+            if isinstance(part, tuple) and part[0] in values:
+                part = str(values[part[0]])
+            if parts and isinstance(part, str) and isinstance(parts[-1], str):
+                parts[-1] += part
+            else:
+                parts.append(part)
+        return ResponseTemplate(self.source, tuple(parts))
+
+    def render(self, **values):
+        """
+        Skapar den färdiga svarstexten.
+
+        Platshållare utan värde lämnas kvar som de står i mallen.
+
+        Args:
+            **values: Värden för de dynamiska platshållarna
+
+        Returns:
+            str: Den färdiga texten
+        """
+        if self.text is not None:
+            return self.text
+
+        return "".join(
+            part if isinstance(part, str) else str(values.get(part[0], "{" + part[0] + "}"))
+            for part in self.parts
+        )
+
+
+def compile_template(source, errors=None):
+    """
+    Tolkar en mall och kontrollerar dess platshållare.
+
+    Args:
+        source (str): Mallen, t.ex. "Klockan är {time}."
+        errors (list): Om angiven samlas fel här och okända platshållare
+                       behålls som vanlig text i stället för att ett undantag kastas
+
+    Returns:
+        ResponseTemplate: Den kompilerade mallen
+
+    Raises:
+        TemplateError: Om mallen innehåller okända platshållare och errors saknas
+    """
+    parts = []
+    unknown = []
+    position = 0
+
+    for match in PLACEHOLDER_PATTERN.finditer(source):
+        name = match.group(1)
+        if name not in STATIC_PLACEHOLDERS and name not in DYNAMIC_PLACEHOLDERS:
+            unknown.append(match.group(0))
+            continue
+        if match.start() > position:
+            parts.append(source[position:match.start()])
+        parts.append((name,))
+        position = match.end()
+
+    if unknown:
+        message = f"okända platshållare {', '.join(unknown)} i '{source}'"
+        if errors is None:
+            raise TemplateError(message)
+        errors.append(message)
+
+    if position < len(source):
+        parts.append(source[position:])
+
+    # Slå ihop intilliggande text så att render gör så lite arbete som möjligt
+    merged = []
+    for part in parts:
+        if merged and isinstance(part, str) and isinstance(merged[-1], str):
+            merged[-1] += part
+        else:
+            merged.append(part)
+
+    return ResponseTemplate(source, tuple(merged))
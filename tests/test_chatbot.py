@@ -0,0 +1,41 @@
+"""
+Tester för Nova.get_response.
+
+Körs från projektets rot:
+    python -m pytest tests
+"""
+
+import unittest
+
+from nova.chatbot import Nova
+
+
+class VoiceFuzzyMatchingTest(unittest.TestCase):
+    """
+    Taligenkänd text matchas ungefärligt även när skrivna meddelanden inte gör det.
+    """
+
+    def setUp(self):
+        self.nova = Nova()
+
+    def action(self, text, **options):
+        response = self.nova.get_response(text, **options)
+        return response.get("action") if isinstance(response, dict) else None
+
+    def test_misrecognized_voice_command_resolves(self):
+        self.assertEqual(self.action("vad är klocka", fuzzy_distance=2), "show_time")
+        self.assertEqual(self.action("nova är du dar", fuzzy_distance=2), "activate_voice")
+
+    def test_typed_input_stays_exact(self):
+        self.assertIsNone(self.action("vad är klocka"))
+        self.assertIsNone(self.action("nova är du dar"))
+
+    def test_cache_does_not_mix_fuzzy_and_exact(self):
+        # En skriven miss får inte cachas som svaret på samma text från rösten, och tvärtom
+        self.assertIsNone(self.action("nova är du dar"))
+        self.assertEqual(self.action("nova är du dar", fuzzy_distance=2), "activate_voice")
+        self.assertIsNone(self.action("nova är du dar"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+Tester för kommandomatchningen i CommandHandler.
+
+Körs från projektets rot:
+    python -m pytest tests
+"""
+
+import unittest
+
+from nova.commands import CommandHandler
+
+
+class FuzzyMatchingTest(unittest.TestCase):
+    """
+    Ungefärlig matchning får bara användas när ingen exakt matchning finns.
+    """
+
+    def setUp(self):
+        self.handler = CommandHandler(fuzzy_distance=2)
+
+    def assertAction(self, text, expected):
+        action, _, _ = self.handler.check_command(text)
+        self.assertEqual(action, expected, text)
+
+    def test_exact_keyword_wins_over_fuzzy_phrase(self):
+        self.assertAction("visa datum", "show_date")
+        self.assertAction("visa tärning", "roll_dice")
+        self.assertAction("hjälp tid", "show_time")
+
+    def test_same_result_as_without_fuzzy(self):
+        exact = CommandHandler()
+        for text in ("visa datum", "visa tärning", "hjälp tid", "vad är klockan"):
+            self.assertEqual(self.handler.check_command(text)[0], exact.check_command(text)[0], text)
+
+    def test_fuzzy_is_last_resort(self):
+        self.assertAction("vad är klocka", "show_time")
+        self.assertAction("nova är du dar", "activate_voice")
+
+
+if __name__ == "__main__":
+    unittest.main()
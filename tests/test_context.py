@@ -0,0 +1,81 @@
+"""
+Tester för sessionernas kontext och turordning.
+
+Körs från projektets rot:
+    python -m pytest tests
+"""
+
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from nova.chatbot import Nova
+from nova.context import SessionQueue
+
+
+class SlowAntecedentNova(Nova):
+    """
+    Nova där frågan före en följdfråga tar längre tid än följdfrågan,
+    så att en trådpool utan ordning skulle besvara följdfrågan först.
+    """
+
+    def get_response(self, user_input, session_id=None, fuzzy_distance=None):
+        if user_input == "datum":
+            time.sleep(0.2)
+        return super().get_response(user_input, session_id, fuzzy_distance)
+
+
+class SessionQueueTest(unittest.TestCase):
+    """
+    Turerna i en session körs i inskickad ordning.
+    """
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.turns = SessionQueue(self.executor)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+
+    def test_follow_up_submitted_at_same_moment_resolves(self):
+        nova = SlowAntecedentNova()
+        first = self.turns.submit("a", nova.get_response, "datum", "a")
+        follow_up = self.turns.submit("a", nova.get_response, "och imorgon?", "a")
+
+        self.assertEqual(first.result(timeout=5)["action"], "show_date")
+        response = follow_up.result(timeout=5)
+        self.assertEqual(response["action"], "show_date")
+        self.assertEqual(response["extra_data"]["day_offset"], 1)
+
+    def test_turns_in_one_session_run_in_order(self):
+        order = []
+
+        def turn(number):
+            # Tidiga turer tar längst tid
+            time.sleep(0.01 * (5 - number))
+            order.append(number)
+
+        futures = [self.turns.submit("a", turn, number) for number in range(5)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(order, list(range(5)))
+        self.assertEqual(len(self.turns), 0)
+
+    def test_sessions_run_in_parallel(self):
+        started = threading.Barrier(2, timeout=5)
+        first = self.turns.submit("a", started.wait)
+        second = self.turns.submit("b", started.wait)
+        first.result(timeout=5)
+        second.result(timeout=5)
+
+    def test_exception_does_not_block_session(self):
+        failed = self.turns.submit("a", lambda: 1 / 0)
+        after = self.turns.submit("a", lambda: "klar")
+        with self.assertRaises(ZeroDivisionError):
+            failed.result(timeout=5)
+        self.assertEqual(after.result(timeout=5), "klar")
+
+
+if __name__ == "__main__":
+    unittest.main()
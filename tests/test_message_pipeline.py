@@ -0,0 +1,70 @@
+"""
+Tester för MessagePipeline.
+
+Körs från projektets rot:
+    python -m pytest tests
+"""
+
+import unittest
+
+from nova.chatbot import Nova
+from tests.test_context import SlowAntecedentNova
+from ui.message_pipeline import MessagePipeline
+
+
+def run_now(callback, *args):
+    """Kör leveransen direkt i stället för i gränssnittets tråd."""
+    callback(*args)
+
+
+class VoiceOptionsTest(unittest.TestCase):
+    """
+    Röstturer skickar sina matchningsinställningar genom pipelinen till Nova.
+    """
+
+    def test_misrecognized_voice_command_resolves(self):
+        nova = Nova()
+        pipeline = MessagePipeline(nova.get_response, run_now)
+        try:
+            future = pipeline.submit("vad är klocka", lambda future: None, fuzzy_distance=2)
+            self.assertEqual(future.result(timeout=5)["action"], "show_time")
+        finally:
+            pipeline.shutdown()
+
+
+class SessionOrderTest(unittest.TestCase):
+    """
+    Meddelanden i samma session behandlas och levereras i inskickad ordning.
+    """
+
+    def setUp(self):
+        self.nova = SlowAntecedentNova()
+        self.pipeline = MessagePipeline(self.nova.get_response, run_now)
+
+    def tearDown(self):
+        self.pipeline.shutdown()
+
+    def test_follow_up_submitted_at_same_moment_resolves(self):
+        delivered = []
+        first = self.pipeline.submit("datum", delivered.append, session_id="s")
+        follow_up = self.pipeline.submit("och imorgon?", delivered.append, session_id="s")
+
+        response = follow_up.result(timeout=5)
+        self.assertEqual(response["action"], "show_date")
+        self.assertEqual(response["extra_data"]["day_offset"], 1)
+        self.assertEqual(delivered, [first, follow_up])
+
+    def test_side_effects_happen_in_submission_order(self):
+        futures = [
+            self.pipeline.submit(text, lambda future: None, session_id=self.nova.session_id)
+            for text in ("datum", "hej", "vad är klockan")
+        ]
+        for future in futures:
+            future.result(timeout=5)
+
+        # Kontexten går igenom turerna med den senaste först
+        pushed = [entry.text for entry in self.nova.context]
+        self.assertEqual(pushed, ["vad är klockan", "hej", "datum"])
+
+if __name__ == "__main__":
+    unittest.main()
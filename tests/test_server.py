@@ -0,0 +1,40 @@
+"""
+Tester för Novas serverläge.
+
+Körs från projektets rot:
+    python -m pytest tests
+"""
+
+import asyncio
+import json
+import unittest
+
+from nova.server import NovaServer
+from tests.test_context import SlowAntecedentNova
+
+
+class SessionOrderTest(unittest.IsolatedAsyncioTestCase):
+    """
+    Förfrågningar i samma session besvaras i den ordning de kom fram.
+    """
+
+    async def asyncSetUp(self):
+        self.server = NovaServer(SlowAntecedentNova(), port=0)
+
+    async def asyncTearDown(self):
+        await self.server.stop()
+
+    def chat(self, text, session_id):
+        return self.server._chat(json.dumps({"text": text, "session_id": session_id}).encode("utf-8"))
+
+    async def test_follow_up_sent_at_same_moment_resolves(self):
+        (_, first), (_, follow_up) = await asyncio.gather(
+            self.chat("datum", "s"), self.chat("och imorgon?", "s")
+        )
+        self.assertEqual(first["action"], "show_date")
+        self.assertEqual(follow_up["action"], "show_date")
+        self.assertEqual(follow_up["extra_data"]["day_offset"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,531 @@
+"""
+Modul för ljudinspelning i Nova chatbot.
+
+Mikrofonen öppnas en gång och läses av en bakgrundstråd till en ringbuffert.
+Taligenkänningen läser sedan från bufferten i stället för att öppna enheten
+på nytt för varje lyssning, så att inget ljud tappas mellan två lyssningar.
+
+Modulen innehåller även enkla ljudegenskaper per ram (energi och
+nollgenomgångar) som används av den lokala väckordsdetektorn och av
+röstaktivitetsdetektorn, samt en ljudkälla som spelar upp WAV-filer i
+stället för mikrofonen.
+"""
+
+import array
+import collections
+import math
+import sys
+import threading
+import time
+import speech_recognition as sr
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class CaptureStream:
+    """
+    Långlivad inspelning från mikrofonen till en ringbuffert.
+
+    Bufferten numrerar varje block med ett löpnummer, så att flera läsare
+    kan följa strömmen var för sig utan att ta bort något för varandra.
+    """
+
+    def __init__(self, microphone=None, buffer_seconds=10.0):
+        """
+        Initierar strömmen. Mikrofonen öppnas först när start anropas.
+
+        Args:
+            microphone (sr.AudioSource): Ljudkällan, standard är systemets mikrofon
+            buffer_seconds (float): Hur många sekunder ljud ringbufferten rymmer
+        """
+        self.microphone = microphone or sr.Microphone()
+        self.buffer_seconds = buffer_seconds
+
+        self._condition = threading.Condition()
+        self._chunks = collections.deque()
+        self._next_index = 0
+        self._thread = None
+        self._running = False
+        self._microphone_open = False
+        self.error = None
+
+    @property
+    def sample_rate(self):
+        """Samplingsfrekvens i Hz."""
+        return self.microphone.SAMPLE_RATE
+
+    @property
+    def sample_width(self):
+        """Antal byte per sampel."""
+        return self.microphone.SAMPLE_WIDTH
+
+    @property
+    def chunk_size(self):
+        """Antal sampel per block."""
+        return self.microphone.CHUNK
+
+    @property
+    def chunk_seconds(self):
+        """Längden på ett block i sekunder."""
+        return self.chunk_size / self.sample_rate
+
+    @property
+    def running(self):
+        """True om inspelningen pågår."""
+        return self._running
+
+    def start(self):
+        """
+        Öppnar mikrofonen och startar inspelningstråden. Gör inget om den redan körs.
+        """
+        with self._condition:
+            if self._running:
+                return
+            opened = self._microphone_open
+        if opened:
+            # Inspelningen avbröts utan att mikrofonen stängdes, den måste stängas innan den öppnas igen
+            self._close_microphone()
+
+        with self._condition:
+            if self._running:
+                return
+            self.microphone.__enter__()
+            self._microphone_open = True
+            self._chunks = collections.deque(maxlen=max(1, int(self.buffer_seconds / self.chunk_seconds)))
+            self.error = None
+            self._running = True
+
+        self._thread = threading.Thread(target=self._capture, name="nova-capture", daemon=True)
+        self._thread.start()
+        logger.info("Mikrofonen är öppen (%d Hz)", self.sample_rate)
+
+    def stop(self):
+        """
+        Stoppar inspelningen och stänger mikrofonen.
+        """
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify_all()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+        self._close_microphone()
+
+    def _close_microphone(self):
+        """
+        Stänger mikrofonen om den är öppen.
+        """
+        with self._condition:
+            if not self._microphone_open:
+                return
+            self._microphone_open = False
+
+        try:
+            self.microphone.__exit__(None, None, None)
+        except Exception as e:
+            logger.warning("Kunde inte stänga mikrofonen: %s", e)
+
+    def _capture(self):
+        """
+        Inspelningstrådens huvudloop.
+        """
+        stream = self.microphone.stream
+        try:
+            while self._running:
+                data = stream.read(self.chunk_size)
+                with self._condition:
+                    self._chunks.append((self._next_index, data))
+                    self._next_index += 1
+                    self._condition.notify_all()
+        except Exception as e:
+            logger.error("Inspelningen från mikrofonen avbröts: %s", e)
+            with self._condition:
+                self.error = e
+                self._running = False
+                self._condition.notify_all()
+            # Stäng mikrofonen så att den kan öppnas igen vid nästa lyssning
+            self._close_microphone()
+
+    @property
+    def live_index(self):
+        """Löpnumret för nästa block som kommer att spelas in."""
+        with self._condition:
+            return self._next_index
+
+    def read(self, index, timeout=None):
+        """
+        Hämtar ett block ur bufferten.
+
+        Om blocket redan har skrivits över returneras det äldsta blocket som finns kvar.
+
+        Args:
+            index (int): Löpnumret för blocket
+            timeout (float): Längsta väntetid på nytt ljud i sekunder
+
+        Returns:
+            tuple: (löpnummer, ljuddata), eller (index, None) om inget ljud kom i tid
+
+        Raises:
+            OSError: Om inspelningen har stoppats
+        """
+        with self._condition:
+            while index >= self._next_index:
+                if not self._running:
+                    raise OSError(f"Inspelningen är stoppad: {self.error}" if self.error else "Inspelningen är stoppad")
+                if not self._condition.wait(timeout):
+                    return index, None
+
+            oldest = self._chunks[0][0]
+            position = max(index, oldest)
+            return self._chunks[position - oldest]
+
+    def open_source(self, max_lag=1.0):
+        """
+        Skapar en ljudkälla som läser från strömmen och kan ges till sr.Recognizer.
+
+        Args:
+            max_lag (float): Hur många sekunder efter realtid källan får ligga
+
+        Returns:
+            BufferedSource: Den nya källan
+        """
+        self.start()
+        return BufferedSource(self, max_lag)
+
+
+class _BufferedReader:
+    """
+    Läsare med egen position i en CaptureStream, med samma gränssnitt som pyaudios ström.
+    """
+
+    def __init__(self, capture, max_lag):
+        self.capture = capture
+        self.max_lag_chunks = max(1, int(max_lag / capture.chunk_seconds))
+        self.position = capture.live_index
+
+    def skip_to_live(self):
+        """Hoppar över allt ljud som redan har spelats in."""
+        self.position = self.capture.live_index
+
+    def catch_up(self):
+        """Hoppar fram så att läsaren ligger högst max_lag efter realtid."""
+        self.position = max(self.position, self.capture.live_index - self.max_lag_chunks)
+
+    def read(self, size):
+        """
+        Läser nästa block från strömmen.
+
+        Args:
+            size (int): Antal sampel, ignoreras eftersom blocken redan har fast storlek
+
+        Returns:
+            bytes: Ljuddata
+        """
+        index, data = self.capture.read(self.position)
+        self.position = index + 1
+        return data
+
+    def read_chunk(self, timeout):
+        """
+        Läser nästa block om det kommer inom tidsgränsen.
+
+        Args:
+            timeout (float): Längsta väntetid i sekunder
+
+        Returns:
+            bytes: Ljuddata, eller None om inget nytt ljud kom i tid
+        """
+        index, data = self.capture.read(self.position, timeout)
+        if data is not None:
+            self.position = index + 1
+        return data
+
+
+class BufferedSource(sr.AudioSource):
+    """
+    Ljudkälla för speech_recognition som läser från en CaptureStream.
+
+    Källan behöver inte öppnas och stängas med with, eftersom mikrofonen redan
+    är öppen. Flera anrop till recognizer.listen fortsätter där förra slutade.
+    """
+
+    def __init__(self, capture, max_lag=1.0):
+        """
+        Initierar källan.
+
+        Args:
+            capture (CaptureStream): Strömmen att läsa från
+            max_lag (float): Hur många sekunder efter realtid källan får ligga
+                             när en ny lyssning börjar
+        """
+        self.capture = capture
+        self.SAMPLE_RATE = capture.sample_rate
+        self.SAMPLE_WIDTH = capture.sample_width
+        self.CHUNK = capture.chunk_size
+        self.stream = _BufferedReader(capture, max_lag)
+
+    def __enter__(self):
+        """Källan är alltid öppen, så with gör ingenting."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stänger inte mikrofonen, den delas med andra läsare."""
+        return None
+
+    def skip_to_live(self):
+        """
+        Hoppar över buffrat ljud, t.ex. efter att Nova själv har pratat.
+        """
+        self.stream.skip_to_live()
+
+    def catch_up(self):
+        """
+        Hoppar fram till högst max_lag efter realtid inför en ny lyssning.
+        """
+        self.stream.catch_up()
+
+
+def frame_features(data, sample_rate, frame_seconds=0.02):
+    """
+    Delar upp 16-bitars PCM-ljud i korta ramar och beräknar enkla egenskaper per ram.
+
+    Args:
+        data (bytes): Råa sampel, 16 bitar little endian, en kanal
+        sample_rate (int): Samplingsfrekvens i Hz
+        frame_seconds (float): Ramlängd i sekunder
+
+    Returns:
+        list: Par av (RMS-energi, nollgenomgångar per sampel) per ram
+    """
+    samples = array.array("h")
+    samples.frombytes(data[:len(data) - len(data) % 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+
+    frame_length = max(1, int(sample_rate * frame_seconds))
+    features = []
+    for start in range(0, len(samples) - frame_length + 1, frame_length):
+        frame = samples[start:start + frame_length]
+        energy = math.sqrt(sum(sample * sample for sample in frame) / frame_length)
+        crossings = sum(1 for a, b in zip(frame, frame[1:]) if (a < 0) != (b < 0))
+        features.append((energy, crossings / frame_length))
+    return features
+
+
+def audio_features(audio, frame_seconds=0.02):
+    """
+    Beräknar ramegenskaper för ett AudioData-objekt från speech_recognition.
+
+    Args:
+        audio (sr.AudioData): Ljudet
+        frame_seconds (float): Ramlängd i sekunder
+
+    Returns:
+        list: Par av (RMS-energi, nollgenomgångar per sampel) per ram
+    """
+    return frame_features(audio.get_raw_data(convert_width=2), audio.sample_rate, frame_seconds)
+
+
+class VoiceActivityDetector:
+    """
+    Enkel röstaktivitetsdetektor baserad på energi och nollgenomgångar per ram.
+
+    Tonande tal har hög energi och relativt få nollgenomgångar, medan brus och
+    väsande bakgrundsljud har många. Segment utan tal kastas, och segment med tal
+    kortas till den del där någon faktiskt pratar.
+    """
+
+    def __init__(self, frame_seconds=0.02, min_speech_seconds=0.1, padding_seconds=0.2,
+                 max_zero_crossings=0.3, noise_ratio=2.0, min_energy=50.0):
+        """
+        Initierar detektorn.
+
+        Args:
+            frame_seconds (float): Ramlängd i sekunder
+            min_speech_seconds (float): Minsta mängd tal för att segmentet ska behållas
+            padding_seconds (float): Marginal som behålls före och efter talet
+            max_zero_crossings (float): Högsta andel nollgenomgångar per sampel för tonande tal
+            noise_ratio (float): Hur mycket starkare än bakgrundsnivån en ram måste vara
+                                 när ingen energitröskel anges
+            min_energy (float): Lägsta energitröskel som någonsin används
+        """
+        self.frame_seconds = frame_seconds
+        self.min_speech_frames = max(1, int(min_speech_seconds / frame_seconds))
+        self.padding_frames = int(padding_seconds / frame_seconds)
+        self.max_zero_crossings = max_zero_crossings
+        self.noise_ratio = noise_ratio
+        self.min_energy = min_energy
+
+    def speech_frames(self, features, energy_threshold=None):
+        """
+        Avgör vilka ramar som innehåller tal.
+
+        Args:
+            features (list): Par av (RMS-energi, nollgenomgångar) per ram
+            energy_threshold (float): Energitröskel, t.ex. recognizer.energy_threshold.
+                                      Om den saknas skattas den från de tystaste ramarna.
+
+        Returns:
+            list: Ett sanningsvärde per ram
+        """
+        if energy_threshold is None:
+            quiet = sorted(energy for energy, _ in features)[:max(1, len(features) // 10)]
+            energy_threshold = self.noise_ratio * sum(quiet) / len(quiet) if quiet else 0.0
+        threshold = max(self.min_energy, energy_threshold)
+        return [energy > threshold and crossings <= self.max_zero_crossings for energy, crossings in features]
+
+    def speech_region(self, audio, energy_threshold=None):
+        """
+        Hittar den del av ljudet som innehåller tal.
+
+        Args:
+            audio (sr.AudioData): Ljudsegmentet
+            energy_threshold (float): Energitröskel, se speech_frames
+
+        Returns:
+            tuple: (första sampel, sampel efter slutet), eller None om segmentet saknar tal
+        """
+        features = audio_features(audio, self.frame_seconds)
+        voiced = self.speech_frames(features, energy_threshold)
+        if sum(voiced) < self.min_speech_frames:
+            return None
+
+        first = voiced.index(True)
+        last = len(voiced) - 1 - voiced[::-1].index(True)
+        frame_length = max(1, int(audio.sample_rate * self.frame_seconds))
+        start = max(0, first - self.padding_frames) * frame_length
+        end = min(len(voiced), last + 1 + self.padding_frames) * frame_length
+        return start, end
+
+    def trim(self, audio, energy_threshold=None):
+        """
+        Kortar ett ljudsegment till den del som innehåller tal.
+
+        Args:
+            audio (sr.AudioData): Ljudsegmentet
+            energy_threshold (float): Energitröskel, se speech_frames
+
+        Returns:
+            sr.AudioData: Det kortade ljudet, eller None om segmentet saknar tal
+        """
+        region = self.speech_region(audio, energy_threshold)
+        if region is None:
+            return None
+        start, end = region
+        width = audio.sample_width
+        return sr.AudioData(audio.frame_data[start * width:end * width], audio.sample_rate, width)
+
+
+class ReplaySource(sr.AudioSource):
+    """
+    Ljudkälla som spelar upp inspelade WAV-filer i stället för mikrofonen.
+
+    Används för att köra samma lyssningskod utan mikrofon, t.ex. i benchmarks
+    och på testmaskiner. Mellan och efter filerna levereras tystnad, så att
+    recognizer.listen beter sig som när ingen pratar.
+    """
+
+    def __init__(self, paths=(), sample_rate=16000, chunk_size=1024, silence_seconds=0.5, realtime=False):
+        """
+        Initierar källan.
+
+        Args:
+            paths (iterable): WAV-filer som spelas upp i tur och ordning
+            sample_rate (int): Samplingsfrekvens som filerna konverteras till
+            chunk_size (int): Antal sampel per block
+            silence_seconds (float): Tystnad före varje fil i sekunder
+            realtime (bool): Om uppspelningen ska gå i realtid i stället för så fort som möjligt
+        """
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = chunk_size
+        self.silence_seconds = silence_seconds
+        self.realtime = realtime
+        self.stream = _ReplayStream(self)
+
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._buffer = b""
+        for path in paths:
+            self.enqueue(path)
+
+    @property
+    def running(self):
+        """Källan kan alltid läsas."""
+        return True
+
+    @property
+    def finished(self):
+        """True när alla köade filer har spelats upp."""
+        with self._lock:
+            return not self._pending and not self._buffer
+
+    def enqueue(self, path):
+        """
+        Lägger en WAV-fil sist i uppspelningskön.
+
+        Args:
+            path (str): Sökvägen till filen
+        """
+        with sr.AudioFile(path) as source:
+            audio = sr.Recognizer().record(source)
+        data = audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=self.SAMPLE_WIDTH)
+        silence = b"\0" * (int(self.SAMPLE_RATE * self.silence_seconds) * self.SAMPLE_WIDTH)
+        with self._lock:
+            self._pending.append(silence + data)
+
+    def open_source(self, max_lag=None):
+        """Källan är redan öppen och returnerar sig själv, som CaptureStream.open_source."""
+        return self
+
+    def stop(self):
+        """Tömmer uppspelningskön."""
+        with self._lock:
+            self._pending.clear()
+            self._buffer = b""
+
+    def skip_to_live(self):
+        """Inspelat ljud hoppas aldrig över, allt ska spelas upp."""
+
+    def catch_up(self):
+        """Uppspelningen ligger alltid i fas."""
+
+    def __enter__(self):
+        """Källan är alltid öppen, så with gör ingenting."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Gör ingenting, källan kan användas igen."""
+        return None
+
+    def _read(self, size):
+        """
+        Läser nästa block, eller tystnad om inga filer återstår.
+        """
+        length = size * self.SAMPLE_WIDTH
+        with self._lock:
+            while len(self._buffer) < length and self._pending:
+                self._buffer += self._pending.popleft()
+            data, self._buffer = self._buffer[:length], self._buffer[length:]
+
+        if self.realtime:
+            time.sleep(size / self.SAMPLE_RATE)
+        return data.ljust(length, b"\0")
+
+
+class _ReplayStream:
+    """
+    Ström med samma gränssnitt som pyaudios ström, för ReplaySource.
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+    def read(self, size):
+        """Läser nästa block från uppspelningen."""
+        return self.source._read(size)
@@ -0,0 +1,225 @@
+"""
+Modul för cachning av syntetiserat tal i Nova chatbot.
+
+Ljudet lagras innehållsadresserat, dvs. under en hash av texten, språket
+och talmotorn, så att samma fras bara behöver syntetiseras en gång.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from utils.helpers import get_logger, get_user_cache_dir
+
+
+logger = get_logger(__name__)
+
+
+class AudioCache:
+    """
+    Beständig ljudcache med storleksgräns och LRU-borttagning.
+
+    De senast använda klippen hålls även i minnet så att vanliga fraser
+    kan spelas upp utan att disken behöver läsas.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=50 * 1024 * 1024, memory_items=32, persistent=True):
+        """
+        Initierar cachen och läser in befintliga filer.
+
+        Args:
+            cache_dir (str): Mappen för cachefilerna, standard är användarens cachemapp
+            max_bytes (int): Största totala storlek på disk innan gamla klipp tas bort
+            memory_items (int): Antal klipp som hålls i minnet
+            persistent (bool): Om klippen sparas på disk. False ger en ren minnescache.
+        """
+        self.cache_dir = cache_dir or get_user_cache_dir("tts")
+        self.persistent = persistent
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+
+        # Nyckel -> (filnamn, storlek), ordnad från minst till mest nyligen använd
+        self._files = OrderedDict()
+        self._total_bytes = 0
+
+        if persistent:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._scan()
+            except OSError as e:
+                logger.warning("Kunde inte öppna ljudcachen i %s: %s", self.cache_dir, e)
+                self.persistent = False
+
+    @staticmethod
+    def make_key(text, language, engine):
+        """
+        Skapar en cachenyckel för ett klipp.
+
+        Args:
+            text (str): Den (förbättrade) texten som syntetiseras
+            language (str): Språkkoden, t.ex. "sv"
+            engine (str): Talmotorns namn
+
+        Returns:
+            str: En hexadecimal SHA-256-hash
+        """
+        content = "\0".join((engine, language, text))
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _scan(self):
+        """
+        Läser in befintliga cachefiler, äldst använda först.
+        """
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            key, _, extension = filename.partition(".")
+            if len(key) != 64 or not extension:
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, key, filename, stat.st_size))
+
+        for _, key, filename, size in sorted(entries):
+            self._files[key] = (filename, size)
+            self._total_bytes += size
+
+    def __contains__(self, key):
+        """Returnerar True om klippet finns i cachen."""
+        with self._lock:
+            return key in self._memory or key in self._files
+
+    def get(self, key):
+        """
+        Hämtar ett klipp och markerar det som senast använt.
+
+        Args:
+            key (str): Cachenyckeln
+
+        Returns:
+            bytes: Ljuddata, eller None om klippet saknas
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                if key in self._files:
+                    self._files.move_to_end(key)
+                return data
+
+            entry = self._files.get(key)
+            if entry is None:
+                return None
+
+            path = os.path.join(self.cache_dir, entry[0])
+            try:
+                with open(path, "rb") as file:
+                    data = file.read()
+                # Uppdatera ändringstiden så att LRU-ordningen överlever omstarter
+                os.utime(path)
+            except OSError:
+                self._forget(key)
+                return None
+
+            self._files.move_to_end(key)
+            self._remember(key, data)
+            return data
+
+    def put(self, key, data, audio_format="mp3"):
+        """
+        Sparar ett klipp i minnet och på disk.
+
+        Args:
+            key (str): Cachenyckeln
+            data (bytes): Ljuddata
+            audio_format (str): Filändelse för ljudformatet
+        """
+        with self._lock:
+            self._remember(key, data)
+            if not self.persistent:
+                return
+
+            filename = f"{key}.{audio_format}"
+            path = os.path.join(self.cache_dir, filename)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                # Skriv till en temporär fil först så att ingen läser en halvskriven fil
+                with open(temp_path, "wb") as file:
+                    file.write(data)
+                os.replace(temp_path, path)
+            except OSError as e:
+                logger.warning("Kunde inte spara ljudklipp i cachen: %s", e)
+                return
+
+            if key in self._files:
+                self._total_bytes -= self._files[key][1]
+            self._files[key] = (filename, len(data))
+            self._files.move_to_end(key)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def path_for(self, key):
+        """
+        Returnerar sökvägen till ett klipp på disk.
+
+        Args:
+            key (str): Cachenyckeln
+
+        Returns:
+            str: Sökvägen, eller None om klippet inte finns på disk
+        """
+        with self._lock:
+            entry = self._files.get(key)
+            return os.path.join(self.cache_dir, entry[0]) if entry else None
+
+    def stats(self):
+        """
+        Returnerar statistik för cachen.
+
+        Returns:
+            dict: Antal klipp i minnet och på disk samt total storlek
+        """
+        with self._lock:
+            return {
+                "memory_items": len(self._memory),
+                "disk_items": len(self._files),
+                "disk_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+    def _remember(self, key, data):
+        """
+        Lägger ett klipp i minnescachen. Anropas med låset taget.
+        """
+        if self.memory_items <= 0:
+            return
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _forget(self, key):
+        """
+        Tar bort ett klipp ur indexet. Anropas med låset taget.
+        """
+        entry = self._files.pop(key, None)
+        if entry:
+            self._total_bytes -= entry[1]
+        self._memory.pop(key, None)
+
+    def _evict(self):
+        """
+        Tar bort de minst nyligen använda klippen tills cachen ryms. Anropas med låset taget.
+        """
+        while self._total_bytes > self.max_bytes and len(self._files) > 1:
+            key, (filename, size) = next(iter(self._files.items()))
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except OSError as e:
+                logger.warning("Kunde inte ta bort %s från ljudcachen: %s", filename, e)
+            self._forget(key)
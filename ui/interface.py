@@ -4,10 +4,16 @@ Modul för grafiskt gränssnitt med tkinter för Nova chatbot.
 
 import tkinter as tk
 from tkinter import messagebox
-import threading
-import time
 from ui.voice import VoiceInterface
+from ui.voice_session import VoiceSession, COMMAND_LISTENING, SPEAKING, WAKE_LISTENING
 from ui.system_actions import SystemActions
+from ui.ui_queue import UIQueue
+from ui.message_pipeline import MessagePipeline
+from ui.transcript import TranscriptView
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
 
 
 class GraphicalInterface:
@@ -30,9 +36,14 @@ class GraphicalInterface:
         
         # För att hålla reda på "tänker"-meddelandet
         self.thinking_displayed = False
+        self.thinking_record = None
         
-        # Lista för att hålla reda på meddelandewidgets
-        self.message_widgets = []
+        # Alla uppdateringar från bakgrundstrådar går via kön och körs i huvudtråden
+        self.ui_queue = UIQueue(self.root)
+        self.ui_queue.start()
+        
+        # Meddelanden behandlas i bakgrunden och svaren visas i den ordning de skickades
+        self.message_pipeline = MessagePipeline(self.chatbot.get_response, self.ui_queue.post)
         
         # Skapa röstgränssnitt och systemåtgärder
         self.voice_interface = VoiceInterface()
@@ -44,8 +55,8 @@ class GraphicalInterface:
         self.create_input_frame()
         # ========================================
 
-        # Starta bakgrundslyssning efter nyckelord
-        self.start_keyword_listening()
+        # Starta röstsessionen som lyssnar efter nyckelord och kommandon
+        self.start_voice_session()
     
     # ---------------------------------------------------------------
     # Menu Functions
@@ -122,7 +133,14 @@ class GraphicalInterface:
         """
         Avslutar applikationen och rensar temporära filer.
         """
-        print("Avslutar programmet...")
+        logger.info("Avslutar programmet...")
+        # Stoppa röstsessionen, uppläsningskön och gränssnittskön
+        self.voice_session.stop()
+        self.message_pipeline.shutdown()
+        self.ui_queue.stop()
+        self.voice_interface.playback.close()
+        # Stäng mikrofonen
+        self.voice_interface.recognizer.close()
         # Stäng av röststyrning för att rensa temporära filer
         if self.voice_interface.voice_enabled:
             self.voice_interface.voice_enabled = False
@@ -131,14 +149,29 @@ class GraphicalInterface:
         self.root.quit()
         self.root.destroy()
 
+    def exit_after_speech(self, delay=2000):
+        """
+        Avslutar applikationen när pågående uppläsningar är klara.
+        
+        Args:
+            delay (int): Minsta tid i millisekunder innan programmet avslutas
+        """
+        def check():
+            if self.voice_interface.playback.is_speaking:
+                self.root.after(100, check)
+            else:
+                self.exit_application()
+        
+        self.root.after(delay, check)
+
     def clear_chat(self):
         """
         Rensar chatrutan och visar ett nytt välkomstmeddelande.
         """
         # Ta bort alla meddelanden
-        for widget in self.message_widgets:
-            widget.destroy()
-        self.message_widgets = []
+        self.transcript.clear()
+        self.thinking_displayed = False
+        self.thinking_record = None
         
         # Visa välkomstmeddelande igen
         self.display_bot_message(f"Chathistoriken har rensats. Hur kan jag hjälpa dig?")
@@ -155,31 +188,8 @@ class GraphicalInterface:
         chat_frame = tk.Frame(self.root)
         chat_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(40, 10)) # Öka toppaddingen till 40px
         
-        # Canvas med scrollbar för att kunna rulla
-        self.canvas = tk.Canvas(chat_frame, bg="#f0f0f0")
-        scrollbar = tk.Scrollbar(chat_frame, orient="vertical", command=self.canvas.yview)
-        
-        # Konfigurera canvas
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
-        # Skapa en frame inuti canvas för att hålla meddelandena
-        self.messages_frame = tk.Frame(self.canvas, bg="#f0f0f0")
-        self.canvas_frame = self.canvas.create_window((0, 0), window=self.messages_frame, anchor="nw")
-        
-        # Konfigurera canvas att ändra storlek med fönstret
-        self.messages_frame.bind("<Configure>", self.on_frame_configure)
-        self.canvas.bind("<Configure>", self.on_canvas_configure)
-    
-    def on_frame_configure(self, event):
-        """Uppdaterar scrollregionen när den inre framen ändrar storlek."""
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-    
-    def on_canvas_configure(self, event):
-        """Ändrar storleken på den inre framen när canvas ändrar storlek."""
-        canvas_width = event.width
-        self.canvas.itemconfig(self.canvas_frame, width=canvas_width)
+        # Virtualiserad vy: bara de synliga meddelandena finns som widgets
+        self.transcript = TranscriptView(chat_frame)
     
     def display_bot_message(self, message):
         """
@@ -188,32 +198,7 @@ class GraphicalInterface:
         Args:
             message (str): Botens meddelande
         """
-        # Skapa en frame för detta meddelande
-        msg_frame = tk.Frame(self.messages_frame, bg="#f0f0f0")
-        msg_frame.pack(fill=tk.X, padx=10, pady=5)
-        
-        # Skapa botens meddelandebubbla på vänster sida
-        bubble = tk.Frame(msg_frame, bg="#E5E5EA", padx=10, pady=8)
-        bubble.pack(side=tk.LEFT)
-        
-        # Lägg till texten i bubblan
-        msg_label = tk.Label(
-            bubble, 
-            text=message, 
-            bg="#E5E5EA", 
-            fg="black", 
-            font=("Arial", 11),
-            justify="left",
-            wraplength=300
-        )
-        msg_label.pack()
-        
-        # Lägg till en tom label på höger sida för balans
-        tk.Label(msg_frame, bg="#f0f0f0", width=10).pack(side=tk.RIGHT)
-        
-        # Lägg till denna widget i listan och scrolla ner
-        self.message_widgets.append(msg_frame)
-        self.canvas.yview_moveto(1.0)
+        self.transcript.append("bot", message)
 
     def display_user_message(self, message):
         """
@@ -222,59 +207,24 @@ class GraphicalInterface:
         Args:
             message (str): Användarens meddelande
         """
-        # Skapa en frame för detta meddelande
-        msg_frame = tk.Frame(self.messages_frame, bg="#f0f0f0")
-        msg_frame.pack(fill=tk.X, padx=10, pady=5)
-        
-        # Skapa en tom label på vänster sida för att skjuta meddelandet åt höger
-        tk.Label(msg_frame, bg="#f0f0f0", width=10).pack(side=tk.LEFT)
-        
-        # Skapa en frame som fungerar som meddelandebubbla
-        bubble = tk.Frame(msg_frame, bg="#0084FF", padx=10, pady=8)
-        bubble.pack(side=tk.RIGHT)
-        
-        # Lägg till texten i bubblan
-        msg_label = tk.Label(
-            bubble, 
-            text=message, 
-            bg="#0084FF", 
-            fg="white", 
-            font=("Arial", 11),
-            justify="left",
-            wraplength=200
-        )
-        msg_label.pack()
-        
-        # Lägg till denna widget i listan och scrolla ner
-        self.message_widgets.append(msg_frame)
-        self.canvas.yview_moveto(1.0)
+        self.transcript.append("user", message)
 
     def display_thinking(self):
         """
         Visar ett "tänker"-meddelande i en bubbla på vänster sida.
         """
-        # Skapa en frame för detta meddelande
-        self.thinking_frame = tk.Frame(self.messages_frame, bg="#f0f0f0")
-        self.thinking_frame.pack(fill=tk.X, padx=10, pady=5)
-        
-        # Skapa tänker-meddelandebubbla på vänster sida
-        bubble = tk.Frame(self.thinking_frame, bg="#E5E5EA", padx=10, pady=8)
-        bubble.pack(side=tk.LEFT)
-        
-        # Lägg till texten i bubblan
-        msg_label = tk.Label(
-            bubble, 
-            text=f"{self.chatbot.name} tänker...", 
-            bg="#E5E5EA", 
-            fg="black", 
-            font=("Arial", 11, "italic")
-        )
-        msg_label.pack()
-        
-        # Scrolla ner till botten
-        self.canvas.yview_moveto(1.0)
+        self.thinking_record = self.transcript.append("thinking", f"{self.chatbot.name} tänker...")
         self.thinking_displayed = True
 
+    def hide_thinking(self):
+        """
+        Tar bort "tänker"-meddelandet om det visas.
+        """
+        if self.thinking_displayed:
+            self.transcript.remove(self.thinking_record)
+            self.thinking_record = None
+            self.thinking_displayed = False
+
     def remove_thinking_and_display_response(self, response):
         """
         Tar bort "tänker"-meddelandet och visar chatbotens svar.
@@ -282,10 +232,8 @@ class GraphicalInterface:
         Args:
             response (str): Chatbotens svar
         """
-        # Ta bort "tänker"-frameen om den finns
-        if self.thinking_displayed and hasattr(self, 'thinking_frame'):
-            self.thinking_frame.destroy()
-            self.thinking_displayed = False
+        # Ta bort "tänker"-meddelandet om det finns
+        self.hide_thinking()
         
         # Visa chatbotens svar
         self.display_bot_message(response)
@@ -300,6 +248,13 @@ class GraphicalInterface:
         # Visa välkomstmeddelandet när programmet startar
         self.display_bot_message(f"Välkommen till {self.chatbot.name}! Hur kan jag hjälpa dig idag?")
         
+        # Utan inspelat väckord skickas allt tal i väckordsläget till taligenkänningen
+        if self.voice_interface.wake_word_enrollment_needed:
+            self.display_bot_message(
+                "Inget väckord är inspelat, så allt du säger medan jag väntar på nyckelordet skickas "
+                "till taligenkänningen. Spela in väckordet med: python main.py --enroll-wake-word"
+            )
+        
         # Starta huvudloopen
         self.root.mainloop()
 
@@ -347,54 +302,98 @@ class GraphicalInterface:
         # Sätt fokus på input-fältet
         self.user_input.focus_set()
     
-    def send_message(self):
+    def send_message(self, on_done=None, fuzzy_distance=None):
         """
-        Skickar användarens meddelande till chatboten och visar svaret.
+        Skickar användarens meddelande till chatboten. Svaret visas när det är klart,
+        utan att gränssnittet väntar på det.
+        
+        Args:
+            on_done (callable): Anropas utan argument när svaret har visats
+            fuzzy_distance (int): Största redigeringsavstånd vid matchningen, standard är chatbotens
+            
+        Returns:
+            bool: True om ett meddelande skickades
         """
         user_message = self.user_input.get()
         
         if not user_message.strip():
-            return
+            return False
+        
+        # Ett nytt meddelande avbryter det Nova håller på att säga
+        self.voice_interface.barge_in()
             
-        # Visa användarens meddelande i chatten
+        # Visa användarens meddelande i chatten och att Nova tänker, alltid sist i chatten
+        self.hide_thinking()
         self.display_user_message(user_message)
         self.user_input.delete(0, tk.END)
+        self.display_thinking()
+        
+        # Få ett svar från chatboten i bakgrunden
+        # Turerna i sessionen behandlas i tur och ordning, så att en följdfråga
+        # alltid tolkas efter frågan den hör till
+        self.message_pipeline.submit(
+            user_message, lambda future: self.show_response(future, on_done),
+            session_id=self.chatbot.session_id, fuzzy_distance=fuzzy_distance
+        )
+        return True
+
+    def show_response(self, future, on_done=None):
+        """
+        Visar chatbotens svar på ett meddelande. Anropas i huvudtråden i samma
+        ordning som meddelandena skickades.
         
-        # Få ett svar från chatboten
-        response = self.chatbot.get_response(user_message)
-        
-        # Kontrollera om exit_requested är satt
-        if self.chatbot.exit_requested:
-            # Visa meddelandet
-            self.display_bot_message(response)
-            # Om röststyrning är aktiverad, läs upp svaret
-            if self.voice_interface.voice_enabled:
-                self.voice_interface.say_response(response)
-            # Vänta lite och avsluta
-            self.root.after(2000, self.exit_application)
-            return
+        Args:
+            future (Future): Resultatet från chatbot.get_response
+            on_done (callable): Anropas utan argument när svaret har visats
+        """
+        try:
+            # Ta bort "tänker"-meddelandet, det visas igen om fler svar väntar
+            self.hide_thinking()
+            
+            try:
+                response = future.result()
+            except Exception as e:
+                logger.error("Kunde inte skapa ett svar: %s", e)
+                self.display_bot_message("Något gick fel, försök igen.")
+                return
+            
+            # Kontrollera om användaren vill avsluta
+            if isinstance(response, dict) and response.get("action") == "exit_app":
+                # Visa meddelandet
+                self.display_bot_message(response["text"])
+                # Om röststyrning är aktiverad, läs upp svaret
+                if self.voice_interface.voice_enabled:
+                    self.voice_interface.say_response(response["text"])
+                # Vänta lite och avsluta när svaret är uppläst
+                self.exit_after_speech()
+                return
 
-        # Kontrollera om svaret är en sträng eller ett dictionary
-        if isinstance(response, dict):
-            # Om det är ett dictionary, kontrollera om det har en action
-            if response.get("action"):
-                # Skicka med extra_data om det finns
-                extra_data = response.get("extra_data")
-                self.handle_action(response["action"], response["text"], extra_data)
+            # Kontrollera om svaret är en sträng eller ett dictionary
+            if isinstance(response, dict):
+                # Om det är ett dictionary, kontrollera om det har en action
+                if response.get("action"):
+                    # Skicka med extra_data om det finns
+                    extra_data = response.get("extra_data")
+                    self.handle_action(response["action"], response["text"], extra_data)
+                else:
+                    # Visa chatbotens svar i chatten
+                    self.display_bot_message(response["text"])
+                    
+                    # Om röststyrning är aktiverad, läs upp svaret
+                    if self.voice_interface.voice_enabled:
+                        self.voice_interface.say_response(response["text"])
             else:
-                # Visa chatbotens svar i chatten
-                self.display_bot_message(response["text"])
+                # Om det är en sträng, visa den direkt
+                self.display_bot_message(response)
                 
                 # Om röststyrning är aktiverad, läs upp svaret
                 if self.voice_interface.voice_enabled:
-                    self.voice_interface.say_response(response["text"])
-        else:
-            # Om det är en sträng, visa den direkt
-            self.display_bot_message(response)
-            
-            # Om röststyrning är aktiverad, läs upp svaret
-            if self.voice_interface.voice_enabled:
-                self.voice_interface.say_response(response)
+                    self.voice_interface.say_response(response)
+        finally:
+            if self.message_pipeline.pending and not self.thinking_displayed:
+                self.display_thinking()
+            if on_done:
+                on_done()
 
     # ---------------------------------------------------------------
     # Voice Interface Functions
@@ -402,7 +401,7 @@ class GraphicalInterface:
     def toggle_voice(self):
         """
         Växlar röststyrning på/av och uppdaterar knappens utseende.
-        Om röststyrning aktiveras, börjar systemet lyssna direkt.
+        Om röststyrning aktiveras, börjar systemet lyssna direkt efter bekräftelsen.
         """
         is_enabled = self.voice_interface.toggle_voice()
         
@@ -412,30 +411,24 @@ class GraphicalInterface:
             # Uppdatera lyssningsstatus för att visa att vi är redo
             self.listening_status.config(text="Redo")
             
-            # Om röststyrning aktiveras via knapp, läs upp ett bekräftelsemeddelande
+            # Om röststyrning aktiveras via knapp, läs upp ett bekräftelsemeddelande.
+            # Röstsessionen börjar lyssna när uppläsningen är klar.
             self.voice_interface.say_response(f"Vad kan {self.chatbot.name} hjälpa dig med?")
-            
-            # Starta röstinmatning direkt efter en kort fördröjning
-            self.root.after(400, self.activate_voice_input)  # Vänta 0.4 sekunder efter bekräftelsemeddelandet
         else:
             self.voice_button.config(text="🎤 Av", bg="#CCCCCC")
             
             # Återställ lyssningsindikatorn när röst stängs av
             self.reset_listening_indicator()
+        
+        self.voice_session.set_voice_enabled(is_enabled)
 
     def activate_voice_input(self):
         """
-        Aktiverar röstinmatning för att lyssna efter ett kommando.
+        Aktiverar röstinmatning. Röstsessionen lyssnar redan efter kommandon
+        när röststyrning är på, så här behöver den bara slås på.
         """
         if not self.voice_interface.voice_enabled:
-            return
-
-        # Ändra statusindikator till röd cirkel
-        self.listening_canvas.itemconfig(self.listening_indicator, fill="#FF0000")  # Röd när den lyssnar
-        self.listening_status.config(text="Lyssnar...")
-        
-        # Starta en ny tråd för att lyssna efter röst (för att inte blockera GUI)
-        threading.Thread(target=self.process_voice_input, daemon=True).start()
+            self.toggle_voice()
 
     def reset_listening_indicator(self):
         """
@@ -444,92 +437,73 @@ class GraphicalInterface:
         self.listening_canvas.itemconfig(self.listening_indicator, fill="#CCCCCC")  # Grå när den inte lyssnar
         self.listening_status.config(text="")
 
-    def process_voice_input(self):
+    def start_voice_session(self):
         """
-        Processar röstinmatning i en separat tråd.
+        Startar röstsessionen som lyssnar efter nyckelord och kommandon i bakgrunden.
         """
-        # Lyssna efter ett kommando
-        text = self.voice_interface.listen_for_command()
+        self.voice_session = VoiceSession(
+            self.voice_interface,
+            # Tillståndsändringar slås ihop så att bara det senaste tillståndet ritas
+            on_state_change=lambda state: self.ui_queue.post(self.show_voice_state, state, key="voice_state"),
+            on_activation=lambda response: self.ui_queue.post(self.on_voice_activated, response),
+            on_utterance=lambda text: self.ui_queue.post(self.process_voice_input, text)
+        )
+        self.voice_session.start()
 
-        # Återställ lyssningsindikatorn när vi är klara med att lyssna
-        self.root.after(0, self.reset_listening_indicator)
+    def show_voice_state(self, state):
+        """
+        Visar röstsessionens tillstånd med lyssningsindikatorn.
         
-        if text:
-            # Kontrollera om det är ett systemkommando
-            action, response, extra_data = self.voice_interface.check_for_command(text)
-            
-            if action:
-                # Hantera specifika fall som kräver särskild hantering i röstläge
-                if action == "deactivate_voice":
-                    # Stäng av röststyrning
-                    self.voice_interface.voice_enabled = False
-                    self.voice_button.config(text="🎤 Av", bg="#CCCCCC")
-                    self.voice_interface.say_response(response)
-                    return
-                elif action == "exit_app":
-                    # Hantera avslutning (vi måste visa meddelande innan avslutning)
-                    self.display_bot_message(response)
-                    self.voice_interface.say_response(response)
-                    self.root.after(2000, self.exit_application)
-                    return
-                
-                # För andra kommandon, använd handle_action
-                self.handle_action(action, response, extra_data)
-                
-                # För kommandon som inte avslutar röstlyssning
-                if self.voice_interface.voice_enabled:
-                    self.root.after(3000, self.activate_voice_input)
-                return
-                
-            # Om det inte är ett systemkommando, behandla det som ett vanligt meddelande
-            self.root.after(0, lambda: self.user_input.insert(0, text))
-            self.root.after(100, self.send_message)
-            
-            # Om röststyrning fortfarande är aktiverad, lyssna igen efter en kort fördröjning
-            if self.voice_interface.voice_enabled:
-                self.root.after(3000, self.activate_voice_input)
+        Args:
+            state (str): Sessionens tillstånd
+        """
+        if state == WAKE_LISTENING:
+            # Blå för nyckelordsläge
+            self.listening_canvas.itemconfig(self.listening_indicator, fill="#A0A0FF")
+            if self.voice_interface.wake_word_enrollment_needed:
+                self.listening_status.config(text="Väntar på nyckelord (inte inspelat)...")
+            else:
+                self.listening_status.config(text="Väntar på nyckelord...")
+        elif state == COMMAND_LISTENING:
+            # Röd när den lyssnar efter kommandon
+            self.listening_canvas.itemconfig(self.listening_indicator, fill="#FF0000")
+            self.listening_status.config(text="Lyssnar...")
+        elif state == SPEAKING:
+            # Grå men redo medan Nova svarar
+            self.listening_canvas.itemconfig(self.listening_indicator, fill="#CCCCCC")
+            self.listening_status.config(text="Redo")
         else:
-            # Om inget text uppfattades, visa ett meddelande
-            #self.root.after(0, lambda: self.display_bot_message("Jag kunde inte förstå vad du sa."))
-            
-            # Om röststyrning fortfarande är aktiverad, lyssna igen efter en kort fördröjning
-            if self.voice_interface.voice_enabled:
-                self.root.after(1000, self.activate_voice_input)
+            self.reset_listening_indicator()
 
-    def start_keyword_listening(self):
-        """
-        Startar en bakgrundsprocess som lyssnar efter nyckelord.
-        """
-        def background_listener():
-            while True:
-                # Lyssna efter nyckelord om röststyrning är avstängd
-                if not self.voice_interface.voice_enabled:
-                    # Uppdatera statusindikatorn med Canvas
-                    self.root.after(0, lambda: self.listening_status.config(text="Väntar på nyckelord..."))
-                    # Sätt indikatorn till blå för nyckelordsläge
-                    self.root.after(0, lambda: self.listening_canvas.itemconfig(self.listening_indicator, fill="#A0A0FF"))
-                    
-                    command_text = self.voice_interface.listen_for_activation()
-                    if command_text:
-                        # Kontrollera om det är ett kommando
-                        action, response, extra_data = self.voice_interface.check_for_command(command_text)
-                        
-                        if action == "activate_voice":
-                            # Aktivera röststyrning
-                            self.voice_interface.voice_enabled = True
-                            # Uppdatera UI
-                            self.root.after(0, lambda: self.voice_button.config(text="🎤 På", bg="#FF6347"))
-                            # Uppdatera statusindikatorn
-                            self.root.after(0, lambda: self.listening_status.config(text="Aktiverad"))
-                            self.root.after(0, lambda: self.listening_canvas.itemconfig(self.listening_indicator, fill="#00FF00"))
-                            # Säg svaret
-                            self.root.after(0, lambda r=response: self.voice_interface.say_response(r))
-                            # Starta lyssning efter en kort fördröjning
-                            self.root.after(1000, self.activate_voice_input)
-                            print("Röststyrning är nu aktiverad")
-        
-        # Starta en separat tråd för bakgrundslyssning
-        threading.Thread(target=background_listener, daemon=True).start()
+    def on_voice_activated(self, response):
+        """
+        Uppdaterar gränssnittet när röststyrning har aktiverats med ett nyckelord.
+        
+        Args:
+            response (str): Svaret som läses upp
+        """
+        self.voice_button.config(text="🎤 På", bg="#FF6347")
+        self.listening_status.config(text="Aktiverad")
+        self.listening_canvas.itemconfig(self.listening_indicator, fill="#00FF00")
+        logger.info("Röststyrning är nu aktiverad")
+
+    def process_voice_input(self, text):
+        """
+        Hanterar det användaren sa i röstläge och meddelar röstsessionen när turen är klar.
+        
+        Args:
+            text (str): Den uppfattade texten
+        """
+        # Röstturer går samma väg som skrivna meddelanden, via Nova, så att de
+        # använder svarscachen, sessionens kontext och historiken. Kommandon som
+        # att stänga av rösten eller avsluta hanteras när svaret visas.
+        # Turen är klar först när svaret har visats och lagts i uppläsningskön.
+        # Taligenkänd text matchas ungefärligt, så att små felhörningar ändå träffar.
+        self.user_input.delete(0, tk.END)
+        self.user_input.insert(0, text)
+        if not self.send_message(on_done=self.voice_session.turn_done,
+                                 fuzzy_distance=self.voice_interface.fuzzy_distance):
+            self.voice_session.turn_done()
 
     def update_voice_button(self):
         """
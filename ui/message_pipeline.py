@@ -0,0 +1,96 @@
+"""
+Modul för asynkron hantering av meddelanden i Nova chatbot.
+
+Meddelanden behandlas av en trådpool så att gränssnittets tråd aldrig väntar
+på chatboten. Resultaten levereras i samma ordning som meddelandena skickades,
+även om en långsam hanterare blir klar efter en snabbare. Meddelanden med
+samma session behandlas dessutom i tur och ordning, så att deras sidoeffekter
+(kontext, historik och cache) sker i inskickad ordning.
+"""
+
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from nova.context import SessionQueue
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class MessagePipeline:
+    """
+    Trådpool för meddelanden med leverans i inskickad ordning.
+    """
+
+    def __init__(self, handler, dispatch, max_workers=4):
+        """
+        Initierar pipelinen.
+
+        Args:
+            handler (callable): Funktionen som behandlar ett meddelande, t.ex. chatbot.get_response
+            dispatch (callable): Kör en funktion i gränssnittets tråd, t.ex. UIQueue.post
+            max_workers (int): Antal meddelanden som kan behandlas samtidigt
+        """
+        self.handler = handler
+        self.dispatch = dispatch
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nova-message")
+        self._sessions = SessionQueue(self._executor)
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._next_delivery = 0
+
+        # Löpnummer -> (future, callback) för meddelanden som inte har levererats än
+        self._waiting = {}
+
+    @property
+    def pending(self):
+        """Antal meddelanden som inte har levererats än."""
+        with self._lock:
+            return len(self._waiting)
+
+    def submit(self, message, callback, session_id=None, **options):
+        """
+        Skickar ett meddelande till trådpoolen.
+
+        Args:
+            message (str): Meddelandet
+            callback (callable): Anropas i gränssnittets tråd med meddelandets future
+                                 när det och alla tidigare meddelanden är klara
+            session_id (str): Meddelanden med samma session behandlas i inskickad ordning.
+                              None låter meddelandet behandlas parallellt med alla andra.
+            **options: Skickas vidare till hanteraren, t.ex. fuzzy_distance
+
+        Returns:
+            Future: Resultatet av handler(message, **options)
+        """
+        with self._lock:
+            sequence = next(self._counter)
+            if session_id is None:
+                future = self._executor.submit(self.handler, message, **options)
+            else:
+                future = self._sessions.submit(session_id, self.handler, message, **options)
+            self._waiting[sequence] = (future, callback)
+        future.add_done_callback(self._deliver_ready)
+        return future
+
+    def shutdown(self):
+        """
+        Avbryter meddelanden som inte har börjat behandlas och stänger trådpoolen.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _deliver_ready(self, _future=None):
+        """
+        Levererar alla klara resultat som står först i tur.
+        """
+        with self._lock:
+            while self._next_delivery in self._waiting:
+                future, callback = self._waiting[self._next_delivery]
+                if not future.done():
+                    break
+                del self._waiting[self._next_delivery]
+                self._next_delivery += 1
+                # Låset hålls medan resultatet skickas så att ordningen bevaras i gränssnittets kö
+                self.dispatch(callback, future)
@@ -0,0 +1,224 @@
+"""
+Modul för uppspelningskön i Nova chatbot.
+
+All uppläsning sker i en egen arbetstråd så att gränssnittets tråd aldrig
+väntar på ljud. Uppläsningar köas efter prioritet, kan avbrytas var för sig
+och kan avbrytas allihop på en gång när användaren börjar prata eller
+skickar ett nytt meddelande (barge-in).
+"""
+
+import itertools
+import queue
+import threading
+from concurrent.futures import Future
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+# Prioriteter för uppläsningar, lägre värde spelas först
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+
+class Utterance(Future):
+    """
+    En köad uppläsning.
+
+    Fungerar som en vanlig Future: resultatet är True om texten lästes upp
+    till slut och False om uppläsningen avbröts medan den pågick.
+    """
+
+    def __init__(self, text, priority=PRIORITY_NORMAL):
+        """
+        Initierar en uppläsning.
+
+        Args:
+            text (str): Texten som ska läsas upp
+            priority (int): Prioritet i kön, lägre värde spelas först
+        """
+        super().__init__()
+        self.text = text
+        self.priority = priority
+
+        # Sätts när uppläsningen ska avbrytas, även om den redan har börjat
+        self.interrupted = threading.Event()
+
+    def cancel(self):
+        """
+        Avbryter uppläsningen.
+
+        En köad uppläsning tas bort ur kön och en pågående uppläsning stoppas.
+
+        Returns:
+            bool: True om uppläsningen avbröts innan den började
+        """
+        self.interrupted.set()
+        return super().cancel()
+
+
+class PlaybackWorker:
+    """
+    Arbetstråd som läser upp köade texter en i taget.
+    """
+
+    def __init__(self, speaker):
+        """
+        Initierar kön och startar arbetstråden.
+
+        Args:
+            speaker (VoiceSpeaker): Objektet som syntetiserar och spelar upp tal
+        """
+        self.speaker = speaker
+
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._current = None
+
+        # Sätts när kön är tom och ingen uppläsning pågår
+        self._idle = threading.Event()
+        self._idle.set()
+        self._idle_callbacks = []
+        self._busy_callbacks = []
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="nova-playback", daemon=True)
+        self._thread.start()
+
+    @property
+    def is_speaking(self):
+        """True om en uppläsning pågår eller väntar i kön."""
+        return not self._idle.is_set()
+
+    def submit(self, text, priority=PRIORITY_NORMAL, callback=None):
+        """
+        Lägger en text i uppläsningskön.
+
+        Args:
+            text (str): Texten som ska läsas upp
+            priority (int): Prioritet i kön, lägre värde spelas först
+            callback (callable): Anropas med uppläsningen när den är klar eller avbruten
+
+        Returns:
+            Utterance: En Future för uppläsningen
+        """
+        utterance = Utterance(text, priority)
+        if callback is not None:
+            utterance.add_done_callback(callback)
+
+        with self._lock:
+            if self._closed:
+                utterance.cancel()
+                return utterance
+            self._pending.add(utterance)
+            became_busy = self._idle.is_set()
+            self._idle.clear()
+            # Löpnumret håller ordningen mellan uppläsningar med samma prioritet
+            self._queue.put((priority, next(self._counter), utterance))
+        
+        if became_busy:
+            for busy_callback in self._busy_callbacks:
+                try:
+                    busy_callback()
+                except Exception as e:
+                    logger.error("Fel i anrop när uppläsningskön fick en uppläsning: %s", e)
+        return utterance
+
+    def barge_in(self):
+        """
+        Avbryter pågående uppläsning och tömmer kön.
+
+        Returns:
+            int: Antal uppläsningar som avbröts
+        """
+        with self._lock:
+            utterances = list(self._pending)
+            if self._current is not None:
+                utterances.append(self._current)
+
+        for utterance in utterances:
+            utterance.cancel()
+
+        if utterances:
+            logger.debug("Avbröt %d uppläsningar", len(utterances))
+        return len(utterances)
+
+    def add_idle_callback(self, callback):
+        """
+        Registrerar en funktion som anropas från arbetstråden varje gång kön blir tom.
+
+        Args:
+            callback (callable): Funktion utan argument
+        """
+        self._idle_callbacks.append(callback)
+
+    def add_busy_callback(self, callback):
+        """
+        Registrerar en funktion som anropas varje gång en tom kö får en uppläsning,
+        dvs. när Nova börjar prata. Anropas från tråden som lade till uppläsningen.
+        
+        Args:
+            callback (callable): Funktion utan argument
+        """
+        self._busy_callbacks.append(callback)
+    
+    def wait_until_idle(self, timeout=None):
+        """
+        Väntar tills alla köade uppläsningar är klara.
+
+        Args:
+            timeout (float): Längsta väntetid i sekunder, None väntar hur länge som helst
+
+        Returns:
+            bool: True om kön blev tom inom tidsgränsen
+        """
+        return self._idle.wait(timeout)
+
+    def close(self):
+        """
+        Avbryter all uppläsning och stoppar arbetstråden.
+        """
+        with self._lock:
+            self._closed = True
+        self.barge_in()
+        # Lägst möjliga prioritetsvärde så att tråden vaknar direkt
+        self._queue.put((float("-inf"), next(self._counter), None))
+
+    def _run(self):
+        """
+        Arbetstrådens huvudloop.
+        """
+        while True:
+            _, _, utterance = self._queue.get()
+            if utterance is None:
+                return
+
+            with self._lock:
+                self._pending.discard(utterance)
+                started = utterance.set_running_or_notify_cancel()
+                if started:
+                    self._current = utterance
+
+            if started:
+                try:
+                    completed = self.speaker.speak(utterance.text, utterance.interrupted)
+                    utterance.set_result(completed)
+                except Exception as e:
+                    logger.error("Ett fel uppstod vid uppläsning: %s", e)
+                    utterance.set_exception(e)
+
+            with self._lock:
+                self._current = None
+                idle = not self._pending
+                if idle:
+                    self._idle.set()
+
+            if idle:
+                for callback in self._idle_callbacks:
+                    try:
+                        callback()
+                    except Exception as e:
+                        logger.error("Fel i anrop när uppläsningskön blev tom: %s", e)
@@ -0,0 +1,159 @@
+"""
+Modul för taligenkänningsmotorer (tal-till-text) i Nova chatbot.
+
+Innehåller ett gemensamt gränssnitt för igenkänningsmotorer, en molnbaserad
+motor (Google) och en lokal motor (Vosk) som fungerar utan nätverk.
+Motorerna signalerar fel med samma undantag som speech_recognition, så att
+VoiceRecognizer hanterar alla motorer på samma sätt.
+"""
+
+import json
+import os
+import threading
+import speech_recognition as sr
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class RecognitionBackend:
+    """
+    Basklass för taligenkänningsmotorer.
+    """
+
+    # Namnet på motorn, används i konfiguration och loggar
+    name = "base"
+
+    def is_available(self):
+        """
+        Kontrollerar om motorn kan användas på den här datorn.
+
+        Returns:
+            bool: True om motorn kan användas
+        """
+        return True
+
+    def recognize(self, audio, language):
+        """
+        Omvandlar ljud till text.
+
+        Args:
+            audio (sr.AudioData): Ljudet som ska kännas igen
+            language (str): Språkkoden, t.ex. "sv-SE"
+
+        Returns:
+            str: Den igenkända texten
+
+        Raises:
+            sr.UnknownValueError: Om inget tal kunde kännas igen
+            sr.RequestError: Om motorn inte kunde nås eller användas
+        """
+        raise NotImplementedError
+
+
+class GoogleRecognitionBackend(RecognitionBackend):
+    """
+    Molnbaserad taligenkänning via Googles webbtjänst. Kräver nätverk.
+    """
+
+    name = "google"
+
+    def __init__(self):
+        """
+        Initierar motorn.
+        """
+        self._recognizer = sr.Recognizer()
+
+    def recognize(self, audio, language):
+        """Känner igen tal med Googles webbtjänst."""
+        return self._recognizer.recognize_google(audio, language=language)
+
+
+class VoskRecognitionBackend(RecognitionBackend):
+    """
+    Lokal taligenkänning via Vosk. Kräver en nedladdad modell för språket,
+    t.ex. vosk-model-small-sv-rhasspy-0.15.
+    """
+
+    name = "vosk"
+
+    # Vosk-modellerna är tränade på 16 kHz
+    sample_rate = 16000
+
+    def __init__(self, model_path=None):
+        """
+        Initierar motorn. Modellen läses in vid första användningen.
+
+        Args:
+            model_path (str): Mappen med Vosk-modellen, standard är miljövariabeln NOVA_VOSK_MODEL
+        """
+        self.model_path = model_path or os.environ.get("NOVA_VOSK_MODEL")
+        self._model = None
+        self._lock = threading.Lock()
+
+    def is_available(self):
+        """Kontrollerar att Vosk är installerat och att modellen finns."""
+        try:
+            import vosk  # noqa: F401
+        except ImportError:
+            return False
+        return bool(self.model_path) and os.path.isdir(self.model_path)
+
+    def recognize(self, audio, language):
+        """Känner igen tal lokalt med Vosk. Språket bestäms av modellen."""
+        try:
+            from vosk import KaldiRecognizer, Model
+        except ImportError as e:
+            raise sr.RequestError(f"Vosk är inte installerat: {e}")
+
+        with self._lock:
+            if self._model is None:
+                if not self.model_path or not os.path.isdir(self.model_path):
+                    raise sr.RequestError(f"Hittar ingen Vosk-modell i {self.model_path!r}, ange NOVA_VOSK_MODEL")
+                logger.info("Läser in Vosk-modellen från %s", self.model_path)
+                self._model = Model(self.model_path)
+            model = self._model
+
+        recognizer = KaldiRecognizer(model, self.sample_rate)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get("text", "").strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+# Tillgängliga motorer per namn, används av create_recognition_backend
+BACKENDS = {
+    "google": GoogleRecognitionBackend,
+    "vosk": VoskRecognitionBackend
+}
+
+# Standardmotorn om inget annat anges
+DEFAULT_BACKEND = "google"
+
+
+def create_recognition_backend(name=None):
+    """
+    Skapar en taligenkänningsmotor utifrån konfiguration.
+
+    Args:
+        name (str): Motorns namn. Standard är miljövariabeln NOVA_STT_BACKEND eller DEFAULT_BACKEND.
+
+    Returns:
+        RecognitionBackend: Den nya motorn
+
+    Raises:
+        ValueError: Om ett okänt motornamn anges
+    """
+    if name is None:
+        name = os.environ.get("NOVA_STT_BACKEND", DEFAULT_BACKEND)
+    name = name.strip()
+
+    if name not in BACKENDS:
+        raise ValueError(f"Okänd taligenkänningsmotor: {name}. Välj bland {', '.join(BACKENDS)}")
+
+    backend = BACKENDS[name]()
+    if not backend.is_available():
+        logger.warning("Taligenkänningsmotorn %s är inte tillgänglig", name)
+    return backend
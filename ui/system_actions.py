@@ -7,6 +7,10 @@ import os
 import subprocess
 import webbrowser
 import platform
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
 
 
 class SystemActions:
@@ -70,7 +74,7 @@ class SystemActions:
             return {"success": True, "message": "Webbläsaren öppnades framgångsrikt."}
         except Exception as e:
             error_msg = f"Kunde inte öppna webbläsaren: {e}"
-            print(error_msg)
+            logger.error(error_msg)
             return {"success": False, "message": error_msg}
     
     def open_website(self, website):
@@ -99,7 +103,7 @@ class SystemActions:
             return {"success": True, "message": f"Öppnade {website} framgångsrikt."}
         except Exception as e:
             error_msg = f"Kunde inte öppna webbplatsen {website}: {e}"
-            print(error_msg)
+            logger.error(error_msg)
             return {"success": False, "message": error_msg}
     
     def open_application(self, app_name):
@@ -121,7 +125,7 @@ class SystemActions:
         
         if system_key not in self.common_apps:
             error_msg = f"Operativsystemet {self.system} stöds inte."
-            print(error_msg)
+            logger.error(error_msg)
             return {"success": False, "message": error_msg}
         
         # Kontrollera om applikationen finns i listan över kända applikationer
@@ -138,17 +142,17 @@ class SystemActions:
                 return {"success": True, "message": f"Applikationen {app_name} öppnades framgångsrikt."}
             except Exception as e:
                 error_msg = f"Kunde inte öppna applikationen {app_name}: {e}"
-                print(error_msg)
+                logger.error(error_msg)
                 return {"success": False, "message": error_msg}
         else:
-            print(f"Applikationen '{app_name}' finns inte i listan över kända applikationer. Provar direkt...")
+            logger.warning("Applikationen '%s' finns inte i listan över kända applikationer. Provar direkt...", app_name)
             # Försök att köra appnamnet direkt
             try:
                 subprocess.Popen(app_name, shell=True)
                 return {"success": True, "message": f"Applikationen {app_name} öppnades direkt."}
             except Exception as e:
                 error_msg = f"Kunde inte öppna applikationen {app_name} direkt: {e}"
-                print(error_msg)
+                logger.error(error_msg)
                 return {"success": False, "message": error_msg}
                 
     def exit_application(self):
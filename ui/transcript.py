@@ -0,0 +1,257 @@
+"""
+Modul för den virtualiserade chatvyn i Nova chatbot.
+
+Meddelandena sparas som kompakta poster och bara de bubblor som syns i
+fönstret finns som widgets. Bubbelwidgets återanvänds när användaren
+scrollar, och varje posts position hålls i en prefixsumma av höjderna,
+så att minne och omritning inte växer med chathistorikens längd.
+"""
+
+import bisect
+import tkinter as tk
+
+
+# Utseende per avsändare, samma som de tidigare bubblorna
+STYLES = {
+    "bot": {"bg": "#E5E5EA", "fg": "black", "font": ("Arial", 11), "wraplength": 300, "side": tk.LEFT},
+    "user": {"bg": "#0084FF", "fg": "white", "font": ("Arial", 11), "wraplength": 200, "side": tk.RIGHT},
+    "thinking": {"bg": "#E5E5EA", "fg": "black", "font": ("Arial", 11, "italic"), "wraplength": 300, "side": tk.LEFT},
+}
+
+BACKGROUND = "#f0f0f0"
+
+# Avstånd runt bubblorna i pixlar
+MARGIN_X = 10
+MARGIN_Y = 5
+BUBBLE_PADX = 10
+BUBBLE_PADY = 8
+
+
+class MessageRecord:
+    """
+    Kompakt post för ett meddelande i chatten.
+    """
+
+    __slots__ = ("sender", "text", "height")
+
+    def __init__(self, sender, text, height):
+        """
+        Initierar posten.
+
+        Args:
+            sender (str): "bot", "user" eller "thinking"
+            text (str): Meddelandets text
+            height (int): Bubblans höjd i pixlar, inklusive marginaler
+        """
+        self.sender = sender
+        self.text = text
+        self.height = height
+
+
+class _Bubble:
+    """
+    Återanvändbar bubbelwidget som placeras på canvasen.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.frame = tk.Frame(canvas, padx=BUBBLE_PADX, pady=BUBBLE_PADY)
+        self.label = tk.Label(self.frame, justify="left")
+        self.label.pack()
+        self.item = canvas.create_window(0, 0, window=self.frame, anchor="nw", state="hidden")
+        self.record = None
+
+    def show(self, record, y, width):
+        """
+        Visar en post på given position.
+
+        Args:
+            record (MessageRecord): Posten som ska visas
+            y (int): Bubblans övre kant på canvasen
+            width (int): Canvasens bredd
+        """
+        if record is not self.record:
+            style = STYLES[record.sender]
+            self.frame.configure(bg=style["bg"])
+            self.label.configure(text=record.text, bg=style["bg"], fg=style["fg"],
+                                 font=style["font"], wraplength=style["wraplength"])
+            self.record = record
+
+        if STYLES[record.sender]["side"] == tk.RIGHT:
+            self.canvas.coords(self.item, width - MARGIN_X, y + MARGIN_Y)
+            self.canvas.itemconfigure(self.item, anchor="ne", state="normal")
+        else:
+            self.canvas.coords(self.item, MARGIN_X, y + MARGIN_Y)
+            self.canvas.itemconfigure(self.item, anchor="nw", state="normal")
+
+    def hide(self):
+        """Döljer bubblan tills den behövs igen."""
+        if self.record is not None:
+            self.canvas.itemconfigure(self.item, state="hidden")
+            self.record = None
+
+
+class TranscriptView:
+    """
+    Scrollbar chatvy som bara har widgets för de synliga meddelandena.
+    """
+
+    def __init__(self, parent):
+        """
+        Skapar vyn med canvas och scrollbar.
+
+        Args:
+            parent (tk.Widget): Widgeten som vyn läggs i
+        """
+        self.canvas = tk.Canvas(parent, bg=BACKGROUND, highlightthickness=0)
+        scrollbar = tk.Scrollbar(parent, orient="vertical", command=self._on_scroll)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.records = []
+        # offsets[i] är överkanten för post i, offsets[-1] är den totala höjden
+        self._offsets = [0]
+        self._pool = []
+        self._render_pending = False
+
+        # Osynliga etiketter som används för att mäta bubblornas höjd
+        self._measure = {
+            sender: tk.Label(self.canvas, font=style["font"], wraplength=style["wraplength"], justify="left")
+            for sender, style in STYLES.items()
+        }
+
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda event: self._on_scroll("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self._on_scroll("scroll", 1, "units"))
+
+    def __len__(self):
+        """Returnerar antalet meddelanden i vyn."""
+        return len(self.records)
+
+    def append(self, sender, text, scroll=True):
+        """
+        Lägger till ett meddelande sist i chatten.
+
+        Args:
+            sender (str): "bot", "user" eller "thinking"
+            text (str): Meddelandets text
+            scroll (bool): Om vyn ska scrollas ner till meddelandet
+
+        Returns:
+            MessageRecord: Posten för meddelandet
+        """
+        record = MessageRecord(sender, text, self._measure_height(sender, text))
+        self.records.append(record)
+        self._offsets.append(self._offsets[-1] + record.height)
+        self._update_scrollregion()
+        if scroll:
+            self.canvas.yview_moveto(1.0)
+        self.schedule_render()
+        return record
+
+    def remove(self, record):
+        """
+        Tar bort ett meddelande, t.ex. "tänker"-bubblan.
+
+        Args:
+            record (MessageRecord): Posten som ska tas bort
+        """
+        # Sök bakifrån, posten som tas bort är nästan alltid den sista
+        for index in range(len(self.records) - 1, -1, -1):
+            if self.records[index] is record:
+                break
+        else:
+            return
+        del self.records[index]
+
+        # Bara positionerna efter den borttagna posten behöver räknas om,
+        # och det är nästan alltid den sista
+        del self._offsets[index + 1:]
+        for later in self.records[index:]:
+            self._offsets.append(self._offsets[-1] + later.height)
+        self._update_scrollregion()
+        self.schedule_render()
+
+    def clear(self):
+        """
+        Tar bort alla meddelanden.
+        """
+        self.records = []
+        self._offsets = [0]
+        self._update_scrollregion()
+        self.canvas.yview_moveto(0.0)
+        self.schedule_render()
+
+    def schedule_render(self):
+        """
+        Ritar om vyn när Tk är ledigt, så att flera ändringar ger en enda omritning.
+        """
+        if not self._render_pending:
+            self._render_pending = True
+            self.canvas.after_idle(self.render)
+
+    def render(self):
+        """
+        Placerar bubblor för de meddelanden som syns och döljer resten av poolen.
+        """
+        self._render_pending = False
+        width = self.canvas.winfo_width()
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+
+        # Första synliga posten hittas med binärsökning i prefixsumman
+        index = max(0, bisect.bisect_right(self._offsets, top) - 1)
+        slot = 0
+        while index < len(self.records) and self._offsets[index] < bottom:
+            if slot == len(self._pool):
+                self._pool.append(_Bubble(self.canvas))
+            self._pool[slot].show(self.records[index], self._offsets[index], width)
+            slot += 1
+            index += 1
+
+        for bubble in self._pool[slot:]:
+            bubble.hide()
+
+    def _measure_height(self, sender, text):
+        """
+        Mäter höjden på en bubbla utan att skapa någon ny widget.
+
+        Args:
+            sender (str): Avsändaren, avgör typsnitt och radbrytning
+            text (str): Meddelandets text
+
+        Returns:
+            int: Höjden i pixlar, inklusive marginaler
+        """
+        label = self._measure[sender]
+        label.configure(text=text)
+        return label.winfo_reqheight() + 2 * BUBBLE_PADY + 2 * MARGIN_Y
+
+    def _update_scrollregion(self):
+        """
+        Sätter scrollregionen från den totala höjden i stället för bbox("all").
+        """
+        height = max(self._offsets[-1], self.canvas.winfo_height())
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), height))
+
+    def _on_configure(self, event):
+        """
+        Anpassar scrollregionen och bubblornas placering när vyn ändrar storlek.
+        """
+        self._update_scrollregion()
+        self.schedule_render()
+
+    def _on_scroll(self, *args):
+        """
+        Scrollar vyn och ritar om de synliga bubblorna.
+        """
+        self.canvas.yview(*args)
+        self.schedule_render()
+
+    def _on_mousewheel(self, event):
+        """
+        Scrollar med mushjulet (Windows och macOS).
+        """
+        self._on_scroll("scroll", -1 if event.delta > 0 else 1, "units")
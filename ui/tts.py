@@ -0,0 +1,388 @@
+"""
+Modul för talmotorer (text-till-tal) i Nova chatbot.
+
+Innehåller ett gemensamt gränssnitt för talmotorer, en molnbaserad motor
+(Google TTS), lokala motorer (espeak och pyttsx3), en deterministisk
+testmotor och en kedja som faller tillbaka till nästa motor när en motor
+är långsam eller otillgänglig.
+"""
+
+import hashlib
+import io
+import math
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class TTSBackend:
+    """
+    Basklass för talmotorer.
+    """
+
+    # Namnet på motorn, används i konfiguration och som del av cachenyckeln
+    name = "base"
+
+    # Ljudformatet som synthesize returnerar
+    audio_format = "wav"
+
+    def is_available(self):
+        """
+        Kontrollerar om motorn kan användas på den här datorn.
+
+        Returns:
+            bool: True om motorn kan användas
+        """
+        return True
+
+    def synthesize(self, text, language):
+        """
+        Syntetiserar text till ljud.
+
+        Args:
+            text (str): Texten som ska syntetiseras
+            language (str): Språkkoden, t.ex. "sv"
+
+        Returns:
+            bytes: Ljuddata i formatet audio_format
+        """
+        raise NotImplementedError
+
+    def candidates(self):
+        """
+        Returnerar de motorer som kan ge ljud för en text, i prioritetsordning.
+
+        Returns:
+            list: Motorerna
+        """
+        return [self]
+
+    def synthesize_with_backend(self, text, language):
+        """
+        Syntetiserar text och talar om vilken motor som gjorde det.
+
+        Args:
+            text (str): Texten som ska syntetiseras
+            language (str): Språkkoden
+
+        Returns:
+            tuple: (motor, ljuddata)
+        """
+        return self, self.synthesize(text, language)
+
+
+class GoogleTTSBackend(TTSBackend):
+    """
+    Molnbaserad talmotor via Google TTS (gTTS). Kräver nätverk.
+    """
+
+    name = "gtts"
+    audio_format = "mp3"
+
+    def is_available(self):
+        """Kontrollerar att gTTS är installerat."""
+        try:
+            import gtts  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def synthesize(self, text, language):
+        """Syntetiserar text med Google TTS."""
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=language, slow=False).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class EspeakBackend(TTSBackend):
+    """
+    Lokal talmotor som kör espeak-ng (eller espeak) som underprocess.
+    """
+
+    name = "espeak"
+    audio_format = "wav"
+
+    def __init__(self, executable=None, speed=160, timeout=10.0):
+        """
+        Initierar motorn.
+
+        Args:
+            executable (str): Sökväg till espeak, standard är espeak-ng eller espeak i PATH
+            speed (int): Talhastighet i ord per minut
+            timeout (float): Längsta tid en syntes får ta i sekunder
+        """
+        self.executable = executable or shutil.which("espeak-ng") or shutil.which("espeak")
+        self.speed = speed
+        self.timeout = timeout
+
+    def is_available(self):
+        """Kontrollerar att espeak finns."""
+        return bool(self.executable)
+
+    def synthesize(self, text, language):
+        """Syntetiserar text med espeak och returnerar WAV-data."""
+        result = subprocess.run(
+            [self.executable, "-v", language, "-s", str(self.speed), "--stdout", text],
+            capture_output=True,
+            timeout=self.timeout,
+            check=True
+        )
+        return result.stdout
+
+
+class Pyttsx3Backend(TTSBackend):
+    """
+    Lokal talmotor via pyttsx3 (SAPI5 på Windows, NSSpeechSynthesizer på macOS, espeak på Linux).
+    """
+
+    name = "pyttsx3"
+    audio_format = "wav"
+
+    def __init__(self):
+        """
+        Initierar motorn. Själva pyttsx3-motorn skapas vid första användningen.
+        """
+        self._engine = None
+
+        # pyttsx3 är inte trådsäker, så bara en syntes åt gången
+        self._lock = threading.Lock()
+
+    def is_available(self):
+        """Kontrollerar att pyttsx3 är installerat."""
+        try:
+            import pyttsx3  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def synthesize(self, text, language):
+        """Syntetiserar text med pyttsx3 via en temporär WAV-fil."""
+        import pyttsx3
+
+        with self._lock:
+            if self._engine is None:
+                self._engine = pyttsx3.init()
+                for voice in self._engine.getProperty("voices"):
+                    if language in str(getattr(voice, "languages", "")) or language in voice.id.lower():
+                        self._engine.setProperty("voice", voice.id)
+                        break
+
+            # pyttsx3 kan bara skriva till fil
+            handle, path = tempfile.mkstemp(suffix=".wav", prefix="nova_tts_")
+            os.close(handle)
+            try:
+                self._engine.save_to_file(text, path)
+                self._engine.runAndWait()
+                with open(path, "rb") as file:
+                    return file.read()
+            finally:
+                os.remove(path)
+
+
+class FakeTTSBackend(TTSBackend):
+    """
+    Deterministisk talmotor för tester.
+
+    Ger en kort ton vars frekvens och längd bestäms av texten, så samma text
+    ger alltid samma ljud. Alla anrop sparas i calls.
+    """
+
+    name = "fake"
+    audio_format = "wav"
+
+    def __init__(self, sample_rate=16000, seconds_per_char=0.02, max_seconds=5.0, delay=0.0):
+        """
+        Initierar motorn.
+
+        Args:
+            sample_rate (int): Samplingsfrekvens i Hz
+            seconds_per_char (float): Ljudets längd per tecken i texten
+            max_seconds (float): Längsta ljud som skapas
+            delay (float): Konstgjord fördröjning per syntes i sekunder
+        """
+        self.sample_rate = sample_rate
+        self.seconds_per_char = seconds_per_char
+        self.max_seconds = max_seconds
+        self.delay = delay
+        self.calls = []
+
+    def synthesize(self, text, language):
+        """Skapar en deterministisk ton för texten."""
+        self.calls.append((text, language))
+        if self.delay:
+            time.sleep(self.delay)
+
+        digest = hashlib.sha256(f"{language}\0{text}".encode("utf-8")).digest()
+        frequency = 200 + digest[0] * 2
+        samples = int(self.sample_rate * min(self.max_seconds, max(0.1, len(text) * self.seconds_per_char)))
+
+        frames = b"".join(
+            struct.pack("<h", int(8000 * math.sin(2 * math.pi * frequency * i / self.sample_rate)))
+            for i in range(samples)
+        )
+
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(frames)
+        return buffer.getvalue()
+
+
+class FallbackTTSBackend(TTSBackend):
+    """
+    Kedja av talmotorer som provas i tur och ordning.
+
+    En motor som misslyckas eller tar längre tid än sin tidsgräns hoppas över
+    under en viloperiod, så att t.ex. en lokal motor tar över direkt när
+    nätverket är nere i stället för att varje uppläsning väntar ut tidsgränsen.
+    """
+
+    name = "fallback"
+
+    def __init__(self, backends, timeout=3.0, cooldown=60.0):
+        """
+        Initierar kedjan.
+
+        Args:
+            backends (list): Motorer i prioritetsordning
+            timeout (float): Längsta tid en motor får ta innan nästa provas (None = ingen gräns).
+                             Gäller inte den sista motorn i kedjan.
+            cooldown (float): Antal sekunder en långsam eller trasig motor hoppas över
+        """
+        self.backends = [backend for backend in backends if backend.is_available()]
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self._disabled_until = {}
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="nova-tts")
+
+        if not self.backends:
+            logger.warning("Ingen av talmotorerna %s är tillgänglig", [b.name for b in backends])
+
+    @property
+    def audio_format(self):
+        """Ljudformatet från den första motorn i kedjan."""
+        return self.backends[0].audio_format if self.backends else "wav"
+
+    def is_available(self):
+        """Kontrollerar att minst en motor är tillgänglig."""
+        return bool(self.backends)
+
+    def candidates(self):
+        """Returnerar de motorer som inte vilar, i prioritetsordning."""
+        now = time.monotonic()
+        active = [b for b in self.backends if self._disabled_until.get(b.name, 0.0) <= now]
+        # Om alla vilar provas ändå den sista, hellre ett försök än inget ljud
+        return active or self.backends[-1:]
+
+    def synthesize(self, text, language):
+        """Syntetiserar text med den första motorn som lyckas."""
+        return self.synthesize_with_backend(text, language)[1]
+
+    def synthesize_with_backend(self, text, language):
+        """
+        Provar motorerna i tur och ordning.
+
+        Args:
+            text (str): Texten som ska syntetiseras
+            language (str): Språkkoden
+
+        Returns:
+            tuple: (motorn som lyckades, ljuddata)
+
+        Raises:
+            RuntimeError: Om ingen motor lyckades
+        """
+        candidates = self.candidates()
+        errors = []
+
+        for index, backend in enumerate(candidates):
+            is_last = index == len(candidates) - 1
+            try:
+                if self.timeout is None or is_last:
+                    return backend, backend.synthesize(text, language)
+
+                future = self._executor.submit(backend.synthesize, text, language)
+                return backend, future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                errors.append(f"{backend.name}: tog mer än {self.timeout} s")
+            except Exception as e:
+                errors.append(f"{backend.name}: {e}")
+
+            # Låt motorn vila så att nästa uppläsning går direkt till nästa motor
+            self._disabled_until[backend.name] = time.monotonic() + self.cooldown
+            logger.warning("Talmotorn %s misslyckades, provar nästa: %s", backend.name, errors[-1])
+
+        raise RuntimeError("Ingen talmotor kunde syntetisera texten: " + "; ".join(errors))
+
+
+def detect_audio_format(data):
+    """
+    Avgör ljudformatet utifrån de första byten i ljuddata.
+
+    Args:
+        data (bytes): Ljuddata
+
+    Returns:
+        str: "wav", "ogg" eller "mp3"
+    """
+    if data[:4] == b"RIFF":
+        return "wav"
+    if data[:4] == b"OggS":
+        return "ogg"
+    return "mp3"
+
+
+# Tillgängliga motorer per namn, används av create_backend
+BACKENDS = {
+    "gtts": GoogleTTSBackend,
+    "espeak": EspeakBackend,
+    "pyttsx3": Pyttsx3Backend,
+    "fake": FakeTTSBackend
+}
+
+# Standardkedjan: Google TTS först, lokala motorer som reserv
+DEFAULT_BACKENDS = "gtts,espeak,pyttsx3"
+
+
+def create_backend(spec=None, timeout=3.0):
+    """
+    Skapar en talmotor utifrån konfiguration.
+
+    Args:
+        spec (str eller list): Kommaseparerade motornamn i prioritetsordning, t.ex. "gtts,espeak".
+                               Standard är miljövariabeln NOVA_TTS_BACKENDS eller DEFAULT_BACKENDS.
+        timeout (float): Tidsgräns innan nästa motor i kedjan provas
+
+    Returns:
+        TTSBackend: En enskild motor, eller en FallbackTTSBackend om flera angavs
+
+    Raises:
+        ValueError: Om ett okänt motornamn anges
+    """
+    if spec is None:
+        spec = os.environ.get("NOVA_TTS_BACKENDS", DEFAULT_BACKENDS)
+    names = [name.strip() for name in spec.split(",")] if isinstance(spec, str) else list(spec)
+    names = [name for name in names if name]
+
+    unknown = [name for name in names if name not in BACKENDS]
+    if unknown:
+        raise ValueError(f"Okända talmotorer: {', '.join(unknown)}. Välj bland {', '.join(BACKENDS)}")
+
+    backends = [BACKENDS[name]() for name in names]
+    if len(backends) == 1:
+        return backends[0]
+    return FallbackTTSBackend(backends, timeout=timeout)
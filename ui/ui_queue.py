@@ -0,0 +1,110 @@
+"""
+Modul för trådsäkra gränssnittsuppdateringar i Nova chatbot.
+
+Tkinter får bara anropas från huvudtråden. Bakgrundstrådar lägger därför
+sina uppdateringar i en kö som huvudloopen tömmer i omgångar med fast
+intervall. Uppdateringar med samma nyckel slås ihop så att bara den senaste
+körs, vilket gör att en skur av statusändringar bara ger en omritning.
+"""
+
+import itertools
+import threading
+from collections import OrderedDict
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class UIQueue:
+    """
+    Kö med gränssnittsuppdateringar som körs i Tk-huvudtråden.
+    """
+
+    def __init__(self, root, interval_ms=50):
+        """
+        Initierar kön. Tömningen startar när start anropas.
+
+        Args:
+            root (tk.Tk): Programmets huvudfönster
+            interval_ms (int): Tid mellan två tömningar i millisekunder
+        """
+        self.root = root
+        self.interval_ms = interval_ms
+
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()
+        self._counter = itertools.count()
+        self._running = False
+        self._after_id = None
+
+        # Antal uppdateringar som har körts respektive slagits ihop
+        self.executed = 0
+        self.coalesced = 0
+
+    def post(self, func, *args, key=None):
+        """
+        Lägger en uppdatering i kön. Kan anropas från vilken tråd som helst.
+
+        Args:
+            func (callable): Funktionen som ska köras i huvudtråden
+            *args: Argument till funktionen
+            key (str): Om angiven ersätter uppdateringen en väntande uppdatering med
+                       samma nyckel och flyttas sist i kön
+        """
+        with self._lock:
+            if key is None:
+                key = ("_", next(self._counter))
+            elif key in self._pending:
+                self.coalesced += 1
+                self._pending.move_to_end(key)
+            self._pending[key] = (func, args)
+
+    def start(self):
+        """
+        Startar den periodiska tömningen. Ska anropas från huvudtråden.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        """
+        Stoppar tömningen. Väntande uppdateringar körs inte.
+        """
+        self._running = False
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def drain(self):
+        """
+        Kör alla väntande uppdateringar i den ordning de lades till.
+
+        Returns:
+            int: Antal uppdateringar som kördes
+        """
+        with self._lock:
+            batch = self._pending
+            self._pending = OrderedDict()
+
+        for func, args in batch.values():
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error("Fel vid uppdatering av gränssnittet: %s", e)
+
+        self.executed += len(batch)
+        return len(batch)
+
+    def _drain(self):
+        """
+        Tömmer kön och schemalägger nästa tömning.
+        """
+        self.drain()
+        if self._running:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
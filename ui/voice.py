@@ -3,21 +3,70 @@ Modul för röstinteraktion i Nova chatbot.
 Hanterar både tal-till-text och text-till-tal.
 """
 
+import io
 import os
+import tempfile
 import time
 import re
+import queue
+import threading
 import pygame
 import speech_recognition as sr
-from gtts import gTTS
+from nova.matcher import FuzzyIndex
+from ui.audio import CaptureStream, VoiceActivityDetector, frame_features
+from ui.audio_cache import AudioCache
+from ui.playback import PlaybackWorker, PRIORITY_NORMAL
+from ui.recognition import create_recognition_backend
+from ui.tts import create_backend, detect_audio_format
+from ui.wakeword import create_detector
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+# Pauser som läggs in efter skiljetecken för mer naturligt tal
+SPEECH_PAUSES = (
+    (". ", "... "),     # Längre paus efter meningar
+    ("? ", "?... "),    # Längre paus efter frågor
+    ("! ", "!... "),    # Längre paus efter utrop
+    (", ", ",.. "),     # Kort paus vid kommatecken
+    (": ", ":.. "),     # Kort paus vid kolon
+)
+
+# Skiljetecken med längre paus avslutar en mening vid strömmande uppläsning
+SENTENCE_ENDINGS = ".?!"
+SENTENCE_PATTERN = re.compile(r"(?<=[" + re.escape(SENTENCE_ENDINGS) + r"])\s+|\n+")
+
+
+def audio_seconds(audio):
+    """
+    Returnerar längden på ett ljudsegment i sekunder.
+    
+    Args:
+        audio (sr.AudioData): Ljudet
+        
+    Returns:
+        float: Längden i sekunder
+    """
+    return len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+
 
 class VoiceSpeaker:
     """
-    Klass för att hantera röstutmatning (text-till-tal) med Google TTS.
+    Klass för att hantera röstutmatning (text-till-tal) med en utbytbar talmotor.
     """
     
-    def __init__(self):
+    def __init__(self, audio_cache=None, backend=None, streaming=True, temp_dir=None):
         """
         Initierar en ny instans av VoiceSpeaker.
+        
+        Args:
+            audio_cache (AudioCache): Cache för syntetiserat tal, standard är användarens cachemapp
+            backend (TTSBackend): Talmotor, standard väljs med create_backend (NOVA_TTS_BACKENDS)
+            streaming (bool): Om långa svar ska delas upp i meningar som syntetiseras
+                              medan föregående mening spelas upp
+            temp_dir (str eller bool): Spela upp via temporära filer i stället för direkt från minnet.
+                                       True använder systemets temp-mapp, en sträng anger mappen.
         """
         # Initialisera pygame mixer för ljuduppspelning
         pygame.mixer.init()
@@ -25,16 +74,35 @@ class VoiceSpeaker:
         # Ställ in språk (sv för svenska)
         self.language = "sv"
         
+        # Talmotor, standard är Google TTS med lokala motorer som reserv
+        self.backend = backend or create_backend()
+        
+        # Cache så att återkommande fraser inte behöver syntetiseras igen
+        self.audio_cache = audio_cache or AudioCache()
+        
         # Flagga för om en uppläsning pågår
         self.is_speaking = False
+        self._playback_buffer = None
+        
+        # Strömmande uppläsning och mätvärden för tid till första ljud
+        self.streaming = streaming
+        self.metrics = {
+            "utterances": 0,
+            "last_time_to_first_audio": None,
+            "average_time_to_first_audio": None
+        }
         
-        # Skapa en dedikerad mapp för Nova's temporära filer
-        self.nova_temp_dir = os.path.join(os.path.expanduser("~"), "AppData", "Local", "Temp", "Nova")
-        if not os.path.exists(self.nova_temp_dir):
-            os.makedirs(self.nova_temp_dir)
+        # Ljudet spelas normalt upp direkt från minnet. Temporära filer används bara
+        # om det uttryckligen begärs, t.ex. om mixern inte kan läsa från filobjekt.
+        self.nova_temp_dir = None
+        if temp_dir:
+            if temp_dir is True:
+                temp_dir = os.path.join(tempfile.gettempdir(), "Nova")
+            os.makedirs(temp_dir, exist_ok=True)
+            self.nova_temp_dir = temp_dir
             
-        # Rensa gamla filer vid start
-        self.cleanup_temp_files()
+            # Rensa gamla filer vid start
+            self.cleanup_temp_files()
     
     def improve_speech_text(self, text):
         """
@@ -68,11 +136,8 @@ class VoiceSpeaker:
             text = re.sub(r'\b' + re.escape(word) + r'\b', replacement, text)
         
         # Lägg till pauser för mer naturligt tal genom att modifiera punktuation
-        text = text.replace(". ", "... ")     # Längre paus efter meningar
-        text = text.replace("? ", "?... ")    # Längre paus efter frågor
-        text = text.replace("! ", "!... ")    # Längre paus efter utrop
-        text = text.replace(", ", ",.. ")     # Kort paus vid kommatecken
-        text = text.replace(": ", ":.. ")     # Kort paus vid kolon
+        for punctuation, pause in SPEECH_PAUSES:
+            text = text.replace(punctuation, pause)
         
         # Dela upp långa siffror för bättre uppläsning
         # T.ex. ändra "12345" till "1 2 3 4 5"
@@ -86,58 +151,262 @@ class VoiceSpeaker:
     
     def cleanup_temp_files(self):
         """
-        Rensar alla temporära MP3-filer i Nova-mappen.
+        Rensar alla temporära ljudfiler i Nova-mappen.
         """
+        if not self.nova_temp_dir:
+            return
+        
         try:
             count = 0
             for filename in os.listdir(self.nova_temp_dir):
-                if filename.endswith(".mp3"):
+                if filename.endswith((".mp3", ".wav")):
                     file_path = os.path.join(self.nova_temp_dir, filename)
                     try:
                         os.remove(file_path)
                         count += 1
                     except Exception as e:
-                        print(f"Kunde inte radera {file_path}: {e}")
-            print(f"Rensade {count} gamla temporära ljudfiler från Nova-mappen.")
+                        logger.warning("Kunde inte radera %s: %s", file_path, e)
+            logger.info("Rensade %d gamla temporära ljudfiler från Nova-mappen.", count)
         except Exception as e:
-            print(f"Ett fel uppstod vid rensning av temporära filer: {e}")
+            logger.error("Ett fel uppstod vid rensning av temporära filer: %s", e)
     
-    def speak(self, text):
+    def synthesize(self, text):
         """
-        Konverterar text till tal och läser upp det med Google TTS.
+        Syntetiserar text till ljud, eller hämtar det från cachen.
         
         Args:
-            text (str): Texten som ska läsas upp
+            text (str): Texten som ska syntetiseras (före improve_speech_text)
+            
+        Returns:
+            str: Cachenyckeln för ljudklippet
         """
-        try:
-            print(f"Läser upp: {text}")
-            self.is_speaking = True
+        # Förbättra texten för mer naturligt tal
+        improved_text = self.improve_speech_text(text)
+        
+        # Använd ljud från cachen om någon av motorerna redan har syntetiserat texten
+        for backend in self.backend.candidates():
+            key = self.audio_cache.make_key(improved_text, self.language, backend.name)
+            if key in self.audio_cache:
+                return key
+        
+        # Annars syntetisera med talmotorn och spara under den motor som faktiskt användes
+        backend, data = self.backend.synthesize_with_backend(improved_text, self.language)
+        key = self.audio_cache.make_key(improved_text, self.language, backend.name)
+        self.audio_cache.put(key, data, backend.audio_format)
+        return key
+    
+    def prewarm(self, texts):
+        """
+        Syntetiserar en uppsättning texter i förväg så att de spelas upp direkt senare.
+        Texterna delas upp på samma sätt som vid uppläsning, så att cachen innehåller
+        just de klipp som speak slår upp.
+        
+        Args:
+            texts (iterable): Texter att lägga i cachen
             
-            # Förbättra texten för mer naturligt tal
-            improved_text = self.improve_speech_text(text)
+        Returns:
+            int: Antal klipp som fanns i, eller lades till i, cachen
+        """
+        count = 0
+        for text in texts:
+            for chunk in self.speech_chunks(text):
+                try:
+                    self.synthesize(chunk)
+                    count += 1
+                except Exception as e:
+                    logger.warning("Kunde inte förbereda ljud för '%s': %s", chunk, e)
+        logger.info("Ljudcachen förberedd med %d fraser", count)
+        return count
+    
+    def split_sentences(self, text):
+        """
+        Delar upp en text i meningar för strömmande uppläsning.
+        
+        Args:
+            text (str): Texten som ska delas upp
             
-            # Skapa ett unikt filnamn i Nova-mappen
-            timestamp = int(time.time())
-            temp_filename = os.path.join(self.nova_temp_dir, f"nova_speech_{timestamp}.mp3")
+        Returns:
+            list: Meningarna, utan tomma delar
+        """
+        return [chunk.strip() for chunk in SENTENCE_PATTERN.split(text) if chunk.strip()]
+    
+    def speech_chunks(self, text):
+        """
+        Returnerar klippen som en text läses upp som.
+        
+        Args:
+            text (str): Texten som ska läsas upp
             
-            # Använd Google TTS för att konvertera text till tal
-            tts = gTTS(text=improved_text, lang=self.language, slow=False)
-            tts.save(temp_filename)
+        Returns:
+            list: Meningarna om strömmande uppläsning är på, annars hela texten
+        """
+        if self.streaming:
+            chunks = self.split_sentences(text)
+            if chunks:
+                return chunks
+        return [text]
+    
+    def speak(self, text, interrupted=None):
+        """
+        Konverterar text till tal och läser upp det med talmotorn.
+        
+        Långa svar läses upp mening för mening om strömmande uppläsning är på,
+        så att uppspelningen kan börja innan hela texten är syntetiserad.
+        Metoden väntar tills uppläsningen är klar och ska därför anropas från
+        uppspelningskön (PlaybackWorker), inte från gränssnittets tråd.
+        
+        Args:
+            text (str): Texten som ska läsas upp
+            interrupted (threading.Event): Avbryter uppläsningen när den sätts
             
-            # Spela upp ljudfilen
-            pygame.mixer.music.load(temp_filename)
-            pygame.mixer.music.play()
+        Returns:
+            bool: True om hela texten lästes upp, False om den avbröts eller misslyckades
+        """
+        if interrupted is None:
+            interrupted = threading.Event()
+        
+        try:
+            logger.info("Läser upp: %s", text)
+            self.is_speaking = True
+            started = time.perf_counter()
             
-            # Vänta tills ljudet är färdigspelat
-            while pygame.mixer.music.get_busy():
-                pygame.time.Clock().tick(10)
+            chunks = self.speech_chunks(text)
+            if len(chunks) > 1:
+                return self._speak_chunks(chunks, started, interrupted)
             
-            # Vi försöker inte radera filen direkt - den rensas vid nästa start
+            key = self.synthesize(chunks[0])
+            if interrupted.is_set():
+                return False
+            return self._play(chunks[0], key, started, interrupted)
             
         except Exception as e:
-            print(f"Ett fel uppstod vid uppläsning: {e}")
+            logger.error("Ett fel uppstod vid uppläsning: %s", e)
+            return False
         finally:
             self.is_speaking = False
+    
+    def stop(self):
+        """
+        Stoppar den pågående uppspelningen direkt.
+        """
+        pygame.mixer.music.stop()
+    
+    def _speak_chunks(self, chunks, started, interrupted):
+        """
+        Syntetiserar mening N+1 i en bakgrundstråd medan mening N spelas upp.
+        
+        Args:
+            chunks (list): Meningarna som ska läsas upp
+            started (float): Tidpunkt (perf_counter) då uppläsningen begärdes
+            interrupted (threading.Event): Avbryter uppläsningen när den sätts
+            
+        Returns:
+            bool: True om alla meningar lästes upp
+        """
+        # Producenten ligger högst två meningar före uppspelningen
+        ready = queue.Queue(maxsize=2)
+        stop = threading.Event()
+        
+        def produce():
+            for chunk in chunks:
+                if stop.is_set():
+                    return
+                try:
+                    ready.put(("ok", (chunk, self.synthesize(chunk))))
+                except Exception as e:
+                    ready.put(("error", e))
+                    return
+            ready.put(("done", None))
+        
+        threading.Thread(target=produce, daemon=True).start()
+        
+        try:
+            first = True
+            while True:
+                status, value = ready.get()
+                if status == "done":
+                    return True
+                if status == "error":
+                    raise value
+                chunk, key = value
+                if interrupted.is_set() or not self._play(chunk, key, started if first else None, interrupted):
+                    return False
+                first = False
+        finally:
+            stop.set()
+            # Töm kön så att producenten inte blir hängande på put()
+            while not ready.empty():
+                ready.get_nowait()
+    
+    def _play(self, text, key, started=None, interrupted=None):
+        """
+        Spelar upp ett syntetiserat klipp och väntar tills det är klart eller avbryts.
+        
+        Args:
+            text (str): Texten som klippet syntetiserades från
+            key (str): Cachenyckeln för klippet
+            started (float): Tidpunkt då uppläsningen begärdes, för att mäta tid till första ljud
+            interrupted (threading.Event): Stoppar uppspelningen när den sätts
+            
+        Returns:
+            bool: True om klippet spelades klart eller hoppades över, False om det avbröts
+        """
+        if interrupted is None:
+            interrupted = threading.Event()
+        
+        data = self.audio_cache.get(key)
+        if data is None:
+            # Klippet kan ha trängts undan ur cachen, eller filen raderats, efter att
+            # det syntetiserades. Syntetisera det igen, och hoppa annars över det.
+            logger.info("Ljudklippet för '%s' saknas i cachen, syntetiserar igen", text)
+            try:
+                data = self.audio_cache.get(self.synthesize(text))
+            except Exception as e:
+                logger.warning("Kunde inte syntetisera '%s' igen: %s", text, e)
+            if data is None:
+                logger.warning("Hoppar över '%s' i uppläsningen", text)
+                return True
+        
+        audio_format = detect_audio_format(data)
+        
+        if self.nova_temp_dir:
+            # Unikt filnamn så att två uppläsningar aldrig skriver över varandra
+            handle, path = tempfile.mkstemp(prefix="nova_speech_", suffix=f".{audio_format}", dir=self.nova_temp_dir)
+            with os.fdopen(handle, "wb") as file:
+                file.write(data)
+            pygame.mixer.music.load(path)
+        else:
+            # Mata mixern direkt från minnet, utan några filer på disk.
+            # Bufferten sparas så att den lever hela uppspelningen.
+            self._playback_buffer = io.BytesIO(data)
+            pygame.mixer.music.load(self._playback_buffer, audio_format)
+        pygame.mixer.music.play()
+        
+        if started is not None:
+            self._record_time_to_first_audio(time.perf_counter() - started)
+        
+        # Vänta tills ljudet är färdigspelat. Väntan på händelsen gör att ett
+        # avbrott märks direkt i stället för vid nästa kontroll.
+        while pygame.mixer.music.get_busy():
+            if interrupted.wait(0.05):
+                self.stop()
+                return False
+        return True
+    
+    def _record_time_to_first_audio(self, seconds):
+        """
+        Uppdaterar mätvärdena för tid till första ljud.
+        
+        Args:
+            seconds (float): Tiden från begäran till att uppspelningen startade
+        """
+        metrics = self.metrics
+        count = metrics["utterances"] + 1
+        average = metrics["average_time_to_first_audio"] or 0.0
+        metrics["utterances"] = count
+        metrics["last_time_to_first_audio"] = seconds
+        metrics["average_time_to_first_audio"] = average + (seconds - average) / count
+        logger.debug("Tid till första ljud: %.3f s", seconds)
 
 
 class VoiceRecognizer:
@@ -145,15 +414,194 @@ class VoiceRecognizer:
     Klass för att hantera röstigenkänning.
     """
     
-    def __init__(self):
+    def __init__(self, capture=None, calibration_seconds=0.5, wake_word_detector=None, backend=None,
+                 vad=True, barge_in_ratio=3.0, barge_in_seconds=0.3):
         """
         Initierar en ny instans av VoiceRecognizer.
+        
+        Args:
+            capture (CaptureStream): Delad inspelning från mikrofonen, skapas vid första lyssningen.
+                                     En ReplaySource spelar upp WAV-filer i stället för mikrofonen.
+            calibration_seconds (float): Hur länge bakgrundsljudet mäts vid första lyssningen
+            wake_word_detector (WakeWordDetector): Lokal detektor som måste lösa ut innan
+                                                   ljud vid nyckelordslyssning skickas vidare
+            backend (RecognitionBackend): Taligenkänningsmotor, standard väljs med
+                                          create_recognition_backend (NOVA_STT_BACKEND)
+            vad (VoiceActivityDetector eller bool): Detektor som kastar ljud utan tal och kortar
+                                                    tal till den del som faktiskt är röst.
+                                                    True ger standardinställningarna, False stänger av.
+            barge_in_ratio (float): Hur mycket starkare än energitröskeln tal måste vara för att
+                                    avbryta Nova. Uppläsningen hörs också i mikrofonen.
+            barge_in_seconds (float): Hur länge användaren måste prata för att avbryta Nova
         """
-        # Skapa en recognizer-instans från speech_recognition
+        # Skapa en recognizer-instans från speech_recognition för inspelning och kalibrering
         self.recognizer = sr.Recognizer()
         
+        # Motorn som omvandlar ljudet till text
+        self.backend = backend or create_recognition_backend()
+        
+        # Efter den första kalibreringen anpassas tröskeln löpande under tystnad
+        self.recognizer.dynamic_energy_threshold = True
+        
         # Ange språket för igenkänning (svenska)
         self.language = "sv-SE"
+        
+        # Röstaktivitetsdetektering innan något ljud skickas till igenkänningen
+        self.vad = VoiceActivityDetector() if vad is True else (vad or None)
+        
+        # Lokalt väckordssteg framför den fullständiga igenkänningen
+        self.wake_word_detector = wake_word_detector
+        
+        # Mikrofonen hålls öppen mellan lyssningarna
+        self.capture = capture
+        self.calibration_seconds = calibration_seconds
+        self._source = None
+        self._source_lock = threading.Lock()
+        
+        # Egen läsare i inspelningen som lyssnar efter användaren medan Nova pratar
+        self.barge_in_ratio = barge_in_ratio
+        self.barge_in_seconds = barge_in_seconds
+        self._monitor = None
+        self._barge_in_frames = 0
+        
+        # Mätvärden för anropen till taligenkänningsmotorn och vad röstaktivitetsdetekteringen sparar
+        self.stats = {
+            "recognition_calls": 0,
+            "recognition_seconds": 0.0,
+            "audio_seconds": 0.0,
+            "segments_discarded": 0,
+            "audio_seconds_saved": 0.0
+        }
+    
+    def get_source(self):
+        """
+        Returnerar ljudkällan och kalibrerar för bakgrundsljud första gången.
+        
+        Returns:
+            BufferedSource: Källan som läser från den öppna mikrofonen
+        """
+        with self._source_lock:
+            if self._source is None or not self.capture.running:
+                if self.capture is None:
+                    self.capture = CaptureStream()
+                self._source = self.capture.open_source()
+                logger.debug("Kalibrerar för bakgrundsljud...")
+                self.recognizer.adjust_for_ambient_noise(self._source, duration=self.calibration_seconds)
+            else:
+                # Fortsätt där förra lyssningen slutade, men aldrig långt efter realtid
+                self._source.catch_up()
+            return self._source
+    
+    def skip_buffered_audio(self):
+        """
+        Hoppar över ljud som redan har spelats in, t.ex. Novas egen uppläsning.
+        """
+        if self._source is not None:
+            self._source.skip_to_live()
+    
+    def close(self):
+        """
+        Stänger mikrofonen.
+        """
+        with self._source_lock:
+            if self.capture is not None:
+                self.capture.stop()
+            self._source = None
+            self._monitor = None
+    
+    def listen_for_barge_in(self, timeout=0.1):
+        """
+        Lyssnar en kort stund efter att användaren börjar prata medan Nova pratar.
+        
+        Mikrofonen hör även Novas uppläsning, så talet måste vara tydligt starkare än
+        energitröskeln och pågå i minst barge_in_seconds för att räknas.
+        
+        Args:
+            timeout (float): Hur länge det ska lyssnas i sekunder
+            
+        Returns:
+            bool: True om användaren har börjat prata
+        """
+        self.get_source()
+        if not isinstance(self.capture, CaptureStream):
+            # Uppspelade inspelningar har ingen mikrofon att lyssna på samtidigt
+            time.sleep(timeout)
+            return False
+        
+        with self._source_lock:
+            if self._monitor is None:
+                self._monitor = self.capture.open_source(max_lag=self.barge_in_seconds)
+                self._barge_in_frames = 0
+            monitor = self._monitor
+        monitor.catch_up()
+        
+        vad = self.vad or VoiceActivityDetector()
+        threshold = self.recognizer.energy_threshold * self.barge_in_ratio
+        required_frames = max(1, int(self.barge_in_seconds / vad.frame_seconds))
+        deadline = time.perf_counter() + timeout
+        
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            try:
+                data = monitor.stream.read_chunk(remaining)
+            except OSError:
+                return False
+            if data is None:
+                return False
+            
+            # Räkna ramar med tal i följd, en tyst ram nollställer räkningen
+            features = frame_features(data, monitor.SAMPLE_RATE, vad.frame_seconds)
+            for voiced in vad.speech_frames(features, threshold):
+                self._barge_in_frames = self._barge_in_frames + 1 if voiced else 0
+                if self._barge_in_frames >= required_frames:
+                    self._barge_in_frames = 0
+                    return True
+    
+    def detect_speech(self, audio):
+        """
+        Kastar ljud utan tal och kortar tal till den del som faktiskt är röst.
+        
+        Args:
+            audio (sr.AudioData): Ljudet från recognizer.listen
+            
+        Returns:
+            sr.AudioData: Ljudet som ska kännas igen, eller None om det saknar tal
+        """
+        if self.vad is None:
+            return audio
+        
+        trimmed = self.vad.trim(audio, self.recognizer.energy_threshold)
+        seconds = audio_seconds(audio)
+        stats = self.stats
+        if trimmed is None:
+            stats["segments_discarded"] += 1
+            stats["audio_seconds_saved"] += seconds
+            logger.debug("Kastade %.2f s ljud utan tal", seconds)
+            return None
+        
+        stats["audio_seconds_saved"] += seconds - audio_seconds(trimmed)
+        return trimmed
+    
+    def recognize(self, audio):
+        """
+        Omvandlar ljud till text med taligenkänningsmotorn och uppdaterar mätvärdena.
+        
+        Args:
+            audio (sr.AudioData): Ljudet som ska kännas igen
+            
+        Returns:
+            str: Den igenkända texten
+        """
+        stats = self.stats
+        stats["recognition_calls"] += 1
+        stats["audio_seconds"] += audio_seconds(audio)
+        started = time.perf_counter()
+        try:
+            return self.backend.recognize(audio, self.language)
+        finally:
+            stats["recognition_seconds"] += time.perf_counter() - started
     
     def listen(self):
         """
@@ -164,75 +612,92 @@ class VoiceRecognizer:
         """
         try:
             # Skriv bara en gång att vi lyssnar
-            print("Lyssnar...")
+            logger.debug("Lyssnar...")
             
-            # Använd mikrofonen som ljudkälla
-            with sr.Microphone() as source:
-                # Justera för bakgrundsljud
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                
-                # Lyssna efter ljud från mikrofonen
-                audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=10)
-                
-                # Försök känna igen talet
-                text = self.recognizer.recognize_google(audio, language=self.language)
-                print(f"Uppfattade: '{text}'")
-                return text
+            # Använd den öppna mikrofonen som ljudkälla
+            source = self.get_source()
+            
+            # Lyssna efter ljud från mikrofonen
+            audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=10)
+            
+            # Skicka bara vidare ljud som innehåller tal
+            audio = self.detect_speech(audio)
+            if audio is None:
+                return None
+            
+            # Försök känna igen talet
+            text = self.recognize(audio)
+            logger.info("Uppfattade: '%s'", text)
+            return text
                     
         except sr.WaitTimeoutError:
             # Timeout - inget ljud hördes
-            # print("Timeout - inget ljud uppfattades")
+            logger.debug("Timeout - inget ljud uppfattades")
             return None
         except sr.UnknownValueError:
             # Kunde inte förstå ljudet
-            # print("Kunde inte förstå ljudet")
+            logger.debug("Kunde inte förstå ljudet")
             return None
         except sr.RequestError:
-            # Kunde inte ansluta till Google's API
-            print("Kunde inte ansluta till Google's API")
+            # Kunde inte använda taligenkänningsmotorn
+            logger.warning("Kunde inte använda taligenkänningsmotorn %s", self.backend.name)
             return None
         except Exception as e:
-            print(f"Ett fel uppstod vid taligenkänning: {e}")
+            logger.error("Ett fel uppstod vid taligenkänning: %s", e)
             return None      
 
-    def listen_for_keyword(self, keywords=None):
+    def listen_for_keyword(self, keywords=None, keyword_index=None, max_distance=0):
         """
         Lyssnar efter specifika nyckelord.
         
         Args:
             keywords (list): Lista med nyckelord att lyssna efter. 
                             Om None, lyssnar efter alla ord.
+            keyword_index (FuzzyIndex): Index över nyckelorden för ungefärlig matchning
+            max_distance (int): Största tillåtna redigeringsavstånd, 0 kräver exakt träff
         
         Returns:
             str: Den uppfattade texten om ett nyckelord identifieras, annars None
         """
         try:
-            print("Lyssnar efter nyckelord...")
+            logger.debug("Lyssnar efter nyckelord...")
             
-            # Använd mikrofonen som ljudkälla
-            with sr.Microphone() as source:
-                # Justera för bakgrundsljud
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                
-                # Lyssna efter ljud från mikrofonen med kortare timeout
-                audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=5)
-                
-                # Försök känna igen talet
-                text = self.recognizer.recognize_google(audio, language=self.language).lower()
+            # Använd den öppna mikrofonen som ljudkälla
+            source = self.get_source()
+            
+            # Lyssna efter ljud från mikrofonen med kortare timeout
+            audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=5)
+            
+            # Skicka bara vidare ljud som innehåller tal
+            audio = self.detect_speech(audio)
+            if audio is None:
+                return None
+            
+            # Skicka bara ljudet vidare om den lokala detektorn känner igen väckordet
+            if self.wake_word_detector is not None and not self.wake_word_detector.detect(audio):
+                return None
+            
+            # Försök känna igen talet
+            text = self.recognize(audio).lower()
+            
+            # Om vi har specifika nyckelord, kontrollera om texten matchar
+            if keywords:
+                for keyword in keywords:
+                    if keyword.lower() in text:
+                        logger.info("Nyckelord identifierat: '%s'", text)
+                        return text
+                # Tillåt små igenkänningsfel, t.ex. "där" i stället för "här"
+                if keyword_index and max_distance:
+                    if keyword_index.first_match(text, max_distance):
+                        logger.info("Nyckelord identifierat (ungefärligt): '%s'", text)
+                        return text
+                # Inget nyckelord hittades
+                return None
+            else:
+                # Om inga specifika nyckelord, returnera all text
+                logger.info("Uppfattade: '%s'", text)
+                return text
                 
-                # Om vi har specifika nyckelord, kontrollera om texten matchar
-                if keywords:
-                    for keyword in keywords:
-                        if keyword.lower() in text:
-                            print(f"Nyckelord identifierat: '{text}'")
-                            return text
-                    # Inget nyckelord hittades
-                    return None
-                else:
-                    # Om inga specifika nyckelord, returnera all text
-                    print(f"Uppfattade: '{text}'")
-                    return text
-                    
         except sr.WaitTimeoutError:
             # Timeout - inget ljud hördes
             return None
@@ -240,10 +705,10 @@ class VoiceRecognizer:
             # Kunde inte förstå ljudet
             return None
         except sr.RequestError:
-            # Kunde inte ansluta till Google's API
+            # Kunde inte använda taligenkänningsmotorn
             return None
         except Exception as e:
-            print(f"Ett fel uppstod vid lyssning efter nyckelord: {e}")
+            logger.error("Ett fel uppstod vid lyssning efter nyckelord: %s", e)
             return None
 
 
@@ -253,26 +718,46 @@ class VoiceInterface:
     Kombinerar taligenkänning och tal.
     """
     
-    def __init__(self, chatbot_name="Nova"):
+    def __init__(self, chatbot_name="Nova", fuzzy_distance=2):
         """
         Initierar en ny instans av VoiceInterface.
         
         Args:
             chatbot_name (str): Namn på chatboten
+            fuzzy_distance (int): Största redigeringsavstånd när taligenkänd text matchas mot
+                                  kommandon, eftersom igenkänningen sällan blir exakt
         """
         # Skapa komponenter för taligenkänning och tal
-        self.recognizer = VoiceRecognizer()
+        self.recognizer = VoiceRecognizer(wake_word_detector=create_detector())
         self.speaker = VoiceSpeaker()
         
+        # Uppläsningar körs i en egen tråd så att gränssnittet aldrig väntar på ljud
+        self.playback = PlaybackWorker(self.speaker)
+        
         # Importera CommandHandler här istället för på toppnivån för att undvika cirkulära beroenden
         from nova.commands import CommandHandler
         
         # Initiera kommandohanterare
-        self.command_handler = CommandHandler(chatbot_name)
+        self.fuzzy_distance = fuzzy_distance
+        self.command_handler = CommandHandler(chatbot_name, fuzzy_distance=fuzzy_distance)
+        
+        # Aktiveringsfraserna och deras index byggs om bara när commands.json ändras
+        self._activation_source = None
+        self._activation_phrases = []
+        self._activation_index = None
         
         # Flagga för om röststyrning är aktiverad
         self.voice_enabled = False
         
+        # Ljudcachen förbereds i bakgrunden första gången röststyrning aktiveras
+        self._prewarm_started = False
+    
+    @property
+    def wake_word_enrollment_needed(self):
+        """True om inget väckord har spelats in, så att allt tal i väckordsläget skickas till taligenkänningen."""
+        detector = self.recognizer.wake_word_detector
+        return detector is not None and detector.needs_enrollment
+        
     def toggle_voice(self):
         """
         Växlar mellan aktivering och deaktivering av röststyrning.
@@ -280,25 +765,96 @@ class VoiceInterface:
         Returns:
             bool: Den nya statusen för röststyrning (True = aktiverad)
         """
-        self.voice_enabled = not self.voice_enabled
+        return self.set_voice_enabled(not self.voice_enabled)
+    
+    def set_voice_enabled(self, enabled):
+        """
+        Aktiverar eller deaktiverar röststyrning.
+        
+        Args:
+            enabled (bool): True för att aktivera röststyrning
+            
+        Returns:
+            bool: Den nya statusen för röststyrning
+        """
+        self.voice_enabled = enabled
         status = "aktiverad" if self.voice_enabled else "deaktiverad"
-        print(f"Röststyrning är nu {status}")
+        logger.info("Röststyrning är nu %s", status)
         
         # Om röststyrning stängs av, rensa gamla temporära filer
         if not self.voice_enabled:
             self.speaker.cleanup_temp_files()
+        elif not self._prewarm_started:
+            self._prewarm_started = True
+            threading.Thread(target=self.prewarm_static_responses, daemon=True).start()
             
         return self.voice_enabled
+    
+    def static_responses(self, chatbot_names=None):
+        """
+        Samlar alla svar som inte innehåller dynamiska delar.
+        
+        Args:
+            chatbot_names (iterable): Namn som kan förekomma i svaren, standard är kommandohanterarens
+            
+        Returns:
+            list: Unika svarstexter
+        """
+        handler = self.command_handler
+        registry = handler.registry
+        texts = []
+        
+        for name in chatbot_names or (handler.chatbot_name,):
+            for template in registry.get_commands().templates_for(name).values():
+                if template.text:
+                    texts.append(template.text)
+            for templates in registry.get_responses().templates_for(name).values():
+                texts.extend(template.text for template in templates if template.text)
+        
+        # Svar från kommandofunktioner som alltid ger samma text, t.ex. hjälptexten
+        for action, function in handler.command_functions.items():
+            if action not in handler.NON_CACHEABLE_ACTIONS:
+                texts.append(function())
+        
+        return list(dict.fromkeys(texts))
+    
+    def prewarm_static_responses(self, chatbot_names=None):
+        """
+        Syntetiserar alla statiska svar i förväg så att de kan spelas upp direkt.
         
-    def say_response(self, text):
+        Args:
+            chatbot_names (iterable): Namn som kan förekomma i svaren
+            
+        Returns:
+            int: Antal fraser i cachen
         """
-        Läser upp ett svar med röst.
+        return self.speaker.prewarm(self.static_responses(chatbot_names))
+        
+    def say_response(self, text, priority=PRIORITY_NORMAL, callback=None):
+        """
+        Lägger ett svar i uppläsningskön utan att vänta på att det läses upp.
         
         Args:
             text (str): Texten som ska läsas upp
+            priority (int): Prioritet i kön, lägre värde spelas först
+            callback (callable): Anropas med uppläsningen när den är klar eller avbruten
+            
+        Returns:
+            Utterance: En Future för uppläsningen, eller None om röststyrning är avstängd
         """
         if self.voice_enabled:
-            self.speaker.speak(text)
+            return self.playback.submit(text, priority, callback)
+        return None
+    
+    def barge_in(self):
+        """
+        Avbryter pågående och köade uppläsningar, t.ex. när användaren börjar prata
+        eller skickar ett nytt meddelande.
+        
+        Returns:
+            int: Antal uppläsningar som avbröts
+        """
+        return self.playback.barge_in()
     
     def listen_for_activation(self):
         """
@@ -307,20 +863,14 @@ class VoiceInterface:
         Returns:
             str: Kommandot som identifierades, eller None
         """
-        # Hämta aktiveringsfraserna från commands.json
-        activation_phrases = []
-        for cmd_type, cmd_data in self.command_handler.commands.items():
-            if cmd_data.get("action") == "activate_voice":
-                activation_phrases.extend(cmd_data.get("phrases", []))
-        
-        # Om vi inte hittade några fraser, använd några standardfraser
-        if not activation_phrases:
-            activation_phrases = ["nova är du här", "nova är du här", "nova lyssna", "hej nova", "aktivera röststyrning"]
+        activation_phrases, activation_index = self.get_activation_phrases()
             
-        print("Väntar på kommando...")
+        logger.debug("Väntar på kommando...")
         
         # Lyssna efter nyckelord med de specifika fraserna
-        text = self.recognizer.listen_for_keyword(activation_phrases)
+        text = self.recognizer.listen_for_keyword(
+            activation_phrases, keyword_index=activation_index, max_distance=self.fuzzy_distance
+        )
         
         # Om vi fick text, kontrollera om det är ett kommando
         if text:
@@ -328,6 +878,31 @@ class VoiceInterface:
         
         return None
         
+    def get_activation_phrases(self):
+        """
+        Hämtar aktiveringsfraserna och ett index för ungefärlig matchning av dem.
+        
+        Returns:
+            tuple: (lista med fraser, FuzzyIndex över fraserna)
+        """
+        command_set = self.command_handler.load_commands()
+        if command_set is not self._activation_source:
+            # Hämta aktiveringsfraserna från commands.json
+            activation_phrases = []
+            for cmd_type, cmd_data in command_set.commands.items():
+                if cmd_data.get("action") == "activate_voice":
+                    activation_phrases.extend(cmd_data.get("phrases", []))
+            
+            # Om vi inte hittade några fraser, använd några standardfraser
+            if not activation_phrases:
+                activation_phrases = ["nova är du här", "nova är du här", "nova lyssna", "hej nova", "aktivera röststyrning"]
+            
+            self._activation_phrases = activation_phrases
+            self._activation_index = FuzzyIndex((phrase, phrase) for phrase in activation_phrases)
+            self._activation_source = command_set
+        
+        return self._activation_phrases, self._activation_index
+    
     def listen_for_command(self):
         """
         Lyssnar efter ett kommando från användaren.
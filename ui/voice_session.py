@@ -0,0 +1,247 @@
+"""
+Modul för röstsessionen i Nova chatbot.
+
+En tillståndsmaskin i en enda arbetstråd styr hela röstflödet:
+
+    idle -> wake_listening -> command_listening -> speaking -> command_listening ...
+
+Nästa lyssning startar så fort föregående steg är klart, dvs. när ljudet
+har spelats in eller uppläsningen är slut, i stället för efter fasta pauser.
+Börjar användaren prata medan Nova pratar avbryts uppläsningen (barge-in)
+och sessionen lyssnar direkt.
+"""
+
+import queue
+import threading
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+# Sessionens tillstånd
+IDLE = "idle"
+WAKE_LISTENING = "wake_listening"
+COMMAND_LISTENING = "command_listening"
+SPEAKING = "speaking"
+
+# Händelser som styr tillståndsmaskinen
+EVENT_STOP = "stop"
+EVENT_VOICE_ENABLED = "voice_enabled"
+EVENT_TURN_DONE = "turn_done"
+EVENT_SPEECH_STARTED = "speech_started"
+EVENT_SPEECH_DONE = "speech_done"
+
+# Hur länge i taget sessionen lyssnar efter att användaren avbryter Nova
+BARGE_IN_POLL_SECONDS = 0.1
+
+
+class VoiceSession:
+    """
+    Tillståndsmaskin för röstinteraktionen, driven av händelser i en arbetstråd.
+
+    Gränssnittet får veta vad som händer via anrop (callbacks) som görs från
+    arbetstråden, och meddelar sessionen via de publika metoderna, som bara
+    lägger händelser i kön och aldrig blockerar.
+    """
+
+    def __init__(self, voice_interface, on_state_change=None, on_activation=None, on_utterance=None):
+        """
+        Initierar sessionen.
+
+        Args:
+            voice_interface (VoiceInterface): Röstgränssnittet som lyssnar och läser upp
+            on_state_change (callable): Anropas med det nya tillståndet
+            on_activation (callable): Anropas med svarstexten när röststyrning aktiveras med väckordet
+            on_utterance (callable): Anropas med texten när användaren har sagt något i röstläge.
+                                     Gränssnittet ska anropa turn_done när svaret är hanterat.
+        """
+        self.voice_interface = voice_interface
+        self.on_state_change = on_state_change
+        self.on_activation = on_activation
+        self.on_utterance = on_utterance
+
+        self.state = IDLE
+        self._events = queue.Queue()
+        self._thread = None
+        self._awaiting_turn = False
+
+        # Sätts när Nova börjar prata, så att en pågående lyssning vet att den kan ha hört Nova
+        self._speech_started = threading.Event()
+
+        # Uppspelningskön meddelar när Nova börjar prata, oavsett varifrån svaret kom,
+        # och när Nova har pratat klart
+        voice_interface.playback.add_busy_callback(self._on_speech_started)
+        voice_interface.playback.add_idle_callback(lambda: self._post(EVENT_SPEECH_DONE))
+
+    def start(self):
+        """
+        Startar arbetstråden. Gör inget om den redan körs.
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="nova-voice-session", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stoppar sessionen efter pågående lyssning.
+        """
+        self._post(EVENT_STOP)
+
+    def set_voice_enabled(self, enabled):
+        """
+        Meddelar att röststyrning har aktiverats eller deaktiverats från gränssnittet.
+
+        Args:
+            enabled (bool): Den nya statusen
+        """
+        self._post(EVENT_VOICE_ENABLED, enabled)
+
+    def turn_done(self):
+        """
+        Meddelar att gränssnittet har hanterat det användaren sa, och lagt eventuellt svar i uppläsningskön.
+        """
+        self._post(EVENT_TURN_DONE)
+
+    def _on_speech_started(self):
+        """
+        Anropas när uppläsningskön börjar spela, t.ex. ett svar på ett skrivet meddelande.
+        """
+        self._speech_started.set()
+        self._post(EVENT_SPEECH_STARTED)
+
+    def _post(self, event, value=None):
+        """
+        Lägger en händelse i kön.
+        """
+        self._events.put((event, value))
+
+    def _set_state(self, state):
+        """
+        Byter tillstånd och meddelar gränssnittet.
+        """
+        if state == self.state:
+            return
+        logger.debug("Röstsession: %s -> %s", self.state, state)
+        self.state = state
+        if self.on_state_change:
+            self.on_state_change(state)
+
+    def _listening_state(self):
+        """
+        Returnerar vilket lyssningstillstånd sessionen ska vara i när inget annat pågår.
+        """
+        return COMMAND_LISTENING if self.voice_interface.voice_enabled else WAKE_LISTENING
+
+    def _next_state(self):
+        """
+        Väljer tillstånd efter en händelse eller lyssning.
+
+        Sessionen väntar medan gränssnittet hanterar en tur eller Nova pratar,
+        annars lyssnar den direkt igen.
+        """
+        if self._awaiting_turn or self.voice_interface.playback.is_speaking:
+            self._set_state(SPEAKING)
+        else:
+            if self.state == SPEAKING:
+                # Mikrofonen har spelat in uppläsningen, den ska inte tolkas som ett kommando
+                self.voice_interface.recognizer.skip_buffered_audio()
+            self._set_state(self._listening_state())
+
+    def _run(self):
+        """
+        Arbetstrådens huvudloop.
+        """
+        self._next_state()
+        while True:
+            # Nova kan ha börjat prata utan att sessionen startade det, t.ex. efter ett skrivet meddelande
+            if self.state in (WAKE_LISTENING, COMMAND_LISTENING) and self.voice_interface.playback.is_speaking:
+                self._next_state()
+
+            # Lyssna bara när inga händelser väntar, annars hanteras de först
+            if self.state in (WAKE_LISTENING, COMMAND_LISTENING) and self._events.empty():
+                try:
+                    self._listen()
+                except Exception as e:
+                    logger.error("Ett fel uppstod i röstsessionen: %s", e)
+                continue
+
+            # Medan Nova pratar lyssnar sessionen efter att användaren börjar prata
+            if self.state == SPEAKING and self._events.empty() and self._can_barge_in():
+                try:
+                    if self.voice_interface.recognizer.listen_for_barge_in(BARGE_IN_POLL_SECONDS):
+                        self._barge_in()
+                except Exception as e:
+                    logger.error("Ett fel uppstod när röstsessionen lyssnade efter avbrott: %s", e)
+                continue
+
+            event, value = self._events.get()
+            if event == EVENT_STOP:
+                self._set_state(IDLE)
+                return
+            if event == EVENT_VOICE_ENABLED:
+                self.voice_interface.voice_enabled = value
+            elif event == EVENT_TURN_DONE:
+                self._awaiting_turn = False
+            self._next_state()
+
+    def _can_barge_in(self):
+        """
+        Returnerar True om användaren kan avbryta det Nova säger genom att prata.
+
+        Medan gränssnittet hanterar en tur väntar sessionen i stället på svaret.
+        """
+        return (self.voice_interface.voice_enabled and not self._awaiting_turn
+                and self.voice_interface.playback.is_speaking)
+
+    def _barge_in(self):
+        """
+        Avbryter uppläsningen och lyssnar direkt efter det användaren säger.
+        """
+        logger.info("Användaren började prata, avbryter uppläsningen")
+        self.voice_interface.barge_in()
+        # Vänta tills uppläsningen har stannat, så att den inte tolkas som pågående tal
+        self.voice_interface.playback.wait_until_idle(0.5)
+        # Det buffrade ljudet hoppas inte över, det innehåller början av det användaren säger
+        self._set_state(COMMAND_LISTENING)
+
+    def _listen(self):
+        """
+        Gör en lyssning i det aktuella tillståndet och hanterar resultatet.
+        """
+        voice_interface = self.voice_interface
+
+        if self.state == WAKE_LISTENING:
+            text = voice_interface.listen_for_activation()
+            if not text:
+                return
+            action, response, _ = voice_interface.check_for_command(text)
+            if action != "activate_voice":
+                return
+
+            voice_interface.set_voice_enabled(True)
+            if self.on_activation:
+                self.on_activation(response)
+            voice_interface.say_response(response)
+            self._next_state()
+            return
+
+        self._speech_started.clear()
+        text = voice_interface.listen_for_command()
+        if self._speech_started.is_set() or voice_interface.playback.is_speaking:
+            # Nova började prata under lyssningen, så texten kan vara Novas egen röst
+            if text:
+                logger.debug("Ignorerar '%s' som hördes medan Nova pratade", text)
+            self._next_state()
+            return
+        if not text:
+            return
+
+        # Vänta på gränssnittet innan nästa lyssning, så att svaret hinner läggas i uppläsningskön
+        self._awaiting_turn = True
+        self._set_state(SPEAKING)
+        if self.on_utterance:
+            self.on_utterance(text)
+        else:
+            self._awaiting_turn = False
+            self._next_state()
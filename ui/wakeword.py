@@ -0,0 +1,317 @@
+"""
+Modul för lokal väckordsdetektering i Nova chatbot.
+
+Väckordet ("hej nova") känns igen lokalt innan något ljud skickas till den
+fullständiga taligenkänningen. Detektorn jämför ljudets egenskaper per ram
+(energi och nollgenomgångar) med inspelade mallar med dynamisk tidsförvrängning
+(DTW), så att bara ljud som liknar väckordet kostar ett anrop till molnet.
+"""
+
+import math
+import os
+import speech_recognition as sr
+from ui.audio import VoiceActivityDetector, audio_features
+from utils.helpers import get_logger
+
+
+logger = get_logger(__name__)
+
+# Mappen där inspelade väckordsmallar (WAV) letas efter som standard
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "wakeword")
+
+
+class WakeWordDetector:
+    """
+    Basklass för väckordsdetektorer.
+    """
+
+    # Namnet på detektorn, används i konfiguration och loggar
+    name = "base"
+
+    # True om detektorn bara används för att inga mallar har spelats in
+    needs_enrollment = False
+
+    def detect(self, audio):
+        """
+        Avgör om ett ljudsegment innehåller väckordet.
+
+        Args:
+            audio (sr.AudioData): Ljudsegmentet från mikrofonen
+
+        Returns:
+            bool: True om segmentet ska skickas vidare till taligenkänningen
+        """
+        raise NotImplementedError
+
+
+class PassThroughDetector(WakeWordDetector):
+    """
+    Detektor som släpper igenom allt tal. Används när inga mallar finns,
+    och motsvarar då det tidigare beteendet där allt tal skickades vidare.
+    """
+
+    name = "none"
+
+    def __init__(self, needs_enrollment=False):
+        """
+        Initierar detektorn.
+
+        Args:
+            needs_enrollment (bool): True om detektorn används för att mallar saknas,
+                                     så att gränssnittet kan be användaren spela in dem
+        """
+        self.needs_enrollment = needs_enrollment
+
+    def detect(self, audio):
+        """Släpper igenom alla segment."""
+        return True
+
+
+class FileTriggerDetector(WakeWordDetector):
+    """
+    Detektor för tester som löser ut när en triggerfil finns.
+
+    Filen tas bort när den har lösts ut, så att varje fil ger exakt en aktivering.
+    """
+
+    name = "file"
+
+    def __init__(self, path):
+        """
+        Initierar detektorn.
+
+        Args:
+            path (str): Sökvägen till triggerfilen
+        """
+        self.path = path
+
+    def detect(self, audio):
+        """Löser ut om triggerfilen finns och tar sedan bort den."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning("Kunde inte ta bort triggerfilen %s: %s", self.path, e)
+        logger.debug("Väckord utlöst av triggerfilen %s", self.path)
+        return True
+
+
+def normalize_features(features):
+    """
+    Gör ramegenskaperna oberoende av inspelningsnivån.
+
+    Energin omvandlas till logaritmisk skala och centreras kring segmentets medelvärde,
+    så att samma fras sagd högt eller tyst får liknande egenskaper.
+
+    Args:
+        features (list): Par av (RMS-energi, nollgenomgångar) per ram
+
+    Returns:
+        list: Par av (relativ logenergi, nollgenomgångar) per ram
+    """
+    if not features:
+        return []
+    log_energy = [math.log(energy + 1.0) for energy, _ in features]
+    mean = sum(log_energy) / len(log_energy)
+    return [(energy - mean, crossings) for energy, (_, crossings) in zip(log_energy, features)]
+
+
+def dtw_distance(template, segment, zcr_weight=10.0):
+    """
+    Beräknar DTW-avståndet mellan en mall och början av ett segment.
+
+    Slutet är öppet: mallen får matcha mot vilken början av segmentet som helst
+    mellan halva och dubbla mallens längd, eftersom användaren ofta fortsätter
+    prata direkt efter väckordet.
+
+    Args:
+        template (list): Normaliserade ramegenskaper för mallen
+        segment (list): Normaliserade ramegenskaper för segmentet
+        zcr_weight (float): Vikt för nollgenomgångar relativt logenergin
+
+    Returns:
+        float: Medelkostnaden längs den bästa vägen, eller inf om segmentet är för kort
+    """
+    rows = len(template)
+    columns = min(len(segment), rows * 2)
+    if rows == 0 or columns < rows // 2:
+        return math.inf
+
+    previous = [math.inf] * (columns + 1)
+    previous[0] = 0.0
+    for i in range(rows):
+        energy, crossings = template[i]
+        current = [math.inf] * (columns + 1)
+        for j in range(1, columns + 1):
+            other_energy, other_crossings = segment[j - 1]
+            cost = abs(energy - other_energy) + zcr_weight * abs(crossings - other_crossings)
+            current[j] = cost + min(previous[j - 1], previous[j], current[j - 1])
+        previous = current
+
+    # Normalisera med väglängden så att långa och korta mallar kan jämföras
+    return min(previous[j] / (rows + j) for j in range(max(1, rows // 2), columns + 1))
+
+
+class TemplateWakeWordDetector(WakeWordDetector):
+    """
+    Detektor som jämför ljudet med inspelade exempel av väckordet.
+    """
+
+    name = "template"
+
+    def __init__(self, templates=(), threshold=0.35, frame_seconds=0.02):
+        """
+        Initierar detektorn.
+
+        Args:
+            templates (iterable): Inspelade exempel av väckordet som sr.AudioData
+            threshold (float): Största DTW-avstånd som räknas som en träff
+            frame_seconds (float): Ramlängd i sekunder
+        """
+        self.threshold = threshold
+        self.frame_seconds = frame_seconds
+        self.templates = []
+        for audio in templates:
+            self.enroll(audio)
+
+    @classmethod
+    def from_directory(cls, directory, **kwargs):
+        """
+        Skapar en detektor från alla WAV-filer i en mapp.
+
+        Args:
+            directory (str): Mappen med inspelade exempel av väckordet
+            **kwargs: Skickas vidare till konstruktorn
+
+        Returns:
+            TemplateWakeWordDetector: Den nya detektorn
+        """
+        detector = cls(**kwargs)
+        for filename in sorted(os.listdir(directory)):
+            if not filename.lower().endswith(".wav"):
+                continue
+            with sr.AudioFile(os.path.join(directory, filename)) as source:
+                detector.enroll(sr.Recognizer().record(source))
+        logger.info("Läste in %d väckordsmallar från %s", len(detector.templates), directory)
+        return detector
+
+    def enroll(self, audio):
+        """
+        Lägger till ett inspelat exempel av väckordet.
+
+        Args:
+            audio (sr.AudioData): Inspelningen
+        """
+        features = normalize_features(audio_features(audio, self.frame_seconds))
+        if features:
+            self.templates.append(features)
+
+    def distance(self, audio):
+        """
+        Returnerar det minsta DTW-avståndet mellan ljudet och mallarna.
+
+        Args:
+            audio (sr.AudioData): Ljudsegmentet
+
+        Returns:
+            float: Det minsta avståndet, eller inf om inga mallar finns
+        """
+        segment = normalize_features(audio_features(audio, self.frame_seconds))
+        return min((dtw_distance(template, segment) for template in self.templates), default=math.inf)
+
+    def detect(self, audio):
+        """Löser ut om ljudet liknar någon av mallarna tillräckligt mycket."""
+        distance = self.distance(audio)
+        logger.debug("Väckordsavstånd: %.3f (gräns %.3f)", distance, self.threshold)
+        return distance <= self.threshold
+
+
+def create_detector(spec=None):
+    """
+    Skapar en väckordsdetektor utifrån konfiguration.
+
+    Args:
+        spec (str): "none", "file:<sökväg>" eller "template[:<mapp>]".
+                    Standard är miljövariabeln NOVA_WAKE_WORD, annars används mallarna i
+                    data/wakeword om de finns och PassThroughDetector om de saknas.
+
+    Returns:
+        WakeWordDetector: Den nya detektorn
+
+    Raises:
+        ValueError: Om en okänd detektor anges
+    """
+    if spec is None:
+        spec = os.environ.get("NOVA_WAKE_WORD")
+    if spec is None:
+        has_templates = os.path.isdir(DEFAULT_TEMPLATE_DIR) and any(
+            filename.lower().endswith(".wav") for filename in os.listdir(DEFAULT_TEMPLATE_DIR)
+        )
+        if not has_templates:
+            logger.warning(
+                "Inga väckordsmallar i %s. Väckordssteget är avstängt och allt ljud skickas till "
+                "taligenkänningen. Spela in mallar med: python main.py --enroll-wake-word", DEFAULT_TEMPLATE_DIR
+            )
+            return PassThroughDetector(needs_enrollment=True)
+        spec = "template"
+
+    name, _, argument = spec.partition(":")
+    if name == "none":
+        return PassThroughDetector()
+    if name == "file":
+        if not argument:
+            raise ValueError("Detektorn 'file' kräver en sökväg, t.ex. file:/tmp/nova-wake")
+        return FileTriggerDetector(argument)
+    if name == "template":
+        return TemplateWakeWordDetector.from_directory(argument or DEFAULT_TEMPLATE_DIR)
+    raise ValueError(f"Okänd väckordsdetektor: {name}. Välj bland none, file, template")
+
+
+def record_templates(count=5, directory=DEFAULT_TEMPLATE_DIR, microphone=None, phrase_seconds=3.0,
+                     on_prompt=None):
+    """
+    Spelar in exempel av väckordet och sparar dem som mallar.
+
+    Tystnaden före och efter ordet klipps bort, så att mallarna bara innehåller väckordet.
+
+    Args:
+        count (int): Antal exempel som spelas in
+        directory (str): Mappen där mallarna sparas
+        microphone (sr.AudioSource): Ljudkällan, standard är systemets mikrofon
+        phrase_seconds (float): Längsta inspelning per exempel i sekunder
+        on_prompt (callable): Anropas med exemplets nummer (från 1) innan det spelas in
+
+    Returns:
+        list: Sökvägarna till de sparade mallarna
+    """
+    os.makedirs(directory, exist_ok=True)
+    recognizer = sr.Recognizer()
+    vad = VoiceActivityDetector()
+    paths = []
+
+    with microphone or sr.Microphone() as source:
+        recognizer.adjust_for_ambient_noise(source, duration=0.5)
+        number = 0
+        while len(paths) < count:
+            if on_prompt:
+                on_prompt(len(paths) + 1)
+            audio = recognizer.listen(source, phrase_time_limit=phrase_seconds)
+            audio = vad.trim(audio, recognizer.energy_threshold)
+            if audio is None:
+                logger.warning("Inget tal uppfattades, försök igen")
+                continue
+
+            # Befintliga mallar skrivs aldrig över
+            while True:
+                number += 1
+                path = os.path.join(directory, f"wake_{number:02d}.wav")
+                if not os.path.exists(path):
+                    break
+            with open(path, "wb") as file:
+                file.write(audio.get_wav_data())
+            paths.append(path)
+            logger.info("Sparade väckordsmall %s", path)
+
+    return paths
+
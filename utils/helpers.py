@@ -4,23 +4,25 @@ Innehåller allmännyttiga funktioner som används på flera ställen i applikat
 """
 
 import os
+import sys
 import json
 import datetime
 import re
 import unicodedata
 import random
 import logging
+import logging.handlers
+import queue
+import atexit
+import threading
 from typing import Dict, List, Any, Optional, Union
 
-# Konfigurera loggning
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs', 'nova.log'), encoding='utf-8')
-    ]
-)
+# Standardinställningar för loggning. Inget konfigureras vid import, anropa setup_logging().
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_logging_lock = threading.Lock()
+_logging_configured = False
 
 def get_logger(name: str) -> logging.Logger:
     """
@@ -34,6 +36,115 @@ def get_logger(name: str) -> logging.Logger:
     """
     return logging.getLogger(name)
 
+# Lyssnaren som skriver ut loggposter från kön när asynkron loggning är aktiverad
+_queue_listener = None
+
+def setup_logging(level: int = logging.INFO,
+                  log_file: Optional[str] = None,
+                  max_bytes: int = 1024 * 1024,
+                  backup_count: int = 3,
+                  console: bool = True,
+                  buffered: bool = False,
+                  buffer_capacity: int = 100,
+                  async_logging: bool = False) -> logging.Logger:
+    """
+    Konfigurerar loggning för hela applikationen.
+    
+    Anropet är idempotent: bara det första anropet har effekt. Filen öppnas
+    först när den första posten skrivs, och om loggmappen inte kan skapas
+    fortsätter loggningen till konsolen i stället för att programmet kraschar.
+    
+    Args:
+        level: Lägsta loggnivå
+        log_file: Sökväg till loggfilen, standard är logs/nova.log. Tom sträng stänger av filloggning
+        max_bytes: Största storlek på loggfilen innan den roteras
+        backup_count: Antal roterade loggfiler som sparas
+        console: Om loggposter ska skrivas till konsolen
+        buffered: Om filposter ska samlas i minnet och skrivas i omgångar
+        buffer_capacity: Antal poster per omgång när buffered är aktiverat
+        async_logging: Om hanterarna ska köras i en bakgrundstråd (se enable_async_logging)
+        
+    Returns:
+        Rotloggaren
+    """
+    global _logging_configured
+    root = logging.getLogger()
+    
+    with _logging_lock:
+        if _logging_configured:
+            return root
+        _logging_configured = True
+        
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = []
+        file_error = None
+        
+        if console:
+            handlers.append(logging.StreamHandler())
+        
+        if log_file is None:
+            log_file = os.path.join(LOG_DIR, 'nova.log')
+        if log_file:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+                file_handler = logging.handlers.RotatingFileHandler(
+                    log_file, maxBytes=max_bytes, backupCount=backup_count,
+                    encoding='utf-8', delay=True
+                )
+                file_handler.setFormatter(formatter)
+                
+                # Samla filposter i minnet och skriv dem i omgångar, fel skrivs direkt
+                if buffered:
+                    file_handler = logging.handlers.MemoryHandler(
+                        buffer_capacity, flushLevel=logging.ERROR, target=file_handler
+                    )
+                handlers.append(file_handler)
+            except OSError as e:
+                file_error = e
+        
+        root.setLevel(level)
+        for handler in handlers:
+            handler.setFormatter(formatter)
+            root.addHandler(handler)
+    
+    if file_error is not None:
+        root.warning("Kunde inte öppna loggfilen '%s', loggar bara till konsolen: %s", log_file, file_error)
+    
+    if async_logging:
+        enable_async_logging()
+    return root
+
+def enable_async_logging() -> logging.handlers.QueueListener:
+    """
+    Flyttar rotloggarens hanterare till en bakgrundstråd.
+    
+    Loggposter läggs i en kö och skrivs till konsol och fil av en separat tråd,
+    så att långsam I/O (t.ex. en pipe till en logginsamlare) aldrig blockerar
+    den tråd som loggar. Anropet är idempotent.
+    
+    Returns:
+        Lyssnaren som tömmer kön
+    """
+    global _queue_listener
+    with _logging_lock:
+        if _queue_listener is not None:
+            return _queue_listener
+        
+        root = logging.getLogger()
+        handlers = list(root.handlers)
+        log_queue = queue.SimpleQueue()
+        
+        for handler in handlers:
+            root.removeHandler(handler)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        
+        _queue_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _queue_listener.start()
+        
+        # Se till att alla poster i kön skrivs ut innan programmet avslutas
+        atexit.register(_queue_listener.stop)
+        return _queue_listener
+
 # Logger för denna modul
 logger = get_logger(__name__)
 
@@ -55,10 +166,10 @@ def load_json_file(file_path: str) -> Dict:
         with open(file_path, 'r', encoding='utf-8') as file:
             return json.load(file)
     except FileNotFoundError:
-        logger.error(f"Filen '{file_path}' kunde inte hittas.")
+        logger.error("Filen '%s' kunde inte hittas.", file_path)
         raise
     except json.JSONDecodeError as e:
-        logger.error(f"Filen '{file_path}' innehåller ogiltig JSON: {e}")
+        logger.error("Filen '%s' innehåller ogiltig JSON: %s", file_path, e)
         raise
 
 def save_json_file(file_path: str, data: Dict) -> bool:
@@ -80,7 +191,7 @@ def save_json_file(file_path: str, data: Dict) -> bool:
             json.dump(data, file, ensure_ascii=False, indent=2)
         return True
     except Exception as e:
-        logger.error(f"Kunde inte spara data till '{file_path}': {e}")
+        logger.error("Kunde inte spara data till '%s': %s", file_path, e)
         return False
 
 def get_current_time() -> str:
@@ -170,7 +281,7 @@ def ensure_directory_exists(directory_path: str) -> bool:
         os.makedirs(directory_path, exist_ok=True)
         return True
     except Exception as e:
-        logger.error(f"Kunde inte skapa mappen '{directory_path}': {e}")
+        logger.error("Kunde inte skapa mappen '%s': %s", directory_path, e)
         return False
 
 def get_project_root() -> str:
@@ -183,6 +294,50 @@ def get_project_root() -> str:
     # Detta antar att helpers.py är i utils/ under projektets rot
     return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+def get_user_cache_dir(*parts: str) -> str:
+    """
+    Returnerar en plattformsoberoende mapp för Novas cachefiler.
+    
+    Windows: %LOCALAPPDATA%\\Nova\\Cache, macOS: ~/Library/Caches/Nova,
+    övriga: $XDG_CACHE_HOME/nova eller ~/.cache/nova. Mappen skapas inte.
+    
+    Args:
+        *parts: Eventuella undermappar
+        
+    Returns:
+        Sökvägen till cachemappen
+    """
+    home = os.path.expanduser("~")
+    if os.name == "nt":
+        base = os.path.join(os.environ.get("LOCALAPPDATA", os.path.join(home, "AppData", "Local")), "Nova", "Cache")
+    elif sys.platform == "darwin":
+        base = os.path.join(home, "Library", "Caches", "Nova")
+    else:
+        base = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.join(home, ".cache")), "nova")
+    return os.path.join(base, *parts)
+
+def get_user_data_dir(*parts: str) -> str:
+    """
+    Returnerar en plattformsoberoende mapp för Novas beständiga data, t.ex. historiken.
+    
+    Windows: %APPDATA%\\Nova, macOS: ~/Library/Application Support/Nova,
+    övriga: $XDG_DATA_HOME/nova eller ~/.local/share/nova. Mappen skapas inte.
+    
+    Args:
+        *parts: Eventuella undermappar eller filnamn
+        
+    Returns:
+        Sökvägen till datamappen
+    """
+    home = os.path.expanduser("~")
+    if os.name == "nt":
+        base = os.path.join(os.environ.get("APPDATA", os.path.join(home, "AppData", "Roaming")), "Nova")
+    elif sys.platform == "darwin":
+        base = os.path.join(home, "Library", "Application Support", "Nova")
+    else:
+        base = os.path.join(os.environ.get("XDG_DATA_HOME", os.path.join(home, ".local", "share")), "nova")
+    return os.path.join(base, *parts)
+
 def find_files_with_extension(directory: str, extension: str) -> List[str]:
     """
     Hittar alla filer med den angivna filändelsen i en mapp.
@@ -201,6 +356,6 @@ def find_files_with_extension(directory: str, extension: str) -> List[str]:
             if file.endswith(extension):
                 matching_files.append(os.path.join(directory, file))
     except Exception as e:
-        logger.error(f"Fel vid sökning efter filer i '{directory}': {e}")
+        logger.error("Fel vid sökning efter filer i '%s': %s", directory, e)
     
     return matching_files
\ No newline at end of file